@@ -0,0 +1,366 @@
+"""
+Admission control for interview turns.
+
+Without it, a burst of turns is handed straight to the providers: Groq starts
+answering 429, sync workers block on calls that will time out, and every turn
+fails instead of some of them waiting a little. Each turn therefore passes
+through the process-wide controller after its request is parsed:
+
+1. Per-user token bucket (ADMISSION_USER_RATE turns/s, ADMISSION_USER_BURST):
+   a session, or a client address for clients without one, that sends turns
+   faster is rejected with 429
+2. Per-provider in-flight caps (ADMISSION_LIMITS, e.g. "groq=16,edge=32"):
+   a turn holds one slot of every provider it calls (STT, LLM, TTS) until its
+   response is finished
+3. Bounded FIFO wait queue (ADMISSION_QUEUE_SIZE): turns that don't fit wait
+   up to ADMISSION_QUEUE_TIMEOUT seconds on the async server, and up to
+   ADMISSION_SYNC_QUEUE_TIMEOUT on the sync servers, whose waiting turn holds
+   a whole worker. A turn is shed right away (503) if the queue is full or
+   the expected wait (queue depth x moving average turn time / bottleneck
+   cap) already exceeds its deadline, and after waiting until the deadline
+   otherwise. Slots go to the head of the queue only, so a turn needing a
+   busy provider isn't overtaken by later turns that need free ones
+
+A turn shed with 503 gets its rate-limit token back: it was the server's
+capacity, not the user's pace, that refused it.
+
+Background provider calls of a turn that is still being recorded (interim
+transcripts and speculative replies of chunk-uploaded turns) only run if
+reserve() finds a free slot: they never queue, and they yield to queued turns.
+
+Rejections carry Retry-After. Queue depth, in-flight slots and rejection
+counts are exported on /metrics and in health_check; the time a turn waited
+is recorded as its `queue` span. Limits are per process (per gunicorn worker).
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from metrics import metric_renderers
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LIMITS = os.environ.get("ADMISSION_LIMITS", "groq=16,deepgram=32,sarvam=16,edge=32")
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_SYNC_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_SYNC_QUEUE_TIMEOUT", "1"))
+ADMISSION_USER_RATE = float(os.environ.get("ADMISSION_USER_RATE", "1"))  # turns per second, 0 = unlimited
+ADMISSION_USER_BURST = float(os.environ.get("ADMISSION_USER_BURST", "5"))
+ADMISSION_MAX_USERS = 10000
+# Turn time assumed until turns have been measured, and the weight of each new one
+INITIAL_TURN_SECONDS = 3.0
+TURN_TIME_ALPHA = 0.2
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    """{"groq": 16, ...} from "groq=16,edge=32"; providers not listed are unlimited."""
+    limits = {}
+    for item in value.split(","):
+        provider, _, limit = item.partition("=")
+        if provider.strip() and limit.strip():
+            limits[provider.strip()] = int(limit)
+    return limits
+
+
+def client_key(session_id: Optional[str], forwarded_for: Optional[str], remote_addr: Optional[str]) -> str:
+    """
+    Rate-limit key: the session, else the client address. With a proxy in front
+    (Railway) that is the last X-Forwarded-For entry, the one the proxy added.
+    """
+    if session_id:
+        return f"session:{session_id}"
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(',')[-1].strip()}"
+    return f"ip:{remote_addr or ''}"
+
+
+class AdmissionRejected(Exception):
+    """A turn was not admitted: 429 (rate limited) or 503 (overloaded), with Retry-After."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{'Too many turns' if status == 429 else 'Server busy'} ({reason}), retry in {self.retry_after}s")
+
+    def headers(self) -> dict:
+        return {"Retry-After": str(self.retry_after)}
+
+    def payload(self) -> dict:
+        return {"error": str(self), "reason": self.reason, "retry_after": self.retry_after}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds until one is available (nothing taken)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken by a turn that was then shed."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class _Waiter:
+    """A queued turn, woken by an Event (threads) or a future on its event loop (async server)."""
+
+    def __init__(self, providers: Tuple[str, ...], loop: Optional[asyncio.AbstractEventLoop] = None,
+                 bucket: Optional[TokenBucket] = None):
+        self.providers = providers
+        self.bucket = bucket
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Ticket:
+    """Provider slots held by an admitted turn; release() once its response is done (idempotent)."""
+
+    def __init__(self, controller: "AdmissionController", providers: Tuple[str, ...], waited: float,
+                 measured: bool = True):
+        self.controller = controller
+        self.providers = providers
+        self.waited = waited
+        self.measured = measured
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.controller._release(self.providers, time.monotonic() - self.started, self.measured)
+
+
+class AdmissionController:
+    """Process-wide turn admission: per-user rate limits, per-provider caps and a bounded wait queue."""
+
+    def __init__(self, limits: Dict[str, int], queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, user_rate: float = ADMISSION_USER_RATE,
+                 user_burst: float = ADMISSION_USER_BURST,
+                 sync_queue_timeout: float = ADMISSION_SYNC_QUEUE_TIMEOUT):
+        self.limits = limits
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.sync_queue_timeout = min(sync_queue_timeout, queue_timeout)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.in_flight: Dict[str, int] = {provider: 0 for provider in limits}
+        self.turn_seconds = INITIAL_TURN_SECONDS
+        self._waiters: deque = deque()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {}
+        self.reserved = 0
+        self.reserve_denied = 0
+
+    def _fits(self, providers: Tuple[str, ...]) -> bool:
+        return all(self.in_flight.get(p, 0) < self.limits[p] for p in providers if p in self.limits)
+
+    def _take(self, providers: Tuple[str, ...]):
+        for provider in providers:
+            self.in_flight[provider] = self.in_flight.get(provider, 0) + 1
+        self.admitted += 1
+
+    def _reject(self, status: int, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        print(f"Turn rejected ({reason}), retry after {retry_after:.1f}s")
+        return AdmissionRejected(status, reason, retry_after)
+
+    def _rate_limit(self, user_key: str) -> Optional[TokenBucket]:
+        """Take a token from the user's bucket (None if unlimited); raises AdmissionRejected (429)."""
+        if self.user_rate <= 0:
+            return None
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            bucket = self._buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            while len(self._buckets) > ADMISSION_MAX_USERS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_key)
+        wait = bucket.take()
+        if wait:
+            raise self._reject(429, "rate_limited", wait)
+        return bucket
+
+    def _expected_wait(self, providers: Tuple[str, ...]) -> float:
+        """Seconds until a turn joining the queue now would likely start."""
+        caps = [self.limits[p] for p in providers if p in self.limits]
+        if not caps:
+            return 0.0
+        return (len(self._waiters) // min(caps) + 1) * self.turn_seconds
+
+    def _enter(self, user_key: str, providers: Tuple[str, ...], timeout: float, loop=None):
+        """A Ticket if the turn is admitted right away, else a queued _Waiter; raises AdmissionRejected."""
+        with self._lock:
+            bucket = self._rate_limit(user_key)
+            if not self._waiters and self._fits(providers):
+                self._take(providers)
+                return Ticket(self, providers, 0.0)
+            expected = self._expected_wait(providers)
+            reason = None
+            if len(self._waiters) >= self.queue_size:
+                reason = "queue_full"
+            elif expected > timeout:
+                reason = "overloaded"
+            if reason:
+                if bucket is not None:
+                    bucket.refund()
+                raise self._reject(503, reason, expected)
+            waiter = _Waiter(providers, loop, bucket)
+            self._waiters.append(waiter)
+            self.queued += 1
+            return waiter
+
+    def _settle(self, waiter: _Waiter, started: float) -> Ticket:
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                if waiter.bucket is not None:
+                    waiter.bucket.refund()
+                raise self._reject(503, "queue_timeout", self.turn_seconds)
+        return Ticket(self, waiter.providers, time.monotonic() - started)
+
+    def _abandon(self, waiter: _Waiter):
+        """The waiting request went away (async cancellation): leave the queue or give back its slots."""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                return
+        self._release(waiter.providers, 0.0, measured=False)
+
+    def _release(self, providers: Tuple[str, ...], seconds: float, measured: bool = True):
+        with self._lock:
+            for provider in providers:
+                self.in_flight[provider] -= 1
+            if measured:
+                self.turn_seconds += TURN_TIME_ALPHA * (seconds - self.turn_seconds)
+            while self._waiters and self._fits(self._waiters[0].providers):
+                waiter = self._waiters.popleft()
+                self._take(waiter.providers)
+                waiter.granted = True
+                waiter.wake()
+
+    def admit(self, user_key: str, providers: Tuple[str, ...], timer=None) -> Ticket:
+        """
+        Admit a turn, waiting in the queue if needed; raises AdmissionRejected.
+        The wait blocks the calling worker, so it is capped at sync_queue_timeout.
+        """
+        started = time.monotonic()
+        if not ADMISSION_ENABLED:
+            return Ticket(self, (), 0.0)
+        entered = self._enter(user_key, providers, self.sync_queue_timeout)
+        if isinstance(entered, _Waiter):
+            entered.event.wait(self.sync_queue_timeout)
+            entered = self._settle(entered, started)
+        if timer is not None:
+            timer.lap("queue")
+        return entered
+
+    def reserve(self, providers: Tuple[str, ...]) -> Optional[Ticket]:
+        """
+        Slots for a background call if they are free right now, else None.
+        Never waits or rate-limits, and gives way to turns waiting in the queue.
+        """
+        if not ADMISSION_ENABLED:
+            return Ticket(self, (), 0.0, measured=False)
+        with self._lock:
+            if self._waiters or not self._fits(providers):
+                self.reserve_denied += 1
+                return None
+            for provider in providers:
+                self.in_flight[provider] = self.in_flight.get(provider, 0) + 1
+            self.reserved += 1
+        return Ticket(self, providers, 0.0, measured=False)
+
+    async def admit_async(self, user_key: str, providers: Tuple[str, ...], timer=None) -> Ticket:
+        """admit for the async server: waits on the event loop instead of blocking it."""
+        started = time.monotonic()
+        if not ADMISSION_ENABLED:
+            return Ticket(self, (), 0.0)
+        entered = self._enter(user_key, providers, self.queue_timeout, asyncio.get_running_loop())
+        if isinstance(entered, _Waiter):
+            try:
+                await asyncio.wait_for(asyncio.shield(entered.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._abandon(entered)
+                raise
+            entered = self._settle(entered, started)
+        if timer is not None:
+            timer.lap("queue")
+        return entered
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": ADMISSION_ENABLED,
+                "in_flight": dict(self.in_flight),
+                "limits": dict(self.limits),
+                "queue_depth": len(self._waiters),
+                "turn_seconds": round(self.turn_seconds, 3),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": dict(self.rejected),
+                "reserved": self.reserved,
+                "reserve_denied": self.reserve_denied,
+            }
+
+    def render(self) -> str:
+        """Prometheus gauges and counters for the /metrics routes."""
+        stats = self.stats()
+        lines = [
+            "# HELP interview_admission_queue_depth Turns waiting for admission.",
+            "# TYPE interview_admission_queue_depth gauge",
+            f"interview_admission_queue_depth {stats['queue_depth']}",
+            "# HELP interview_admission_in_flight Admitted turns holding a provider slot.",
+            "# TYPE interview_admission_in_flight gauge",
+        ]
+        lines += [f'interview_admission_in_flight{{provider="{p}"}} {n}' for p, n in sorted(stats["in_flight"].items())]
+        lines += [
+            "# HELP interview_admission_limit In-flight cap per provider.",
+            "# TYPE interview_admission_limit gauge",
+        ]
+        lines += [f'interview_admission_limit{{provider="{p}"}} {n}' for p, n in sorted(stats["limits"].items())]
+        lines += [
+            "# HELP interview_admission_admitted_total Turns admitted.",
+            "# TYPE interview_admission_admitted_total counter",
+            f"interview_admission_admitted_total {stats['admitted']}",
+            "# HELP interview_admission_rejected_total Turns rejected, by reason.",
+            "# TYPE interview_admission_rejected_total counter",
+        ]
+        lines += [f'interview_admission_rejected_total{{reason="{r}"}} {n}' for r, n in sorted(stats["rejected"].items())]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide controller
+admission = AdmissionController(parse_limits(ADMISSION_LIMITS))
+metric_renderers.append(admission.render)
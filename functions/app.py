@@ -6,158 +6,296 @@ Provides REST API endpoints for the interview AI system.
 """
 
 import os
+import sys
 import json
-import base64
-from flask import Flask, request, jsonify
+import signal
+from startup import startup_profile, warmup, WARMUP_ON_START
+SERVED = startup_profile.begin("app")
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from dotenv import load_dotenv
-import requests
-from groq import Groq
-
-# Load environment variables
-load_dotenv()
+from werkzeug.exceptions import RequestEntityTooLarge
+if SERVED:
+    startup_profile.mark("flask")
+import provider_clients
+from streaming import stream_after, sse_event, SSE_HEADERS
+from history_manager import history_window
+from opener_cache import opener_cache
+from admission import admission, AdmissionRejected
+from audio_response import audio_blobs
+from audio_codec import transcode_stats
+from fillers import filler_bank, filler_payload, wants_filler, FILLER_WARM_ON_STARTUP
+from vad import vad_stats
+from upload_stream import UploadTooLarge, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES
+from stt_router import stt_router
+from tts_cache import tts_cache
+from tts_router import tts_router
+from metrics import TurnTimer, render_metrics, PROMETHEUS_CONTENT_TYPE
+from session_store import load_chat_history, SESSION_TTL_SECONDS
+from transcript_store import transcript_stats
+from speculative import speculative_turns, speculation_stats, SPECULATIVE_TURN_TTL_SECONDS
+# The turn pipeline (provider stages, prompts, hooks) is shared with the Firebase and aiohttp servers
+from pipeline import (turn_pipeline, TurnContext, admit_turn, spool_turn_audio, resume_speculative_turn,
+                      turn_response, warmup_steps, open_session, EMPTY_TRANSCRIPT_RESPONSE,
+                      DEEPGRAM_API_KEY, ELEVENLABS_API_KEY, GROQ_API_KEY, SARVAM_API_KEY)
+if SERVED:
+    startup_profile.mark("pipeline modules")
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})  # Enable CORS for all origins
+# Whole request (audio + history form fields); the audio part itself is capped while spooling
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + UPLOAD_CHUNK_BYTES * 16
 
 
-# API Keys from environment
-DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY")
-ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
-ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+fillers_warmed = False
 
-# Lazy Groq client
-groq_client = None
 
-def get_groq_client():
-    global groq_client
-    if groq_client is None:
-        if not GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY not set")
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    return groq_client
+@app.before_request
+def warm_fillers():
+    """On the first request, synthesize the filler phrases for the web client's default format in the background."""
+    global fillers_warmed
+    if fillers_warmed or not FILLER_WARM_ON_STARTUP:
+        return
+    fillers_warmed = True
+    turn_pipeline.warm_fillers()
 
 
-def transcribe_audio(audio_data: bytes, content_type: str = "audio/webm") -> str:
-    """Convert audio to text using Deepgram."""
-    if not DEEPGRAM_API_KEY:
-        raise ValueError("DEEPGRAM_API_KEY not set")
-    
-    response = requests.post(
-        "https://api.deepgram.com/v1/listen",
-        params={"model": "nova-2", "smart_format": "true", "language": "en"},
-        headers={"Authorization": f"Token {DEEPGRAM_API_KEY}", "Content-Type": content_type},
-        data=audio_data,
-        timeout=30,
+def parse_turn(timer: TurnTimer):
+    """(TurnContext, None) for a turn upload, or (None, error response); the audio is spooled once admitted."""
+    turn = TurnContext.from_params(request.form, request.headers.get('Accept'), timer)
+    if not request.files.get('audio'):
+        return None, (jsonify({"error": "No audio file provided"}), 400)
+    turn.chat_history = load_chat_history(turn.session_id, request.form.get('history'))
+    if turn.chat_history is None:
+        return None, (jsonify({"error": "Session not found or expired"}), 404)
+    timer.lap("parse")
+    return turn, None
+
+
+def error_response(e: Exception):
+    """Response for an exception of a turn handler."""
+    if isinstance(e, AdmissionRejected):
+        return jsonify(e.payload()), e.status, e.headers()
+    if isinstance(e, (UploadTooLarge, RequestEntityTooLarge)):
+        return jsonify({"error": str(e)}), 413
+    print(f"Error: {e}")
+    return jsonify({"error": str(e)}), 500
+
+
+def reply_response(turn: TurnContext, response_mode) -> Response:
+    """Non-streaming response of a finished turn (JSON+base64, binary, multipart or short-lived URL)."""
+    if not turn.user_transcript.strip():
+        return Response(json.dumps(EMPTY_TRANSCRIPT_RESPONSE), status=200, content_type='application/json',
+                        headers=turn.timer.headers())
+    body, response_type, headers = turn_response(
+        turn,
+        response_mode,
+        request.headers.get('Accept'),
+        audio_url_base=request.base_url.rsplit('/', 1)[0] + '/get_audio',
     )
+    return Response(body, status=200, content_type=response_type, headers=headers)
+
+
+def reply_stream(turn: TurnContext, filler_requested) -> Response:
+    """SSE response of a turn; with a filler the stream opens right away and STT runs inside it."""
+    filler = turn_pipeline.filler(turn) if wants_filler(filler_requested) else None
+    if filler is not None:
+        events = stream_after(sse_event("filler", filler_payload(filler)), lambda: turn_pipeline.stream(turn))
+    else:
+        events = turn_pipeline.stream(turn)
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={**SSE_HEADERS, **turn.timer.headers()})
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({"error": f"Request exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+
+@app.route('/interview-92a23/us-central1/process_interview_turn', methods=['POST', 'OPTIONS'])
+def process_interview_turn():
+    """Process a single interview turn."""
+    if request.method == 'OPTIONS':
+        return '', 204
     
-    if response.status_code != 200:
-        raise Exception(f"Deepgram error: {response.status_code}")
-    
-    result = response.json()
-    return result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
+    ticket = None
+    try:
+        turn, error = parse_turn(TurnTimer())
+        if error is not None:
+            return error
+        ticket = admit_turn(turn, request.headers.get('X-Forwarded-For'), request.remote_addr)
+        spool_turn_audio(turn, request.files['audio'])
+        return reply_response(turn_pipeline.run(turn), request.form.get('response_mode'))
+    except Exception as e:
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
 
 
-def generate_response(user_message: str, chat_history: list, interview_type: str = "technical") -> str:
-    """Generate AI response using Groq."""
-    client = get_groq_client()
+@app.route('/interview-92a23/us-central1/process_interview_turn_stream', methods=['POST', 'OPTIONS'])
+def process_interview_turn_stream():
+    """Streaming variant of process_interview_turn (Server-Sent Events)."""
+    if request.method == 'OPTIONS':
+        return '', 204
     
-    prompts = {
-        "technical": "You are a senior technical interviewer. Ask one question at a time, keep responses to 2-3 sentences.",
-        "behavioral": "You are an HR interviewer using STAR method. Ask one behavioral question at a time, keep responses brief.",
-        "case_study": "You are a management consultant conducting a case interview. Keep responses concise.",
-    }
+    ticket = None
+    try:
+        turn, error = parse_turn(TurnTimer())
+        if error is not None:
+            return error
+        ticket = admit_turn(turn, request.headers.get('X-Forwarded-For'), request.remote_addr)
+        spool_turn_audio(turn, request.files['audio'])
+        response = reply_stream(turn, request.form.get('filler'))
+        # The provider slots are held until the stream is done
+        response.call_on_close(ticket.release)
+        ticket = None
+        return response
+    except Exception as e:
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@app.route('/interview-92a23/us-central1/begin_turn', methods=['POST', 'OPTIONS'])
+def begin_turn():
+    """Open a streaming-input turn; the recorder's chunks follow on append_turn_audio."""
+    if request.method == 'OPTIONS':
+        return '', 204
     
-    messages = [{"role": "system", "content": prompts.get(interview_type, prompts["technical"])}]
-    messages.extend([{"role": m.get("role", "user"), "content": m.get("content", "")} for m in chat_history])
-    messages.append({"role": "user", "content": user_message})
+    params = request.get_json(silent=True) or request.form
+    turn = TurnContext.from_params(params, request.headers.get('Accept'), TurnTimer())
+    turn.chat_history = load_chat_history(turn.session_id, params.get('history'))
+    if turn.chat_history is None:
+        return jsonify({"error": "Session not found or expired"}), 404
     
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=messages,
-        max_tokens=200,
-        temperature=0.7,
-    )
+    speculative = turn_pipeline.speculative_turn(turn, params.get('content_type', 'audio/webm'))
+    speculative_turns.put(speculative)
+    return jsonify({"turn_id": speculative.turn_id, "expires_in": SPECULATIVE_TURN_TTL_SECONDS}), 200
+
+
+@app.route('/interview-92a23/us-central1/append_turn_audio', methods=['POST', 'OPTIONS'])
+def append_turn_audio():
+    """Append a raw audio chunk (request body) to the turn given by ?turn_id=."""
+    if request.method == 'OPTIONS':
+        return '', 204
     
-    return response.choices[0].message.content or ""
+    speculative = speculative_turns.get(request.args.get('turn_id', ''))
+    if speculative is None:
+        return jsonify({"error": "Turn not found or expired"}), 404
+    try:
+        speculative.feed(request.get_data())
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify({
+        "received": speculative.size,
+        "interim_transcript": speculative.interim_transcript,
+        "speculating": speculative.speculation is not None,
+    }), 200
 
 
-import asyncio
-import edge_tts
+def resume_turn(params, timer: TurnTimer):
+    """
+    (TurnContext, ticket, None) of a streaming-input turn closed by finish_turn*,
+    admitted like a turn upload (raises AdmissionRejected), or (None, None, error response).
+    """
+    speculative = speculative_turns.pop(params.get('turn_id', ''))
+    if speculative is None:
+        return None, None, (jsonify({"error": "Turn not found or expired"}), 404)
+    timer.lap("parse")
+    turn = resume_speculative_turn(speculative, timer)
+    try:
+        ticket = admit_turn(turn, request.headers.get('X-Forwarded-For'), request.remote_addr)
+    except AdmissionRejected:
+        speculative.cancel()
+        raise
+    return turn, ticket, None
 
-def synthesize_speech(text: str) -> bytes:
-    """Convert text to speech using Edge-TTS (Free)."""
-    voice = "en-US-AriaNeural"
-    communicate = edge_tts.Communicate(text, voice)
-    
-    async def get_audio():
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
 
+@app.route('/interview-92a23/us-central1/finish_turn', methods=['POST', 'OPTIONS'])
+def finish_turn():
+    """Close a streaming-input turn and respond like process_interview_turn."""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    ticket = None
     try:
-        # Run async function in sync wrapper
-        return asyncio.run(get_audio())
+        params = request.get_json(silent=True) or request.form
+        turn, ticket, error = resume_turn(params, TurnTimer())
+        if error is not None:
+            return error
+        # The reply usually was already generated while the candidate was finishing the answer
+        return reply_response(turn_pipeline.run(turn), params.get('response_mode'))
     except Exception as e:
-        raise Exception(f"Edge-TTS error: {str(e)}")
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
 
 
-@app.route('/interview-92a23/us-central1/process_interview_turn', methods=['POST', 'OPTIONS'])
-def process_interview_turn():
-    """Process a single interview turn."""
+@app.route('/interview-92a23/us-central1/finish_turn_stream', methods=['POST', 'OPTIONS'])
+def finish_turn_stream():
+    """Close a streaming-input turn and stream the reply like process_interview_turn_stream."""
     if request.method == 'OPTIONS':
         return '', 204
     
+    ticket = None
     try:
-        audio_file = request.files.get('audio')
-        history_json = request.form.get('history', '[]')
-        interview_type = request.form.get('interview_type', 'technical')
-        
-        if not audio_file:
-            return jsonify({"error": "No audio file"}), 400
-        
-        chat_history = json.loads(history_json) if history_json else []
-        
-        # 1. Transcribe
-        audio_data = audio_file.read()
-        content_type = audio_file.content_type or 'audio/webm'
-        user_transcript = transcribe_audio(audio_data, content_type)
-        
-        if not user_transcript.strip():
-            return jsonify({"error": "Could not transcribe", "user_transcript": "", "ai_response_text": "", "audio_base64": ""}), 200
-        
-        # 2. Generate response
-        ai_response = generate_response(user_transcript, chat_history, interview_type)
-        
-        # 3. Synthesize speech (with more detailed error reporting)
-        audio_base64 = ""
-        tts_error = None
-        try:
-            audio_bytes = synthesize_speech(ai_response)
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-        except Exception as e:
-            tts_error = str(e)
-            print(f"ElevenLabs failed: {e}")
-            # Continue without audio - the text response will still work
-        
-        response_data = {
-            "user_transcript": user_transcript,
-            "ai_response_text": ai_response,
-            "audio_base64": audio_base64,
-        }
-        
-        # Include TTS error in response for debugging
-        if tts_error:
-            response_data["tts_error"] = tts_error
-        
-        return jsonify(response_data), 200
-        
+        params = request.get_json(silent=True) or request.form
+        turn, ticket, error = resume_turn(params, TurnTimer())
+        if error is not None:
+            return error
+        response = reply_stream(turn, params.get('filler'))
+        # The provider slots are held until the stream is done
+        response.call_on_close(ticket.release)
+        ticket = None
+        return response
     except Exception as e:
-        print(f"Error: {e}")
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@app.route('/interview-92a23/us-central1/filler', methods=['GET'])
+def filler():
+    """A pre-synthesized filler phrase to play while a non-streaming turn is processed (204 until ready)."""
+    picked = turn_pipeline.filler(TurnContext.from_params(request.args, request.headers.get('Accept'), TurnTimer()))
+    if picked is None:
+        return '', 204
+    return jsonify(filler_payload(picked)), 200
+
+
+@app.route('/interview-92a23/us-central1/get_audio', methods=['GET'])
+def get_audio():
+    """Serve a short-lived audio blob produced by a turn in "url" response mode."""
+    blob = audio_blobs.get(request.args.get('id', ''))
+    if blob is None:
+        return jsonify({"error": "Audio not found or expired"}), 404
+    audio_bytes, mime_type = blob
+    return Response(audio_bytes, status=200, content_type=mime_type, headers={"Cache-Control": "private, max-age=60"})
+
+
+@app.route('/interview-92a23/us-central1/create_session', methods=['POST', 'OPTIONS'])
+def create_session():
+    """Create a server-side interview session (history is kept on the server)."""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    session = open_session(request.get_json(silent=True) or request.form)
+    return jsonify({"session_id": session["session_id"], "expires_in": SESSION_TTL_SECONDS}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+@app.route('/interview-92a23/us-central1/metrics', methods=['GET'])
+def metrics():
+    """Prometheus-style per-stage latency histograms."""
+    return Response(render_metrics(), status=200, content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route('/interview-92a23/us-central1/warmup', methods=['GET', 'POST'])
+def warmup_route():
+    """Warm this worker up (once) and report the step timings."""
+    return jsonify({"warmup": warmup.run(warmup_steps())}), 200
 
 
 @app.route('/interview-92a23/us-central1/health_check', methods=['GET'])
@@ -165,7 +303,20 @@ def health_check():
     """Health check endpoint."""
     return jsonify({
         "status": "healthy",
-        "services": {"groq": bool(GROQ_API_KEY), "deepgram": bool(DEEPGRAM_API_KEY), "elevenlabs": bool(ELEVENLABS_API_KEY)},
+        "services": {"groq": bool(GROQ_API_KEY), "deepgram": bool(DEEPGRAM_API_KEY), "sarvam": bool(SARVAM_API_KEY), "elevenlabs": bool(ELEVENLABS_API_KEY)},
+        "connection_pools": provider_clients.pool_stats(),
+        "tts_cache": tts_cache.stats(),
+        "history": history_window.stats(),
+        "opener_cache": opener_cache.stats(),
+        "admission": admission.stats(),
+        "vad": vad_stats.snapshot(),
+        "stt_router": stt_router.stats(),
+        "tts_router": tts_router.stats(),
+        "transcode": transcode_stats.snapshot(),
+        "fillers": filler_bank.stats(),
+        "startup": startup_profile.snapshot(),
+        "transcripts": transcript_stats(),
+        "speculation": {**speculation_stats.snapshot(), "open_turns": len(speculative_turns)},
     }), 200
 
 
@@ -175,6 +326,14 @@ def home():
     return jsonify({"message": "Interview AI Backend", "status": "running"}), 200
 
 
+if SERVED:
+    startup_profile.loaded()
+    if WARMUP_ON_START:
+        warmup.start(warmup_steps())
+
+
 if __name__ == '__main__':
+    # Exit normally on SIGTERM so atexit flushes the transcript queue (gunicorn workers use gunicorn.conf.py)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port)
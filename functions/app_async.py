@@ -0,0 +1,899 @@
+"""
+Interview AI Backend - asyncio server for Railway
+
+Serves the same routes as app.py, but every provider call is non-blocking:
+Deepgram and Sarvam go through one shared aiohttp client session, Groq through
+AsyncGroq, and Edge-TTS runs natively on the event loop. A turn spends nearly
+all of its time waiting on providers, so a single worker process can keep
+hundreds of turns in flight instead of one per sync worker.
+
+CPU-bound or blocking work (VAD decoding, session store calls) runs in the
+default thread pool.
+
+It also serves interview_session, a WebSocket that carries a whole interview
+over one connection: audio up, transcripts, text deltas and audio down.
+
+Run with:
+    gunicorn app_async:app --worker-class aiohttp.GunicornWebWorker --bind 0.0.0.0:$PORT
+    python app_async.py
+"""
+
+import os
+import json
+import base64
+import asyncio
+from functools import partial
+from typing import Optional, Tuple
+
+from startup import startup_profile, warmup, WARMUP_ON_START, WARMUP_TTS_TEXT
+startup_profile.begin("app_async")
+
+import aiohttp
+from aiohttp import web
+from groq import AsyncGroq
+startup_profile.mark("aiohttp, groq")
+
+import tts_worker
+import provider_clients
+from tts_cache import tts_cache
+from tts_router import tts_router, tts_plan, parse_allowed, TTSResult, SARVAM_MODEL, SARVAM_SAMPLE_RATE
+from streaming import stream_after_async, sse_event, SSE_HEADERS
+from history_manager import history_window
+from opener_cache import opener_cache
+from admission import admission, client_key, AdmissionRejected, Ticket
+from audio_response import audio_blobs
+from audio_codec import AudioFormat, encode_speech_async, transcode_stats
+from fillers import filler_bank, filler_payload, wants_filler, FILLER_WARM_ON_STARTUP
+from vad import preprocess_audio, vad_stats
+from upload_stream import (AudioSource, UploadTooLarge, spool_upload_async, request_body, multipart_body,
+                           MAX_UPLOAD_BYTES)
+from stt_router import stt_router
+from metrics import TurnTimer, render_metrics, PROMETHEUS_CONTENT_TYPE
+from session_store import load_chat_history, close_sessions, SESSION_TTL_SECONDS
+from transcript_store import transcript_stats, close_transcripts
+from speculative import AsyncSpeculativeTurn, speculative_turns, speculation_stats, SPECULATIVE_TURN_TTL_SECONDS
+# Prompts, turn options and the pipeline engine are shared with the sync servers; the stages here are coroutines
+from pipeline import (TurnPipeline, TurnStages, TurnContext, AsyncExecutor, save_turn, persist_turn, open_session,
+                      resume_speculative_turn, turn_response, build_messages, configured_stt_plan, SYSTEM_PROMPTS,
+                      EMPTY_TRANSCRIPT_RESPONSE, GROQ_MODEL, EDGE_VOICE, DEEPGRAM_API_KEY, SARVAM_API_KEY,
+                      GROQ_API_KEY, DEEPGRAM_BASE_URL, SARVAM_BASE_URL)
+startup_profile.mark("pipeline modules")
+
+# Keep-alive connections per provider host, shared by every in-flight turn of the worker
+ASYNC_CONNECTIONS_PER_HOST = int(os.environ.get("ASYNC_CONNECTIONS_PER_HOST", "100"))
+# Ping interval that keeps interview_session sockets open through idle proxies
+WS_HEARTBEAT_SECONDS = float(os.environ.get("WS_HEARTBEAT_SECONDS", "30"))
+
+ROUTE_PREFIX = "/interview-92a23/us-central1"
+
+# Per-worker clients, created on startup inside the worker's event loop
+provider_session = None
+edge_connector = None
+edge_semaphore = None
+groq_client = None
+in_flight_turns = 0
+open_sockets = 0
+
+routes = web.RouteTableDef()
+
+
+def get_groq_client() -> AsyncGroq:
+    global groq_client
+    if groq_client is None:
+        if not GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY not set")
+        groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+    return groq_client
+
+
+def client_timeout(stage: str) -> aiohttp.ClientTimeout:
+    """Per-stage timeouts, shared with the sync clients (STT_READ_TIMEOUT, ...)."""
+    connect, read = provider_clients.stage_timeout(stage)
+    return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+
+async def transcribe_audio(audio_data: AudioSource, language: str = "en", content_type: str = "audio/webm") -> str:
+    """Convert audio to text using Deepgram."""
+    if not DEEPGRAM_API_KEY:
+        raise ValueError("DEEPGRAM_API_KEY not set")
+
+    # Explicit Content-Length: a streamed body would otherwise be sent chunked
+    body = request_body(audio_data)
+    async with provider_session.post(
+        f"{DEEPGRAM_BASE_URL}/v1/listen",
+        params={"model": "nova-2", "smart_format": "true", "language": language},
+        headers={"Authorization": f"Token {DEEPGRAM_API_KEY}", "Content-Type": content_type, "Content-Length": str(len(body))},
+        data=body,
+        timeout=client_timeout("stt"),
+    ) as response:
+        if response.status != 200:
+            raise provider_clients.ProviderError("Deepgram", response.status, await response.text())
+        result = await response.json()
+
+    return result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
+
+
+async def transcribe_audio_sarvam(audio_data: AudioSource, language_code: str = "hi-IN", content_type: str = "audio/webm") -> str:
+    """Convert audio to text using Sarvam AI (saarika:v2.5)."""
+    if not SARVAM_API_KEY:
+        raise ValueError("SARVAM_API_KEY not set")
+
+    body, body_type = multipart_body(
+        audio_data, "audio.webm", content_type.split(";")[0].strip(),
+        {"model": "saarika:v2.5", "language_code": language_code, "with_diarization": "false"},
+    )
+    async with provider_session.post(
+        f"{SARVAM_BASE_URL}/speech-to-text",
+        headers={"api-subscription-key": SARVAM_API_KEY, "Content-Type": body_type, "Content-Length": str(len(body))},
+        data=body,
+        timeout=client_timeout("stt"),
+    ) as response:
+        if response.status != 200:
+            raise provider_clients.ProviderError("Sarvam STT API", response.status, await response.text())
+        result = await response.json()
+
+    return result.get("transcript", "")
+
+
+async def transcribe_turn_audio(audio_data: AudioSource, content_type: str, tts_provider: str, tts_language: str) -> Tuple[str, str]:
+    """
+    Trim silence (off the event loop), then transcribe with hedging / failover.
+
+    Audio with no speech skips STT. Returns (transcript, provider).
+    """
+    vad_result = await asyncio.to_thread(preprocess_audio, audio_data, content_type)
+    if not vad_result.has_speech:
+        print("No speech detected, skipping STT")
+        return "", ""
+    audio_data, content_type = vad_result.audio_data, vad_result.content_type
+
+    plan = configured_stt_plan(tts_provider, tts_language)
+    calls = []
+    for provider, language in plan:
+        if provider == "sarvam":
+            calls.append((provider, partial(transcribe_audio_sarvam, audio_data, language, content_type)))
+        else:
+            calls.append((provider, partial(transcribe_audio, audio_data, language, content_type)))
+    return await stt_router.transcribe_async(calls)
+
+
+async def generate_response(user_message: str, chat_history: list, interview_type: str = "technical") -> str:
+    """Generate AI response using Groq."""
+    # Opening turns (a greeting under a fixed system prompt) are answered from the cache
+    cached = opener_cache.get(interview_type, user_message, chat_history)
+    if cached is not None:
+        return cached
+    messages = build_messages(user_message, chat_history, interview_type)
+
+    response = await get_groq_client().chat.completions.create(
+        model=GROQ_MODEL,
+        messages=messages,
+        max_tokens=200,
+        temperature=0.7,
+    )
+
+    ai_response = response.choices[0].message.content or ""
+    opener_cache.put(interview_type, user_message, chat_history, ai_response)
+    return ai_response
+
+
+async def generate_response_stream(user_message: str, chat_history: list, interview_type: str = "technical"):
+    """Stream AI response deltas from Groq."""
+    cached = opener_cache.get(interview_type, user_message, chat_history)
+    if cached is not None:
+        yield cached
+        return
+    messages = build_messages(user_message, chat_history, interview_type)
+
+    stream = await get_groq_client().chat.completions.create(
+        model=GROQ_MODEL,
+        messages=messages,
+        max_tokens=200,
+        temperature=0.7,
+        stream=True,
+    )
+
+    deltas = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            deltas.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    opener_cache.put(interview_type, user_message, chat_history, "".join(deltas))
+
+
+async def request_speech_edge(text: str, voice: str = EDGE_VOICE) -> bytes:
+    """Edge-TTS on this worker's event loop (uncached)."""
+    try:
+        async with edge_semaphore:
+            return await asyncio.wait_for(
+                tts_worker.synthesize_async(text, voice, edge_connector),
+                tts_worker.EDGE_TTS_TIMEOUT,
+            )
+    except Exception as e:
+        raise Exception(f"Edge-TTS error: {str(e)}")
+
+
+async def request_speech_sarvam(text: str, language_code: str = "hi-IN", speaker: str = "priya") -> bytes:
+    """Sarvam AI text-to-speech (uncached)."""
+    if not SARVAM_API_KEY:
+        raise ValueError("SARVAM_API_KEY not set")
+
+    async with provider_session.post(
+        f"{SARVAM_BASE_URL}/text-to-speech",
+        headers={"api-subscription-key": SARVAM_API_KEY},
+        json={
+            "inputs": [text],
+            "target_language_code": language_code,
+            "speaker": speaker,
+            "pace": 1.0,
+            "speech_sample_rate": SARVAM_SAMPLE_RATE,
+            "enable_preprocessing": True,
+            "model": SARVAM_MODEL,
+        },
+        timeout=client_timeout("tts"),
+    ) as response:
+        if response.status != 200:
+            raise provider_clients.ProviderError("Sarvam AI API", response.status, await response.text())
+        result = await response.json()
+
+    audio_base64 = result.get("audios", [""])[0]
+    if not audio_base64:
+        raise Exception("Sarvam AI returned empty audio")
+    return base64.b64decode(audio_base64)
+
+
+TTS_SYNTHESIZERS = {
+    "edge": lambda option, text: request_speech_edge(text, option.voice),
+    "sarvam": lambda option, text: request_speech_sarvam(text, option.language, option.voice),
+}
+
+
+async def synthesize_turn_speech(text: str, tts_provider: str, tts_language: str, tts_allowed: Optional[str] = None,
+                                 audio_format: Optional[AudioFormat] = None) -> TTSResult:
+    """Synthesize the AI response, preferring the client's provider (see tts_router), in the negotiated format."""
+    options = tts_plan(
+        tts_provider,
+        tts_language,
+        {"edge": True, "sarvam": bool(SARVAM_API_KEY)},
+        parse_allowed(tts_allowed),
+    )
+    return await encode_speech_async(await tts_router.synthesize_async(text, options, TTS_SYNTHESIZERS), audio_format)
+
+
+async def transcribe_interim(audio_data: AudioSource, content_type: str, tts_provider: str, tts_language: str) -> str:
+    """Interim transcript of a streaming-input turn's audio so far (primary provider, no hedging)."""
+    plan = configured_stt_plan(tts_provider, tts_language)
+    if not plan:
+        raise ValueError("No STT provider configured")
+    provider, language = plan[0]
+    if provider == "sarvam":
+        return await transcribe_audio_sarvam(audio_data, language, content_type)
+    return await transcribe_audio(audio_data, language, content_type)
+
+
+# The shared engine with this module's coroutine stages; session writes run in a thread
+turn_pipeline = TurnPipeline(
+    TurnStages(transcribe_turn_audio, transcribe_interim, generate_response, generate_response_stream,
+               synthesize_turn_speech),
+    AsyncExecutor(),
+)
+turn_pipeline.add_hook("after_turn", save_turn)
+turn_pipeline.add_hook("after_turn", persist_turn)
+
+
+def json_error(message: str, status: int) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def error_response(e: Exception) -> web.Response:
+    """Response for an exception of a turn handler."""
+    if isinstance(e, AdmissionRejected):
+        return web.json_response(e.payload(), status=e.status, headers=e.headers())
+    if isinstance(e, UploadTooLarge):
+        return json_error(str(e), 413)
+    print(f"Error: {e}")
+    return json_error(str(e), 500)
+
+
+async def admit_turn(request: web.Request, turn: TurnContext) -> Ticket:
+    """Admit a turn on its STT provider, Groq and its TTS provider, waiting on the loop if they are at capacity."""
+    user = client_key(turn.session_id, request.headers.get('X-Forwarded-For'), request.remote)
+    return await admission.admit_async(user, turn.providers(), turn.timer)
+
+
+async def read_turn_form(request: web.Request) -> tuple:
+    """
+    (form fields, audio spool or None) of a turn upload.
+
+    The `audio` file part is copied into an upload_stream spool as it arrives
+    (UploadTooLarge past MAX_UPLOAD_BYTES) instead of being read into memory.
+    """
+    if not request.content_type.startswith("multipart/"):
+        return dict(await request.post()), None
+    fields, audio, field_bytes = {}, None, 0
+    reader = await request.multipart()
+    async for part in reader:
+        if part.name == 'audio' and part.filename is not None:
+            audio = await spool_upload_async(part, part.headers.get(aiohttp.hdrs.CONTENT_TYPE) or 'audio/webm')
+        else:
+            value = await part.text()
+            field_bytes += len(value)
+            if field_bytes > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge(f"Form fields exceed {MAX_UPLOAD_BYTES} bytes")
+            fields[part.name] = value
+    return fields, audio
+
+
+async def parse_turn(request: web.Request, timer: TurnTimer):
+    """(TurnContext, form fields, None) for a turn upload, or (None, None, error response)."""
+    form, audio_data = await read_turn_form(request)
+    turn = TurnContext.from_params(form, request.headers.get('Accept'), timer)
+    if audio_data is None:
+        return None, None, json_error("No audio file", 400)
+    turn.chat_history = await asyncio.to_thread(load_chat_history, turn.session_id, form.get('history'))
+    if turn.chat_history is None:
+        return None, None, json_error("Session not found or expired", 404)
+    turn.audio_data, turn.content_type = audio_data, audio_data.content_type
+    timer.lap("parse")
+    return turn, form, None
+
+
+def reply_response(request: web.Request, turn: TurnContext, response_mode) -> web.Response:
+    """Non-streaming response of a finished turn (JSON+base64, binary, multipart or short-lived URL)."""
+    if not turn.user_transcript.strip():
+        return web.json_response(EMPTY_TRANSCRIPT_RESPONSE, headers=turn.timer.headers())
+    body, response_type, headers = turn_response(
+        turn,
+        response_mode,
+        request.headers.get('Accept'),
+        audio_url_base=str(request.url.with_query(None)).rsplit('/', 1)[0] + '/get_audio',
+    )
+    return web.Response(body=body, status=200, headers={"Content-Type": response_type, **headers})
+
+
+async def reply_events(turn: TurnContext, filler_requested):
+    """SSE events of a turn; with a filler the stream opens right away and STT runs inside it."""
+    filler = turn_pipeline.filler(turn) if wants_filler(filler_requested) else None
+    if filler is not None:
+        return stream_after_async(sse_event("filler", filler_payload(filler)), partial(turn_pipeline.stream_async, turn))
+    return await turn_pipeline.stream_async(turn)
+
+
+async def write_events(request: web.Request, timer: TurnTimer, events) -> web.StreamResponse:
+    # Only the pre-stream spans fit in the header; LLM/TTS spans go to /metrics
+    response = web.StreamResponse(
+        status=200,
+        headers={"Content-Type": "text/event-stream", **SSE_HEADERS, **timer.headers()},
+    )
+    await response.prepare(request)
+    async for event in events:
+        await response.write(event.encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+@routes.post(f"{ROUTE_PREFIX}/process_interview_turn")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/process_interview_turn")
+async def process_interview_turn(request: web.Request) -> web.StreamResponse:
+    """Process a single interview turn."""
+    global in_flight_turns
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    in_flight_turns += 1
+    ticket = None
+    try:
+        turn, form, error = await parse_turn(request, TurnTimer())
+        if error is not None:
+            return error
+        ticket = await admit_turn(request, turn)
+        turn.timer.lap("audio_read")
+        await turn_pipeline.run_async(turn)
+        return reply_response(request, turn, form.get('response_mode'))
+    except Exception as e:
+        return error_response(e)
+    finally:
+        in_flight_turns -= 1
+        if ticket is not None:
+            ticket.release()
+
+
+@routes.post(f"{ROUTE_PREFIX}/process_interview_turn_stream")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/process_interview_turn_stream")
+async def process_interview_turn_stream(request: web.Request) -> web.StreamResponse:
+    """Streaming variant of process_interview_turn (Server-Sent Events)."""
+    global in_flight_turns
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    in_flight_turns += 1
+    ticket = None
+    try:
+        try:
+            turn, form, error = await parse_turn(request, TurnTimer())
+            if error is not None:
+                return error
+            ticket = await admit_turn(request, turn)
+            turn.timer.lap("audio_read")
+            events = await reply_events(turn, form.get('filler'))
+        except Exception as e:
+            return error_response(e)
+        return await write_events(request, turn.timer, events)
+    finally:
+        in_flight_turns -= 1
+        if ticket is not None:
+            ticket.release()
+
+
+async def read_params(request: web.Request):
+    if request.content_type == "application/json":
+        return await request.json()
+    return await request.post()
+
+
+@routes.post(f"{ROUTE_PREFIX}/begin_turn")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/begin_turn")
+async def begin_turn(request: web.Request) -> web.Response:
+    """Open a streaming-input turn; the recorder's chunks follow on append_turn_audio."""
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    params = await read_params(request)
+    turn = TurnContext.from_params(params, request.headers.get('Accept'), TurnTimer())
+    turn.chat_history = await asyncio.to_thread(load_chat_history, turn.session_id, params.get('history'))
+    if turn.chat_history is None:
+        return json_error("Session not found or expired", 404)
+
+    speculative = turn_pipeline.speculative_turn(turn, params.get('content_type', 'audio/webm'), AsyncSpeculativeTurn)
+    speculative_turns.put(speculative)
+    return web.json_response({"turn_id": speculative.turn_id, "expires_in": SPECULATIVE_TURN_TTL_SECONDS})
+
+
+@routes.post(f"{ROUTE_PREFIX}/append_turn_audio")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/append_turn_audio")
+async def append_turn_audio(request: web.Request) -> web.Response:
+    """Append a raw audio chunk (request body) to the turn given by ?turn_id=."""
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    speculative = speculative_turns.get(request.query.get('turn_id', ''))
+    if speculative is None:
+        return json_error("Turn not found or expired", 404)
+    try:
+        speculative.feed(await request.read())
+    except UploadTooLarge as e:
+        return json_error(str(e), 413)
+    return web.json_response({
+        "received": speculative.size,
+        "interim_transcript": speculative.interim_transcript,
+        "speculating": speculative.speculation is not None,
+    })
+
+
+async def resume_turn(request: web.Request, params, timer: TurnTimer):
+    """
+    (TurnContext, ticket, None) of a streaming-input turn closed by finish_turn*,
+    admitted like a turn upload (raises AdmissionRejected), or (None, None, error response).
+    """
+    speculative = speculative_turns.pop(params.get('turn_id', ''))
+    if speculative is None:
+        return None, None, json_error("Turn not found or expired", 404)
+    timer.lap("parse")
+    turn = resume_speculative_turn(speculative, timer)
+    try:
+        ticket = await admit_turn(request, turn)
+    except (AdmissionRejected, asyncio.CancelledError):
+        speculative.cancel()
+        raise
+    return turn, ticket, None
+
+
+@routes.post(f"{ROUTE_PREFIX}/finish_turn")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/finish_turn")
+async def finish_turn(request: web.Request) -> web.Response:
+    """Close a streaming-input turn and respond like process_interview_turn."""
+    global in_flight_turns
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    in_flight_turns += 1
+    ticket = None
+    try:
+        params = await read_params(request)
+        turn, ticket, error = await resume_turn(request, params, TurnTimer())
+        if error is not None:
+            return error
+        # The reply usually was already generated while the candidate was finishing the answer
+        await turn_pipeline.run_async(turn)
+        return reply_response(request, turn, params.get('response_mode'))
+    except Exception as e:
+        return error_response(e)
+    finally:
+        in_flight_turns -= 1
+        if ticket is not None:
+            ticket.release()
+
+
+@routes.post(f"{ROUTE_PREFIX}/finish_turn_stream")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/finish_turn_stream")
+async def finish_turn_stream(request: web.Request) -> web.StreamResponse:
+    """Close a streaming-input turn and stream the reply like process_interview_turn_stream."""
+    global in_flight_turns
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    in_flight_turns += 1
+    ticket = None
+    try:
+        try:
+            params = await read_params(request)
+            turn, ticket, error = await resume_turn(request, params, TurnTimer())
+            if error is not None:
+                return error
+            events = await reply_events(turn, params.get('filler'))
+        except Exception as e:
+            return error_response(e)
+        return await write_events(request, turn.timer, events)
+    finally:
+        in_flight_turns -= 1
+        if ticket is not None:
+            ticket.release()
+
+
+def socket_event(event: str, data: dict) -> tuple:
+    """stream_turn_async event format of interview_session: (event, data) with audio left as bytes."""
+    return event, data
+
+
+class SocketSession:
+    """
+    One interview over a WebSocket (see interview_session).
+
+    The options and chat history of the start message are kept for the whole
+    connection, so turns carry only audio. Each turn is recorded into an
+    AsyncSpeculativeTurn (interim transcripts, speculative replies) and its
+    reply streams as a task that a barge-in cancels.
+    """
+
+    def __init__(self, request: web.Request, ws: web.WebSocketResponse, params: dict, chat_history: list):
+        self.request = request
+        self.ws = ws
+        self.params = params
+        self.chat_history = chat_history
+        self.recording: Optional[AsyncSpeculativeTurn] = None
+        self.reply: Optional[asyncio.Task] = None
+        self.turns = 0
+        self._sent_interim = ""
+
+    async def send(self, event: str, data: dict):
+        """A JSON message; audio follows it as a binary frame of `bytes` bytes."""
+        if self.ws.closed:
+            return
+        if "audio" in data:
+            header = {key: value for key, value in data.items() if key != "audio"}
+            await self.ws.send_json({"type": event, **header, "bytes": len(data["audio"])})
+            await self.ws.send_bytes(data["audio"])
+        else:
+            await self.ws.send_json({"type": event, **data})
+
+    async def feed(self, chunk: bytes):
+        """Append a mic frame to the turn being recorded (opened by its first frame)."""
+        if self.recording is None:
+            turn = TurnContext.from_params(self.params, None, TurnTimer())
+            turn.chat_history = list(self.chat_history)
+            self.recording = turn_pipeline.speculative_turn(turn, self.params.get('content_type', 'audio/webm'),
+                                                            AsyncSpeculativeTurn)
+            self._sent_interim = ""
+        self.recording.feed(chunk)
+        if self.recording.interim_transcript != self._sent_interim:
+            self._sent_interim = self.recording.interim_transcript
+            await self.send("interim", {"transcript": self._sent_interim})
+
+    async def end_turn(self):
+        """The candidate finished speaking: admit the turn and stream its reply in a task."""
+        speculative, self.recording = self.recording, None
+        if speculative is None:
+            await self.send("error", {"error": "No audio"})
+            return
+        # A reply still playing is superseded by the new answer
+        await self.barge_in(notify=False)
+        self.turns += 1
+        turn = resume_speculative_turn(speculative, TurnTimer())
+        # Admission may queue, so it runs in the task: the socket keeps reading barge_in and mic frames
+        self.reply = asyncio.ensure_future(self.respond(turn, speculative))
+
+    async def respond(self, turn: TurnContext, speculative: AsyncSpeculativeTurn):
+        global in_flight_turns
+        try:
+            ticket = await admit_turn(self.request, turn)
+        except AdmissionRejected as e:
+            speculative.cancel()
+            await self.send("error", e.payload())
+            return
+        except asyncio.CancelledError:
+            speculative.cancel()
+            raise
+        in_flight_turns += 1
+        deltas, events, completed = [], None, False
+        try:
+            picked = turn_pipeline.filler(turn) if wants_filler(self.params.get('filler')) else None
+            if picked is not None:
+                phrase, result = picked
+                await self.send("filler", {"text": phrase, "audio": result.audio, "audio_mime": result.mime_type})
+            events = await turn_pipeline.stream_async(turn, event_format=socket_event)
+            async for event, data in events:
+                if event == "text":
+                    deltas.append(data["delta"])
+                elif event == "done":
+                    completed = True
+                await self.send(event, data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error streaming interview turn: {e}")
+            await self.send("error", {"error": str(e)})
+        finally:
+            in_flight_turns -= 1
+            ticket.release()
+            if events is not None:
+                await events.aclose()
+            if turn.speculation is not None:
+                turn.speculation.cancel()
+            # Interrupted replies stay in the history as far as they were streamed, and are
+            # saved and persisted like that, so the stored session matches what the LLM saw
+            if turn.user_transcript.strip():
+                if not completed:
+                    await turn_pipeline.interrupted_async(turn, "".join(deltas))
+                self.chat_history.append({"role": "user", "content": turn.user_transcript})
+                self.chat_history.append({"role": "assistant", "content": turn.ai_response_text})
+
+    async def barge_in(self, notify: bool = True):
+        """Cancel the reply in flight: its LLM stream and the sentences still being synthesized."""
+        reply, self.reply = self.reply, None
+        if reply is None or reply.done():
+            return
+        reply.cancel()
+        try:
+            await reply
+        except asyncio.CancelledError:
+            pass
+        if notify:
+            await self.send("cancelled", {"turn": self.turns})
+
+    async def close(self):
+        reply, self.reply = self.reply, None
+        if reply is not None:
+            reply.cancel()
+        if self.recording is not None:
+            self.recording.cancel()
+
+
+async def open_socket_session(request: web.Request, ws: web.WebSocketResponse, params: dict) -> Optional[SocketSession]:
+    """The session of a start message, or None (after an error message) if its session is unknown."""
+    chat_history = await asyncio.to_thread(load_chat_history, params.get('session_id'), params.get('history'))
+    if chat_history is None:
+        await ws.send_json({"type": "error", "error": "Session not found or expired"})
+        return None
+    return SocketSession(request, ws, params, chat_history)
+
+
+@routes.get(f"{ROUTE_PREFIX}/interview_session")
+async def interview_session(request: web.Request) -> web.WebSocketResponse:
+    """
+    Full-duplex interview over one WebSocket.
+
+    Client -> server: a `start` JSON message (the turn options of begin_turn),
+    then per turn binary mic frames and `turn_end`; `barge_in` cancels the
+    reply being played, `end` closes the session.
+    Server -> client: `ready`, `interim` transcripts while recording, then the
+    events of process_interview_turn_stream as JSON messages, with each
+    `filler` / `audio` message followed by a binary frame of its audio.
+    """
+    global open_sockets
+    ws = web.WebSocketResponse(heartbeat=WS_HEARTBEAT_SECONDS)
+    await ws.prepare(request)
+    open_sockets += 1
+    session = None
+    try:
+        async for message in ws:
+            if message.type == aiohttp.WSMsgType.BINARY:
+                if session is None:
+                    await ws.send_json({"type": "error", "error": "Send a start message first"})
+                    continue
+                try:
+                    await session.feed(message.data)
+                except UploadTooLarge as e:
+                    session.recording = None
+                    await session.send("error", {"error": str(e)})
+            elif message.type == aiohttp.WSMsgType.TEXT:
+                try:
+                    params = json.loads(message.data)
+                except json.JSONDecodeError:
+                    await ws.send_json({"type": "error", "error": "Invalid JSON message"})
+                    continue
+                kind = params.get('type')
+                if kind == 'start':
+                    if session is not None:
+                        await session.close()
+                    session = await open_socket_session(request, ws, params)
+                    if session is not None:
+                        await ws.send_json({"type": "ready", "history_messages": len(session.chat_history)})
+                elif session is None:
+                    await ws.send_json({"type": "error", "error": "Send a start message first"})
+                elif kind == 'turn_end':
+                    await session.end_turn()
+                elif kind == 'barge_in':
+                    await session.barge_in()
+                elif kind == 'end':
+                    break
+                else:
+                    await session.send("error", {"error": f"Unknown message type '{kind}'"})
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                print(f"WebSocket error: {ws.exception()}")
+    finally:
+        open_sockets -= 1
+        if session is not None:
+            await session.close()
+    await ws.close()
+    return ws
+
+
+@routes.get(f"{ROUTE_PREFIX}/filler")
+async def filler(request: web.Request) -> web.Response:
+    """A pre-synthesized filler phrase to play while a non-streaming turn is processed (204 until ready)."""
+    picked = turn_pipeline.filler(TurnContext.from_params(request.query, request.headers.get('Accept'), TurnTimer()))
+    if picked is None:
+        return web.Response(status=204)
+    return web.json_response(filler_payload(picked))
+
+
+async def warm_provider(base_url: str):
+    """Open a keep-alive connection to a provider host (DNS + TLS) in the worker's session."""
+    async with provider_session.head(base_url, timeout=client_timeout("stt")) as response:
+        await response.read()
+
+
+def warmup_steps() -> dict:
+    """
+    What the first turn of a fresh worker would otherwise pay for: provider
+    connections, prompt building and the Edge-TTS connector.
+    """
+    async def build_prompts():
+        return [build_messages("Hello", [], interview_type) for interview_type in SYSTEM_PROMPTS]
+
+    steps = {
+        "groq": lambda: get_groq_client().models.list(),
+        "prompts": build_prompts,
+        "tts": lambda: synthesize_turn_speech(WARMUP_TTS_TEXT, "edge", EDGE_VOICE),
+    }
+    if DEEPGRAM_API_KEY:
+        steps["deepgram"] = partial(warm_provider, DEEPGRAM_BASE_URL)
+    if SARVAM_API_KEY:
+        steps["sarvam"] = partial(warm_provider, SARVAM_BASE_URL)
+    return steps
+
+
+@routes.get(f"{ROUTE_PREFIX}/warmup")
+@routes.post(f"{ROUTE_PREFIX}/warmup")
+async def warmup_route(request: web.Request) -> web.Response:
+    """Run the warm-up once per worker and report its step timings."""
+    return web.json_response({"warmup": await warmup.run_async(warmup_steps())})
+
+
+@routes.get(f"{ROUTE_PREFIX}/get_audio")
+async def get_audio(request: web.Request) -> web.Response:
+    """Serve a short-lived audio blob produced by a turn in "url" response mode."""
+    blob = audio_blobs.get(request.query.get('id', ''))
+    if blob is None:
+        return json_error("Audio not found or expired", 404)
+    audio_bytes, mime_type = blob
+    return web.Response(body=audio_bytes, headers={"Content-Type": mime_type, "Cache-Control": "private, max-age=60"})
+
+
+@routes.post(f"{ROUTE_PREFIX}/create_session")
+@routes.route("OPTIONS", f"{ROUTE_PREFIX}/create_session")
+async def create_session(request: web.Request) -> web.Response:
+    """Create a server-side interview session (history is kept on the server)."""
+    if request.method == 'OPTIONS':
+        return web.Response(status=204)
+
+    session = await asyncio.to_thread(open_session, await read_params(request))
+    return web.json_response({"session_id": session["session_id"], "expires_in": SESSION_TTL_SECONDS})
+
+
+@routes.get("/metrics")
+@routes.get(f"{ROUTE_PREFIX}/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus-style per-stage latency histograms."""
+    return web.Response(body=render_metrics(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+
+@routes.get(f"{ROUTE_PREFIX}/health_check")
+async def health_check(request: web.Request) -> web.Response:
+    """Health check endpoint."""
+    return web.json_response({
+        "status": "healthy",
+        "mode": "async",
+        "services": {"groq": bool(GROQ_API_KEY), "deepgram": bool(DEEPGRAM_API_KEY), "sarvam": bool(SARVAM_API_KEY)},
+        "in_flight_turns": in_flight_turns,
+        "open_sockets": open_sockets,
+        "tts_cache": tts_cache.stats(),
+        "history": history_window.stats(),
+        "opener_cache": opener_cache.stats(),
+        "admission": admission.stats(),
+        "vad": vad_stats.snapshot(),
+        "stt_router": stt_router.stats(),
+        "tts_router": tts_router.stats(),
+        "transcode": transcode_stats.snapshot(),
+        "fillers": filler_bank.stats(),
+        "speculation": {**speculation_stats.snapshot(), "open_turns": len(speculative_turns)},
+        "startup": startup_profile.snapshot(),
+        "transcripts": transcript_stats(),
+    })
+
+
+@routes.get("/")
+async def home(request: web.Request) -> web.Response:
+    """Root endpoint."""
+    return web.json_response({"message": "Interview AI Backend", "status": "running"})
+
+
+async def add_cors_headers(request: web.Request, response: web.StreamResponse):
+    """Allow all origins (same policy as the Flask app)."""
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    if request.method == "OPTIONS":
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "*")
+
+
+async def start_clients(app: web.Application):
+    global provider_session, edge_connector, edge_semaphore
+    provider_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0, limit_per_host=ASYNC_CONNECTIONS_PER_HOST, ttl_dns_cache=300),
+    )
+    edge_connector = tts_worker.SharedConnector(ttl_dns_cache=300)
+    edge_semaphore = asyncio.Semaphore(tts_worker.EDGE_TTS_CONCURRENCY)
+
+
+async def warm_fillers(app: web.Application):
+    """Synthesize the filler phrases for the web client's default voice and format in the background."""
+    if FILLER_WARM_ON_STARTUP:
+        turn_pipeline.warm_fillers()
+
+
+async def warm_on_start(app: web.Application):
+    """Run the warm-up in the background once the clients exist (WARMUP_ON_START)."""
+    if WARMUP_ON_START:
+        asyncio.ensure_future(warmup.run_async(warmup_steps()))
+
+
+async def close_clients(app: web.Application):
+    global groq_client
+    await provider_session.close()
+    await edge_connector.shutdown()
+    if groq_client is not None:
+        await groq_client.close()
+        groq_client = None
+    # Commit the session appends and transcripts still queued before the worker exits
+    await asyncio.to_thread(close_sessions)
+    await asyncio.to_thread(close_transcripts)
+
+
+def create_app() -> web.Application:
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app.add_routes(routes)
+    app.on_startup.append(start_clients)
+    app.on_startup.append(warm_fillers)
+    app.on_startup.append(warm_on_start)
+    app.on_cleanup.append(close_clients)
+    app.on_response_prepare.append(add_cors_headers)
+    return app
+
+
+app = create_app()
+startup_profile.loaded()
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5001))
+    web.run_app(app, host='0.0.0.0', port=port)
@@ -0,0 +1,226 @@
+"""
+Negotiated output format for synthesized reply audio.
+
+Clients pick the codec of the reply audio with the `audio_format` form field,
+or (binary responses) through the Accept header:
+- "opus" / "opus:<kbps>": Opus in WebM, 24kbps by default (~3KB per second of speech)
+- "mp3" / "mp3:<kbps>": MP3 at 32, 48 (Edge-TTS' native rate), 64, 96 or 128kbps
+- "pcm" / "pcm:<rate>": raw 16-bit mono PCM (audio/L16), 24kHz by default, for Web Audio playback
+- "wav": the same PCM in a WAV container
+Without one, the provider's audio is returned as is (Edge-TTS MP3, Sarvam WAV).
+
+At most TRANSCODE_WORKERS ffmpeg encoders run at once, so a burst of turns
+never runs more encoders than the host has cores for: the sync servers encode
+on the request thread under a semaphore, the async server awaits a thread pool
+of that size without blocking its event loop. Encoded audio is cached by
+(source audio, format) in its own byte-bounded LRU (transcode_cache, reported
+with the transcode stats rather than as TTS cache hits), so repeated phrases
+are encoded once.
+When ffmpeg is missing or fails, the provider's audio is returned with its own
+MIME type: audio_mime always describes the bytes actually sent.
+"""
+
+import os
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from tts_cache import TTSCache
+from tts_router import TTSResult
+from vad import FFMPEG, WavLayout, run_ffmpeg, wav_header
+
+TRANSCODE_WORKERS = int(os.environ.get("TRANSCODE_WORKERS", str(os.cpu_count() or 2)))
+DEFAULT_OPUS_KBPS = int(os.environ.get("DEFAULT_OPUS_KBPS", "24"))
+MP3_BITRATES = (32, 48, 64, 96, 128)
+NATIVE_MP3_KBPS = 48  # Edge-TTS
+DEFAULT_PCM_RATE = 24000
+TRANSCODE_CACHE_MAX_BYTES = int(os.environ.get("TRANSCODE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Encoders of the async server; the sync servers' request threads take a slot of the semaphore instead
+_transcode_pool = ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix="transcode")
+_transcode_slots = threading.BoundedSemaphore(TRANSCODE_WORKERS)
+
+# Encoded reply audio, kept apart from tts_cache so codec hits don't count as TTS hits
+transcode_cache = TTSCache(max_bytes=TRANSCODE_CACHE_MAX_BYTES, disk_dir=None)
+
+
+class AudioFormat(NamedTuple):
+    name: str  # "opus:24", "mp3:48", "pcm:24000", "wav:24000"
+    mime_type: str
+    ffmpeg_args: tuple
+
+
+def opus_format(kbps: int = DEFAULT_OPUS_KBPS) -> AudioFormat:
+    kbps = min(max(kbps, 6), 128)
+    return AudioFormat(f"opus:{kbps}", "audio/webm;codecs=opus",
+                       ("-ac", "1", "-c:a", "libopus", "-b:a", f"{kbps}k", "-application", "voip", "-f", "webm"))
+
+
+def mp3_format(kbps: int = NATIVE_MP3_KBPS) -> AudioFormat:
+    kbps = min(MP3_BITRATES, key=lambda rate: abs(rate - kbps))
+    return AudioFormat(f"mp3:{kbps}", "audio/mpeg", ("-ac", "1", "-c:a", "libmp3lame", "-b:a", f"{kbps}k", "-f", "mp3"))
+
+
+def pcm_format(rate: int = DEFAULT_PCM_RATE) -> AudioFormat:
+    return AudioFormat(f"pcm:{rate}", f"audio/L16;rate={rate};channels=1", ("-ac", "1", "-ar", str(rate), "-f", "s16be"))
+
+
+def wav_format(rate: int = DEFAULT_PCM_RATE) -> AudioFormat:
+    # Raw PCM; the header is written by transcode (ffmpeg can't fill in the sizes on a pipe)
+    return AudioFormat(f"wav:{rate}", "audio/wav", ("-ac", "1", "-ar", str(rate), "-f", "s16le"))
+
+
+FORMAT_BUILDERS = {"opus": opus_format, "mp3": mp3_format, "pcm": pcm_format, "wav": wav_format}
+
+# Accept header media types, checked in order
+ACCEPT_FORMATS = (
+    ("audio/webm", "opus"),
+    ("audio/ogg", "opus"),
+    ("audio/l16", "pcm"),
+    ("audio/wav", "wav"),
+    ("audio/mpeg", "mp3"),
+)
+
+
+def parse_audio_format(value: Optional[str]) -> Optional[AudioFormat]:
+    """AudioFormat for an `audio_format` value such as "opus", "mp3:32" or "pcm:16000"; None if absent or unknown."""
+    if not value:
+        return None
+    name, _, parameter = value.strip().lower().partition(":")
+    builder = FORMAT_BUILDERS.get(name)
+    if builder is None:
+        print(f"Unknown audio_format '{value}', sending the provider's audio")
+        return None
+    if not parameter:
+        return builder()
+    try:
+        return builder(int(parameter.rstrip("k")))
+    except ValueError:
+        print(f"Invalid audio_format parameter '{value}', using the {name} default")
+        return builder()
+
+
+def negotiate_audio_format(requested: Optional[str], accept: Optional[str]) -> Optional[AudioFormat]:
+    """Pick the output format from the explicit form field, falling back to the Accept header."""
+    if requested:
+        return parse_audio_format(requested)
+    accept = (accept or "").lower()
+    for media_type, name in ACCEPT_FORMATS:
+        if media_type in accept:
+            return FORMAT_BUILDERS[name]()
+    return None
+
+
+def is_native(result: TTSResult, audio_format: AudioFormat) -> bool:
+    """Whether the provider's audio already is in the requested format (no re-encoding)."""
+    if audio_format.name == f"mp3:{NATIVE_MP3_KBPS}":
+        return result.mime_type == "audio/mpeg" and result.provider == "edge"
+    return False
+
+
+def transcode_key(audio: bytes, audio_format: AudioFormat) -> str:
+    return hashlib.sha256(audio + b"\x1f" + audio_format.name.encode("utf-8")).hexdigest()
+
+
+class TranscodeStats:
+    """Process-wide transcoding counters for health_check."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.transcoded = 0
+        self.cached = 0
+        self.passthrough = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, outcome: str, bytes_in: int = 0, bytes_out: int = 0):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": TRANSCODE_WORKERS,
+                "ffmpeg": bool(FFMPEG),
+                "transcoded": self.transcoded,
+                "cached": self.cached,
+                "passthrough": self.passthrough,
+                "failed": self.failed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "cache": transcode_cache.stats(),
+            }
+
+
+transcode_stats = TranscodeStats()
+
+
+def transcode(audio: bytes, audio_format: AudioFormat) -> bytes:
+    """Encode audio to the format with ffmpeg."""
+    encoded = b"".join(run_ffmpeg(list(audio_format.ffmpeg_args), audio))
+    if not encoded:
+        raise Exception(f"ffmpeg produced no {audio_format.name} audio")
+    if audio_format.mime_type == "audio/wav":
+        rate = int(audio_format.name.partition(":")[2])
+        encoded = wav_header(WavLayout(1, rate, 2, 44, len(encoded)), len(encoded)) + encoded
+    return encoded
+
+
+def _plan(result: TTSResult, audio_format: Optional[AudioFormat]):
+    """(cache key, cached audio) for a result that needs encoding, or None to send it as is."""
+    if audio_format is None or not result.audio:
+        return None
+    if is_native(result, audio_format) or not FFMPEG:
+        transcode_stats.record("passthrough")
+        return None
+    key = transcode_key(result.audio, audio_format)
+    return key, transcode_cache.get(key)
+
+
+def _encoded(result: TTSResult, audio_format: AudioFormat, key: str, audio: bytes, cached: bool) -> TTSResult:
+    if cached:
+        transcode_stats.record("cached", len(result.audio), len(audio))
+    else:
+        transcode_cache.put(key, audio)
+        transcode_stats.record("transcoded", len(result.audio), len(audio))
+    return result._replace(audio=audio, mime_type=audio_format.mime_type)
+
+
+def encode_speech(result: TTSResult, audio_format: Optional[AudioFormat]) -> TTSResult:
+    """The TTS result in the negotiated format (or unchanged if none, native, or transcoding fails)."""
+    plan = _plan(result, audio_format)
+    if plan is None:
+        return result
+    key, audio = plan
+    if audio is not None:
+        return _encoded(result, audio_format, key, audio, cached=True)
+    try:
+        with _transcode_slots:
+            audio = transcode(result.audio, audio_format)
+    except Exception as e:
+        print(f"Transcoding to {audio_format.name} failed, sending {result.mime_type}: {e}")
+        transcode_stats.record("failed")
+        return result
+    return _encoded(result, audio_format, key, audio, cached=False)
+
+
+async def encode_speech_async(result: TTSResult, audio_format: Optional[AudioFormat]) -> TTSResult:
+    """encode_speech for the async server (awaits the transcode pool)."""
+    plan = _plan(result, audio_format)
+    if plan is None:
+        return result
+    key, audio = plan
+    if audio is not None:
+        return _encoded(result, audio_format, key, audio, cached=True)
+    try:
+        audio = await asyncio.wrap_future(_transcode_pool.submit(transcode, result.audio, audio_format))
+    except Exception as e:
+        print(f"Transcoding to {audio_format.name} failed, sending {result.mime_type}: {e}")
+        transcode_stats.record("failed")
+        return result
+    return _encoded(result, audio_format, key, audio, cached=False)
@@ -0,0 +1,124 @@
+"""
+Response encodings for a completed interview turn.
+
+Modes (`response_mode` form field, or negotiated from the Accept header):
+- "json" (default): legacy JSON body with `audio_base64`, kept for older clients
+- "binary": raw audio body; transcript/response text in the X-Turn-Metadata header
+- "multipart": multipart/mixed with a JSON metadata part and an audio part
+- "url": JSON metadata with a short-lived `audio_url` served from an in-memory blob store
+
+Note: the blob store is per process, so "url" mode needs a single worker or
+sticky routing to fetch the audio from the worker that produced it. The
+Firebase functions (one instance per function) answer "url" requests as "json".
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+RESPONSE_MODES = ("json", "binary", "multipart", "url")
+AUDIO_BLOB_TTL_SECONDS = int(os.environ.get("AUDIO_BLOB_TTL_SECONDS", "120"))
+AUDIO_BLOB_MAX_BYTES = int(os.environ.get("AUDIO_BLOB_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Headers the browser may read from a binary response (CORS)
+EXPOSED_HEADERS = "X-Turn-Metadata"
+
+
+def negotiate_response_mode(requested: Optional[str], accept: Optional[str]) -> str:
+    """Pick the response mode from the explicit form field, falling back to the Accept header."""
+    if requested in RESPONSE_MODES:
+        return requested
+    accept = accept or ""
+    if "multipart/mixed" in accept:
+        return "multipart"
+    if "audio/" in accept and "application/json" not in accept:
+        return "binary"
+    return "json"
+
+
+class AudioBlobStore:
+    """Short-lived in-memory audio blobs, bounded by total bytes."""
+
+    def __init__(self, ttl_seconds: int = AUDIO_BLOB_TTL_SECONDS, max_bytes: int = AUDIO_BLOB_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._blobs: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Oldest first: expired entries, then anything over the byte budget
+        while self._blobs:
+            blob_id, (created, audio, _) = next(iter(self._blobs.items()))
+            if now - created <= self.ttl_seconds and self._size <= self.max_bytes:
+                break
+            del self._blobs[blob_id]
+            self._size -= len(audio)
+
+    def put(self, audio: bytes, mime_type: str) -> str:
+        blob_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._blobs[blob_id] = (now, audio, mime_type)
+            self._size += len(audio)
+            self._evict(now)
+        return blob_id
+
+    def get(self, blob_id: str) -> Optional[Tuple[bytes, str]]:
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._blobs.get(blob_id)
+            if entry is None:
+                return None
+            return entry[1], entry[2]
+
+
+# Process-wide blob store for "url" mode
+audio_blobs = AudioBlobStore()
+
+
+def build_turn_response(mode: str, metadata: dict, audio_bytes: bytes, mime_type: str,
+                        audio_url_base: str = "") -> Tuple[bytes, str, dict]:
+    """
+    Encode a turn result. Returns (body, content_type, extra_headers).
+
+    metadata holds user_transcript / ai_response_text (and tts_error if any).
+    audio_url_base is the get_audio endpoint URL, used in "url" mode.
+    """
+    if mode == "binary":
+        return audio_bytes, mime_type, {
+            "X-Turn-Metadata": quote(json.dumps(metadata)),
+            "Access-Control-Expose-Headers": EXPOSED_HEADERS,
+        }
+
+    if mode == "multipart":
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode("utf-8"),
+            json.dumps(metadata).encode("utf-8"),
+            f"\r\n--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n".encode("utf-8"),
+            audio_bytes,
+            f"\r\n--{boundary}--\r\n".encode("utf-8"),
+        ])
+        return body, f"multipart/mixed; boundary={boundary}", {}
+
+    if mode == "url":
+        payload = dict(metadata)
+        payload["audio_mime"] = mime_type
+        payload["audio_base64"] = ""
+        if audio_bytes:
+            blob_id = audio_blobs.put(audio_bytes, mime_type)
+            payload["audio_url"] = f"{audio_url_base}?id={blob_id}"
+        return json.dumps(payload).encode("utf-8"), "application/json", {}
+
+    payload = dict(metadata)
+    payload["audio_base64"] = base64.b64encode(audio_bytes).decode("utf-8")
+    payload["audio_mime"] = mime_type
+    return json.dumps(payload).encode("utf-8"), "application/json", {}
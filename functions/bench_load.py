@@ -0,0 +1,675 @@
+"""
+Offline load test for the turn pipeline (app.py) against local stub providers.
+
+Starts stub Deepgram, Sarvam and Groq endpoints on a local HTTP server,
+replaces Edge-TTS with a simulated audio stream, runs app.py under gunicorn
+and drives concurrent interview sessions at a target request rate. No network
+or API keys are needed.
+
+Reports throughput, p50/p95/p99 per pipeline stage (read from the
+Server-Timing header of each turn) and resident memory per gunicorn worker.
+
+Usage:
+    python bench_load.py                                    # 2 workers, 5 turns/s for 30s
+    python bench_load.py -w 4 --rps 20 --sessions 40 -d 60
+    python bench_load.py --stt-latency 0.4 --llm-latency 0.8 --jitter 0.3 --failure-rate 0.02
+    python bench_load.py --stream                           # process_interview_turn_stream
+    python bench_load.py --speculative -w 1 --threads 32     # chunked upload, speculative LLM
+    python bench_load.py --async -w 1 --rps 50 --sessions 200   # app_async.py (aiohttp worker)
+    python bench_load.py --stubs-only                       # just the stubs, prints the env to export
+    python bench_load.py --target http://localhost:8080     # an already running server
+
+With --target the Edge-TTS stub can't be installed in the remote process, so
+Edge-TTS calls go to the live service; memory is only reported for the
+gunicorn workers this script starts itself.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import queue
+import random
+import base64
+import asyncio
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+TURN_PATH = "/interview-92a23/us-central1/process_interview_turn"
+BEGIN_TURN_PATH = "/interview-92a23/us-central1/begin_turn"
+APPEND_AUDIO_PATH = "/interview-92a23/us-central1/append_turn_audio"
+FINISH_TURN_PATH = "/interview-92a23/us-central1/finish_turn"
+
+TRANSCRIPTS = [
+    "I would start by clarifying the requirements and the expected traffic.",
+    "In my last role I led the migration of our billing service to Kubernetes.",
+    "The main trade-off is consistency versus latency, so I would add a cache in front of the database.",
+    "I disagreed with my manager once about the release date and we agreed to cut scope instead.",
+]
+
+QUESTIONS = [
+    "That makes sense. How would you handle a sudden spike in traffic?",
+    "Interesting. What was the hardest part of that migration, and how did you measure success?",
+    "Good. Where would the cache sit, and how would you keep it from serving stale data?",
+    "Thanks for sharing. What would you do differently if the same situation happened again?",
+]
+
+# Share of the LLM latency spent before the first streamed token
+LLM_TTFT_FRACTION = 0.25
+
+# Bytes of simulated MP3 per character of text (same estimate as tts_worker.AudioBuffer)
+EDGE_BYTES_PER_CHAR = 400
+
+
+class LatencyProfile:
+    """
+    Simulated provider latency: base seconds ± jitter (fraction of base), a
+    failure rate, and an optional long tail (stall_rate of calls take stall seconds).
+    """
+
+    def __init__(self, latency: float, jitter: float = 0.0, failure_rate: float = 0.0,
+                 stall_rate: float = 0.0, stall: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+
+    def delay(self) -> float:
+        if self.stall_rate and random.random() < self.stall_rate:
+            return self.stall
+        return max(self.latency * (1 + random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def fails(self) -> bool:
+        return random.random() < self.failure_rate
+
+
+def fake_wav(seconds: float, sample_rate: int = 16000, lead_silence: float = 0.0,
+             frequency: float = 220.0, trailing_silence: float = None) -> bytes:
+    """Mono 16-bit WAV: optional leading/trailing silence around an amplitude-modulated tone."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * frequency * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    silence = np.zeros(int(lead_silence * sample_rate))
+    trailing = silence if trailing_silence is None else np.zeros(int(trailing_silence * sample_rate))
+    samples = np.concatenate([silence, tone, trailing])
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+# Speculative mode: the tone frequency of a turn's audio selects its transcript
+SPEECH_BASE_FREQUENCY = 200.0
+SPEECH_FREQUENCY_STEP = 50.0
+
+
+def speech_wav(transcript_index: int, seconds: float, lead_silence: float, trailing_silence: float) -> bytes:
+    return fake_wav(seconds, lead_silence=lead_silence, trailing_silence=trailing_silence,
+                    frequency=SPEECH_BASE_FREQUENCY + SPEECH_FREQUENCY_STEP * transcript_index)
+
+
+def stub_streaming_transcript(audio: bytes, speech_seconds: float, mismatch_rate: float) -> str:
+    """
+    Stub STT for streaming-input turns: the words spoken so far.
+
+    The transcript is picked by the tone frequency and revealed in proportion
+    to the seconds of tone received, so re-transcribing a growing prefix gives
+    growing, then stable, interim transcripts. Complete uploads (WAV header
+    length matches the data) get a different transcript with mismatch_rate.
+    """
+    with wave.open(io.BytesIO(audio)) as wav:
+        rate, declared = wav.getframerate(), wav.getnframes()
+        samples = np.frombuffer(wav.readframes(declared), dtype="<i2").astype(np.float32) / 32768
+    loud = np.flatnonzero(np.abs(samples) > 0.01)
+    if not len(loud):
+        return ""
+    voiced = samples[loud[0]:loud[-1] + 1]
+    crossings = np.count_nonzero(np.diff(np.signbit(voiced)))
+    frequency = crossings / 2 / (len(voiced) / rate)
+    index = int(round((frequency - SPEECH_BASE_FREQUENCY) / SPEECH_FREQUENCY_STEP)) % len(TRANSCRIPTS)
+    if len(samples) >= declared and random.random() < mismatch_rate:
+        index = (index + 1) % len(TRANSCRIPTS)
+    words = TRANSCRIPTS[index].split(" ")
+    spoken = math.ceil(len(words) * min(len(voiced) / rate / speech_seconds, 1.0))
+    return " ".join(words[:spoken])
+
+
+def stub_rubric(n: int) -> dict:
+    """A rubric evaluation like the ones session_scoring.py asks Groq for."""
+    rng = random.Random(n)
+    scores = {dim: rng.randint(40, 95) for dim in ("technicalAccuracy", "communicationClarity", "confidence",
+                                                    "starCompliance")}
+    return {
+        **scores,
+        "score": round(sum(scores.values()) / len(scores)),
+        "answerSummary": "The candidate outlined an approach.",
+        "feedback": "Be more specific about the trade-offs.",
+        "improvedAnswer": None,
+    }
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """Deepgram, Sarvam and Groq (OpenAI-compatible) endpoints with simulated latency."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+    profiles = {}
+    # Set in --speculative mode: Deepgram transcribes audio prefixes (stub_streaming_transcript)
+    speech_seconds = 0.0
+    mismatch_rate = 0.0
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _next(self) -> int:
+        with self._counter_lock:
+            StubProviderHandler._counter += 1
+            return StubProviderHandler._counter
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?", 1)[0]
+
+        if path.endswith("/v1/listen") or path.endswith("/speech-to-text"):
+            stage = "stt"
+        elif path.endswith("/text-to-speech"):
+            stage = "tts"
+        elif path.endswith("/chat/completions"):
+            stage = "llm"
+        else:
+            self._send_json(404, {"error": f"Unknown stub route {path}"})
+            return
+
+        profile = self.profiles[stage]
+        if profile.fails():
+            time.sleep(profile.delay() / 2)
+            self._send_json(500, {"error": {"message": "Simulated provider failure"}})
+            return
+
+        n = self._next()
+        if stage == "stt":
+            time.sleep(profile.delay())
+            transcript = TRANSCRIPTS[n % len(TRANSCRIPTS)]
+            if self.speech_seconds and path.endswith("/v1/listen"):
+                transcript = stub_streaming_transcript(body, self.speech_seconds, self.mismatch_rate)
+            if path.endswith("/v1/listen"):
+                self._send_json(200, {"results": {"channels": [{"alternatives": [{"transcript": transcript}]}]}})
+            else:
+                self._send_json(200, {"transcript": transcript})
+        elif stage == "tts":
+            time.sleep(profile.delay())
+            text = json.loads(body or b"{}").get("inputs", [""])[0]
+            audio = fake_wav(max(len(text) / 15, 0.5), sample_rate=8000)
+            self._send_json(200, {"audios": [base64.b64encode(audio).decode("utf-8")]})
+        else:
+            self._chat_completion(json.loads(body or b"{}"), profile, n)
+
+    def _chat_completion(self, request_body: dict, profile: LatencyProfile, n: int):
+        # Numbered so identical answers don't turn every TTS call into a cache hit
+        text = f"{QUESTIONS[n % len(QUESTIONS)]} Take your time, this is question {n}."
+        if request_body.get("response_format", {}).get("type") == "json_object":
+            text = json.dumps(stub_rubric(n))  # session_scoring.py evaluations
+        model = request_body.get("model", "stub")
+        delay = profile.delay()
+
+        if not request_body.get("stream"):
+            time.sleep(delay)
+            self._send_json(200, {
+                "id": f"chatcmpl-{n}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+            return
+
+        words = text.split(" ")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        time.sleep(delay * LLM_TTFT_FRACTION)
+        per_token = delay * (1 - LLM_TTFT_FRACTION) / len(words)
+        for i, word in enumerate(words):
+            chunk = {
+                "id": f"chatcmpl-{n}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(per_token)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_stub_providers(profiles: dict, port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub providers on a background thread; returns the server (see server_port)."""
+    StubProviderHandler.profiles = profiles
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubProviderHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-providers", daemon=True).start()
+    return server
+
+
+def stub_env(stub_url: str) -> dict:
+    """Environment that points the backend at the stub providers."""
+    return {
+        "DEEPGRAM_API_KEY": "stub",
+        "DEEPGRAM_BASE_URL": stub_url,
+        "SARVAM_API_KEY": "stub",
+        "SARVAM_BASE_URL": stub_url,
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": stub_url,
+    }
+
+
+class StubCommunicate:
+    """Stand-in for edge_tts.Communicate with the configured Edge-TTS latency profile."""
+
+    profile = LatencyProfile(0.3)
+    chunk_size = 4096
+
+    def __init__(self, text, voice="", **kwargs):
+        self.text = text
+
+    async def stream(self):
+        await asyncio.sleep(self.profile.delay())
+        if self.profile.fails():
+            raise Exception("Simulated Edge-TTS failure")
+        remaining = max(len(self.text), 1) * EDGE_BYTES_PER_CHAR
+        while remaining > 0:
+            size = min(self.chunk_size, remaining)
+            remaining -= size
+            await asyncio.sleep(0)
+            yield {"type": "audio", "data": b"\xff" * size}
+
+
+def install_edge_stub(profile: LatencyProfile):
+    import tts_worker
+    StubCommunicate.profile = profile
+    tts_worker.edge_tts.Communicate = StubCommunicate
+
+
+def serve(args):
+    """Run app.py (or app_async.py) under gunicorn with the Edge-TTS stub installed in every worker."""
+    from gunicorn.app.base import BaseApplication
+
+    edge_profile = LatencyProfile(args.tts_latency, args.jitter, args.failure_rate)
+
+    class BenchApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"127.0.0.1:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("timeout", 120)
+            self.cfg.set("loglevel", "warning")
+            if args.use_async:
+                self.cfg.set("worker_class", "aiohttp.GunicornWebWorker")
+
+        def load(self):
+            # Runs in each worker after fork
+            install_edge_stub(edge_profile)
+            if args.use_async:
+                from app_async import app
+            else:
+                from app import app
+            return app
+
+    BenchApplication().run()
+
+
+def start_server(args, stub_url: str) -> subprocess.Popen:
+    env = {**os.environ, **stub_env(stub_url)}
+    command = [sys.executable, os.path.abspath(__file__), "--serve"] + sys.argv[1:]
+    # The backend prints a few lines per turn; keep them out of the report unless asked for
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=None if args.verbose else subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + "/", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise Exception("gunicorn did not start within 30s")
+
+
+def parse_server_timing(header: str) -> dict:
+    """`stt;desc="deepgram";dur=412.3, llm;dur=800` -> {"stt": 412.3, "llm": 800.0} (ms, summed per stage)."""
+    spans = defaultdict(float)
+    for entry in filter(None, (e.strip() for e in (header or "").split(","))):
+        parts = entry.split(";")
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                spans[parts[0].strip()] += float(value)
+    return dict(spans)
+
+
+def upload_turn_chunks(http: requests.Session, url: str, audio: bytes, data: dict, args) -> tuple:
+    """Speculative mode: open a streaming-input turn and send the audio in real-time chunks. Returns (turn_id, error)."""
+    response = http.post(url + BEGIN_TURN_PATH, json={**data, "content_type": "audio/wav"}, timeout=30)
+    if response.status_code != 200:
+        return None, f"begin_turn: {response.status_code} {response.text[:200]}"
+    turn_id = response.json()["turn_id"]
+
+    # 16 kHz mono 16-bit, like fake_wav
+    chunk_bytes = int(16000 * 2 * args.chunk_ms / 1000)
+    next_chunk = time.perf_counter()
+    for offset in range(0, len(audio), chunk_bytes):
+        time.sleep(max(next_chunk - time.perf_counter(), 0))
+        next_chunk += args.chunk_ms / 1000
+        response = http.post(url + APPEND_AUDIO_PATH, params={"turn_id": turn_id}, data=audio[offset:offset + chunk_bytes],
+                             headers={"Content-Type": "audio/wav"}, timeout=30)
+        if response.status_code != 200:
+            return None, f"append_turn_audio: {response.status_code} {response.text[:200]}"
+    return turn_id, None
+
+
+def run_turn(http: requests.Session, url: str, audio: bytes, history: list, args) -> dict:
+    """
+    One turn; returns {"ok", "status", "service", "stages", "error"}; updates history on success.
+
+    In speculative mode service is measured from the end of the recording (the finish_turn request).
+    """
+    data = {
+        "history": json.dumps(history),
+        "interview_type": args.interview_type,
+        "tts_provider": args.tts_provider,
+        "tts_language": args.tts_language,
+    }
+    path = TURN_PATH
+    request_args = {"data": data, "files": {"audio": ("turn.wav", audio, "audio/wav")}}
+    if args.speculative:
+        turn_id, error = upload_turn_chunks(http, url, audio, data, args)
+        if turn_id is None:
+            return {"ok": False, "status": 0, "service": 0.0, "stages": {}, "error": error}
+        path = FINISH_TURN_PATH
+        request_args = {"data": {"turn_id": turn_id}}
+    if args.filler:
+        request_args["data"]["filler"] = "1"
+    start = time.perf_counter()
+
+    if not args.stream:
+        response = http.post(url + path, timeout=120, **request_args)
+        service = time.perf_counter() - start
+        stages = parse_server_timing(response.headers.get("Server-Timing"))
+        speculative = 'llm;desc="speculative"' in response.headers.get("Server-Timing", "")
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+        ok = response.status_code == 200 and bool(result.get("ai_response_text"))
+        if ok:
+            history.append({"role": "user", "content": result["user_transcript"]})
+            history.append({"role": "assistant", "content": result["ai_response_text"]})
+        return {"ok": ok, "status": response.status_code, "service": service, "stages": stages,
+                "error": result.get("error") or result.get("tts_error"), "speculative": speculative}
+
+    response = http.post(url + path + "_stream", timeout=120, stream=True, **request_args)
+    stages = parse_server_timing(response.headers.get("Server-Timing"))
+    if response.status_code != 200:
+        try:
+            error = response.json().get("error")
+        except ValueError:
+            error = response.text[:200]
+        return {"ok": False, "status": response.status_code, "service": time.perf_counter() - start,
+                "stages": stages, "error": error}
+
+    transcript, text, error, event = "", "", None, None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            payload = json.loads(line[6:])
+            if event == "transcript":
+                transcript = payload.get("user_transcript", "")
+            elif event == "text":
+                text += payload.get("delta", "")
+            elif event == "filler":
+                stages["client_filler"] = (time.perf_counter() - start) * 1000
+            elif event == "audio" and "client_first_audio" not in stages:
+                stages["client_first_audio"] = (time.perf_counter() - start) * 1000
+            elif event in ("error", "tts_error"):
+                error = payload.get("error") or payload.get("tts_error")
+    service = time.perf_counter() - start
+    ok = bool(text)
+    if ok:
+        history.append({"role": "user", "content": transcript})
+        history.append({"role": "assistant", "content": text})
+    return {"ok": ok, "status": response.status_code, "service": service, "stages": stages, "error": error}
+
+
+def run_load(url: str, audios: list, args) -> tuple:
+    """
+    Open-loop load: turns are scheduled at a fixed rate and picked up by the
+    first idle session. Latency is measured from the scheduled time, so a
+    saturated server shows up as queueing instead of a lower request rate.
+    """
+    tickets = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+
+    def session_loop(index: int):
+        http = requests.Session()
+        # A distinct client address per session, so per-user rate limits apply per simulated user
+        http.headers["X-Forwarded-For"] = f"10.0.{index // 256}.{index % 256}"
+        history = []
+        turns = random.randrange(len(audios))
+        while True:
+            scheduled = tickets.get()
+            if scheduled is None:
+                return
+            waited = time.perf_counter() - scheduled
+            audio = audios[turns % len(audios)]
+            turns += 1
+            try:
+                result = run_turn(http, url, audio, history, args)
+            except requests.RequestException as e:
+                result = {"ok": False, "status": 0, "service": 0.0, "stages": {}, "error": str(e)}
+            result["latency"] = waited + result["service"]
+            with results_lock:
+                results.append(result)
+
+    sessions = [threading.Thread(target=session_loop, args=(i,), daemon=True) for i in range(args.sessions)]
+    for thread in sessions:
+        thread.start()
+
+    total = int(args.rps * args.duration)
+    start = time.perf_counter()
+    for i in range(total):
+        due = start + i / args.rps
+        time.sleep(max(due - time.perf_counter(), 0))
+        tickets.put(due)
+    for _ in sessions:
+        tickets.put(None)
+    for thread in sessions:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, max(math.ceil(len(values) * pct / 100) - 1, 0))]
+
+
+def worker_memory(master_pid: int) -> list:
+    """[(pid, rss_mb, peak_rss_mb)] for the gunicorn workers (Linux /proc only)."""
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            pids = [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+    workers = []
+    for pid in pids:
+        fields = {}
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    fields[key] = value.strip()
+        except OSError:
+            continue
+        rss = int(fields.get("VmRSS", "0 kB").split()[0]) / 1024
+        peak = int(fields.get("VmHWM", "0 kB").split()[0]) / 1024
+        workers.append((pid, rss, peak))
+    return workers
+
+
+def report(results: list, wall: float, args, memory: list):
+    ok = [r for r in results if r["ok"]]
+    failed = [r for r in results if not r["ok"]]
+    print(f"\nturns      {len(results)} sent, {len(ok)} ok, {len(failed)} failed")
+    if failed:
+        statuses = defaultdict(int)
+        for r in failed:
+            statuses[r["status"]] += 1
+        print("failures   " + ", ".join(f"status {s}: {n}" for s, n in sorted(statuses.items())))
+        print(f"           e.g. {failed[0]['error']}")
+    print(f"throughput {len(ok) / wall:.2f} ok turns/s (target {args.rps:.2f}/s over {wall:.1f}s)")
+    if args.speculative and not args.stream:
+        kept = sum(1 for r in ok if r.get("speculative"))
+        print(f"speculative responses kept for {kept}/{len(ok)} turns")
+
+    series = defaultdict(list)
+    for r in ok:
+        series["turn (from schedule)"].append(r["latency"] * 1000)
+        series["turn (service)"].append(r["service"] * 1000)
+        for stage, ms in r["stages"].items():
+            series[stage].append(ms)
+
+    print(f"\n{'stage':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, values in series.items():
+        values.sort()
+        print(f"{stage:<22}{len(values):>6}{percentile(values, 50):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}")
+
+    if memory:
+        print(f"\n{'worker pid':<12}{'rss MB':>10}{'peak MB':>10}")
+        for pid, rss, peak in memory:
+            print(f"{pid:<12}{rss:>10.1f}{peak:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-w", "--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker (1 = sync worker)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="serve app_async.py instead of app.py")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--target", help="base URL of an already running server")
+    parser.add_argument("--rps", type=float, default=5.0, help="target turns per second")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent interview sessions")
+    parser.add_argument("--stream", action="store_true", help="use process_interview_turn_stream")
+    parser.add_argument("--filler", action="store_true", help="stream mode: ask for a filler phrase before the reply")
+    parser.add_argument("--audio-seconds", type=float, default=3.0)
+    parser.add_argument("--speculative", action="store_true",
+                        help="stream the recording in real-time chunks (begin_turn / append_turn_audio / finish_turn)")
+    parser.add_argument("--chunk-ms", type=float, default=100, help="speculative mode: recorder timeslice")
+    parser.add_argument("--trailing-silence", type=float, default=1.5,
+                        help="speculative mode: seconds of silence before the candidate stops recording")
+    parser.add_argument("--spec-mismatch-rate", type=float, default=0.0,
+                        help="speculative mode: share of final transcripts that differ from the interim ones")
+    parser.add_argument("--interview-type", default="technical")
+    parser.add_argument("--tts-provider", default="edge")
+    parser.add_argument("--tts-language", default="en-IN")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="seconds")
+    parser.add_argument("--stt-stall-rate", type=float, default=0.0, help="share of STT calls that stall")
+    parser.add_argument("--stt-stall", type=float, default=10.0, help="seconds a stalled STT call takes")
+    parser.add_argument("--llm-latency", type=float, default=0.6, help="seconds")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds (Sarvam and Edge-TTS)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± fraction of each latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability a provider call fails")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the backend's per-turn logs")
+    parser.add_argument("--stubs-only", action="store_true", help="run the stub providers and print their env")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    profiles = {
+        "stt": LatencyProfile(args.stt_latency, args.jitter, args.failure_rate, args.stt_stall_rate, args.stt_stall),
+        "llm": LatencyProfile(args.llm_latency, args.jitter, args.failure_rate),
+        "tts": LatencyProfile(args.tts_latency, args.jitter, args.failure_rate),
+    }
+    if args.speculative and args.workers > 1 and not args.target:
+        parser.error("--speculative keeps turns in process memory: use -w 1 (with --threads or --async)")
+    if args.speculative:
+        StubProviderHandler.speech_seconds = args.audio_seconds
+        StubProviderHandler.mismatch_rate = args.spec_mismatch_rate
+    stubs = start_stub_providers(profiles, args.stub_port)
+    stub_url = f"http://127.0.0.1:{stubs.server_port}"
+
+    if args.stubs_only:
+        for key, value in stub_env(stub_url).items():
+            print(f"export {key}={value}")
+        print("# Edge-TTS still goes to the live service in a server started this way")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    server = None
+    url = args.target.rstrip("/") if args.target else f"http://127.0.0.1:{args.port}"
+    if not args.target:
+        server = start_server(args, stub_url)
+
+    try:
+        if args.speculative:
+            audios = [speech_wav(i, args.audio_seconds, 0.5, args.trailing_silence) for i in range(len(TRANSCRIPTS))]
+        else:
+            audios = [fake_wav(args.audio_seconds, lead_silence=0.5)]
+        print(f"target {url}  workers={args.workers if server else '?'} threads={args.threads if server else '?'}  "
+              f"sessions={args.sessions}  rps={args.rps}  duration={args.duration}s  "
+              f"{'stream' if args.stream else 'json'}{' speculative' if args.speculative else ''}")
+        results, wall = run_load(url, audios, args)
+        memory = worker_memory(server.pid) if server else []
+        report(results, wall, args, memory)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+        stubs.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Edge-TTS synthesis latency benchmark: asyncio.run per request vs the shared worker.
+
+Usage:
+    python bench_tts.py                      # live Edge-TTS
+    python bench_tts.py --offline            # simulated Edge-TTS stream (no network)
+    python bench_tts.py -n 200 -c 16 --offline
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import edge_tts
+import tts_worker
+
+SAMPLE_TEXT = (
+    "Thanks for walking me through that. Can you tell me how you would scale "
+    "this design if traffic grew by an order of magnitude?"
+)
+
+
+class FakeCommunicate:
+    """Stand-in for edge_tts.Communicate that streams ~6KB/s of fake MP3 audio."""
+
+    first_chunk_delay = 0.15
+    chunk_size = 4096
+    chunks = 40
+
+    def __init__(self, text, voice="", **kwargs):
+        self.text = text
+
+    async def stream(self):
+        await asyncio.sleep(self.first_chunk_delay)
+        for _ in range(self.chunks):
+            await asyncio.sleep(0.001)
+            yield {"type": "audio", "data": b"\xff" * self.chunk_size}
+
+
+def synthesize_legacy(text: str, voice: str = tts_worker.DEFAULT_VOICE) -> bytes:
+    """The original implementation: new event loop per call, quadratic bytes concat."""
+    communicate = edge_tts.Communicate(text, voice)
+
+    async def get_audio():
+        audio_data = b""
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio_data += chunk["data"]
+        return audio_data
+
+    return asyncio.run(get_audio())
+
+
+def run(label: str, fn, requests: int, concurrency: int):
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        fn(SAMPLE_TEXT)
+        latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{label:<8} n={requests:<5} c={concurrency:<3} p50={p50:8.1f}ms  p99={p99:8.1f}ms  "
+          f"throughput={requests / wall:6.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=50)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--offline", action="store_true", help="use a simulated Edge-TTS stream")
+    args = parser.parse_args()
+
+    if args.offline:
+        edge_tts.Communicate = FakeCommunicate
+        tts_worker.edge_tts.Communicate = FakeCommunicate
+
+    run("before", synthesize_legacy, args.requests, args.concurrency)
+    run("after", tts_worker.synthesize, args.requests, args.concurrency)
+    tts_worker._worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Offline bulk transcription of recorded interview audio.
+
+Transcribes a directory of recordings (or a JSONL manifest) with the same
+Deepgram / Sarvam calls as the turn pipeline, and appends one JSON result per
+file to an output JSONL file.
+
+- Each file is routed by its language: Sarvam saarika for the Indic
+  languages, Deepgram nova-2 for English, the other provider as failover
+  (see stt_router.stt_plan); silence is trimmed first (vad)
+- Files run on a pool of BULK_WORKERS threads, each provider paced to its own
+  requests per second (BULK_DEEPGRAM_RPS, BULK_SARVAM_RPS); a 429 pauses that
+  provider, and rate limits, 5xx answers and connection errors are retried
+- The output doubles as the result cache, keyed by the audio's SHA-256 and
+  language: re-runs skip files already transcribed, copy the transcript of
+  duplicate recordings, and retry the failures and the files found without
+  speech (VAD only, no provider call). Every line is flushed as it is written,
+  so an interrupted run resumes where it stopped
+
+Manifest lines: {"path": "...", "language": "hi-IN"} (path relative to the manifest).
+
+Usage:
+    python bulk_transcribe.py recordings/ --language en-IN           # transcripts.jsonl
+    python bulk_transcribe.py manifest.jsonl --out archive.jsonl -w 16 --sarvam-rps 2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import mimetypes
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from pipeline import transcribe_audio, transcribe_audio_sarvam, DEEPGRAM_API_KEY, SARVAM_API_KEY
+from provider_clients import ProviderError
+from stt_router import stt_plan
+from upload_stream import AudioSpool, UPLOAD_CHUNK_BYTES
+from vad import preprocess_audio
+
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", "8"))
+BULK_DEEPGRAM_RPS = float(os.environ.get("BULK_DEEPGRAM_RPS", "10"))
+BULK_SARVAM_RPS = float(os.environ.get("BULK_SARVAM_RPS", "1"))
+BULK_RETRIES = int(os.environ.get("BULK_RETRIES", "3"))
+# Archived interviews run longer than a turn upload
+BULK_MAX_BYTES = int(os.environ.get("BULK_MAX_BYTES", str(200 * 1024 * 1024)))
+# Seconds a provider is paused after it answers 429
+BULK_RATE_LIMIT_PAUSE = float(os.environ.get("BULK_RATE_LIMIT_PAUSE", "10"))
+
+AUDIO_EXTENSIONS = {".webm", ".wav", ".mp3", ".ogg", ".opus", ".m4a", ".flac"}
+
+STT_CALLS = {"deepgram": transcribe_audio, "sarvam": transcribe_audio_sarvam}
+# Failures worth another attempt besides ProviderError.retryable (429 / 5xx)
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class ProviderPacer:
+    """Thread-safe request spacing for one provider, with a pause after it rate-limits us."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def primary_provider(language: str) -> str:
+    """Sarvam for the Indic languages, Deepgram for English."""
+    return "deepgram" if (language or "en").startswith("en") else "sarvam"
+
+
+def read_audio(path: Path, content_type: str) -> tuple:
+    """(spool, SHA-256 hex digest) of a recording, read in chunks."""
+    spool, digest = AudioSpool(content_type, BULK_MAX_BYTES), hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            spool.write(chunk)
+    return spool, digest.hexdigest()
+
+
+def cache_key(sha256: str, language: str) -> str:
+    return f"{sha256}:{language}"
+
+
+class BulkTranscriber:
+    """Transcribes files on a thread pool and appends results to a JSONL file that is also its cache."""
+
+    def __init__(self, out_path: str, deepgram_rps: float = BULK_DEEPGRAM_RPS, sarvam_rps: float = BULK_SARVAM_RPS,
+                 retries: int = BULK_RETRIES):
+        self.out_path = out_path
+        self.retries = retries
+        self.pacers = {"deepgram": ProviderPacer(deepgram_rps), "sarvam": ProviderPacer(sarvam_rps)}
+        self.configured = {"deepgram": bool(DEEPGRAM_API_KEY), "sarvam": bool(SARVAM_API_KEY)}
+        self.done_paths = set()
+        self.cache = {}
+        self.counts = {"transcribed": 0, "skipped": 0, "cached": 0, "failed": 0, "no_speech": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._load()
+        self._out = open(out_path, "a", encoding="utf-8")
+
+    def _load(self):
+        """Transcripts of earlier runs; a line cut off by a crash is ignored."""
+        if not os.path.exists(self.out_path):
+            return
+        with open(self.out_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("error") is None and not record.get("no_speech"):
+                    self.done_paths.add((record["path"], record["sha256"], record["language"]))
+                    self.cache[cache_key(record["sha256"], record["language"])] = record
+
+    def _emit(self, record: dict, count: str):
+        with self._lock:
+            self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._out.flush()
+            self.counts[count] += 1
+            if record.get("error") is None and not record.get("no_speech"):
+                self.cache[cache_key(record["sha256"], record["language"])] = record
+
+    def _call(self, provider: str, language: str, audio, content_type: str) -> str:
+        """
+        One provider's transcript, paced. Rate limits (429), provider outages
+        (5xx) and connection errors are retried; a 429 pauses the provider for
+        every worker. Other errors (e.g. 400, 401) fail right away.
+        """
+        for attempt in range(self.retries + 1):
+            self.pacers[provider].wait()
+            try:
+                return STT_CALLS[provider](audio, language, content_type)
+            except ProviderError as e:
+                if not e.retryable or attempt == self.retries:
+                    raise
+                if e.status_code == 429:
+                    self.pacers[provider].pause(BULK_RATE_LIMIT_PAUSE)
+            except RETRYABLE_ERRORS:
+                if attempt == self.retries:
+                    raise
+            time.sleep(min(0.5 * 2 ** attempt, 10.0) * random.uniform(0.8, 1.2))
+
+    def transcribe_file(self, path: Path, language: str):
+        content_type = mimetypes.guess_type(path.name)[0] or "audio/webm"
+        record = {"path": str(path), "language": language}
+        try:
+            audio, sha256 = read_audio(path, content_type)
+        except Exception as e:
+            self._emit({**record, "sha256": None, "error": str(e)}, "failed")
+            return
+        record["sha256"] = sha256
+        if (str(path), sha256, language) in self.done_paths:
+            with self._lock:
+                self.counts["skipped"] += 1
+            return
+        with self._lock:
+            cached = self.cache.get(cache_key(sha256, language))
+        if cached is not None:
+            self._emit({**cached, **record, "cached": True}, "cached")
+            return
+
+        started = time.perf_counter()
+        vad_result = preprocess_audio(audio, content_type)
+        record.update({"bytes": audio.size, "audio_seconds": round(vad_result.original_seconds, 2)})
+        if not vad_result.has_speech:
+            self._emit({**record, "provider": "", "transcript": "", "no_speech": True, "error": None}, "no_speech")
+            return
+
+        plan = stt_plan(primary_provider(language), language, self.configured)
+        error = f"No STT provider configured for {language}"
+        for provider, provider_language in plan:
+            try:
+                transcript = self._call(provider, provider_language, vad_result.audio_data, vad_result.content_type)
+            except Exception as e:
+                print(f"{path}: {provider} failed: {e}")
+                error = str(e)
+                continue
+            with self._lock:
+                self.counts["bytes"] += audio.size
+            self._emit({**record, "provider": provider, "transcript": transcript, "error": None,
+                        "seconds": round(time.perf_counter() - started, 2)}, "transcribed")
+            return
+        self._emit({**record, "error": error}, "failed")
+
+    def run(self, files: list, workers: int = BULK_WORKERS):
+        """Transcribe (path, language) pairs, printing progress every 50 files."""
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-stt") as pool:
+            futures = [pool.submit(self.transcribe_file, path, language) for path, language in files]
+            for n, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if n % 50 == 0:
+                    print(f"{n}/{len(files)} files: {self.counts}")
+
+    def close(self):
+        self._out.close()
+
+
+def list_files(source: str, language: str) -> list:
+    """(path, language) of every recording under a directory, or of every line of a JSONL manifest."""
+    root = Path(source)
+    if root.is_dir():
+        return [(path, language) for path in sorted(root.rglob("*")) if path.suffix.lower() in AUDIO_EXTENSIONS]
+    files = []
+    with open(root, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                files.append((root.parent / entry["path"], entry.get("language") or language))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of recordings to JSONL.")
+    parser.add_argument("source", help="directory of recordings, or a JSONL manifest of {path, language}")
+    parser.add_argument("--out", default="transcripts.jsonl", help="JSONL results, appended to and used as the cache")
+    parser.add_argument("--language", default="en-IN", help="language of files without one in the manifest")
+    parser.add_argument("-w", "--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--deepgram-rps", type=float, default=BULK_DEEPGRAM_RPS, help="0 = unpaced")
+    parser.add_argument("--sarvam-rps", type=float, default=BULK_SARVAM_RPS, help="0 = unpaced")
+    args = parser.parse_args()
+
+    if not (DEEPGRAM_API_KEY or SARVAM_API_KEY):
+        sys.exit("Neither DEEPGRAM_API_KEY nor SARVAM_API_KEY is set")
+
+    files = list_files(args.source, args.language)
+    transcriber = BulkTranscriber(args.out, args.deepgram_rps, args.sarvam_rps)
+    print(f"Transcribing {len(files)} files with {args.workers} workers "
+          f"({len(transcriber.cache)} results cached in {args.out})")
+    started = time.perf_counter()
+    try:
+        transcriber.run(files, args.workers)
+    finally:
+        transcriber.close()
+    wall = time.perf_counter() - started
+    counts = transcriber.counts
+    print(f"\n{counts['transcribed']} transcribed, {counts['cached']} from cache, {counts['skipped']} already done, "
+          f"{counts['no_speech']} without speech, {counts['failed']} failed in {wall:.1f}s "
+          f"({counts['transcribed'] / (wall / 60):.1f} files/min, {counts['bytes'] / 1e6:.1f}MB of audio)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Pre-synthesized filler phrases that mask turn latency.
+
+Between the end of the candidate's answer and the first sentence of the
+reply, STT + LLM + TTS take a second or more of silence. Streaming turn
+responses (with the `filler` form field set) therefore start with a short
+acknowledgement ("Got it, let me think about that.") before transcription
+even begins, and the `filler` endpoint serves one to non-streaming clients.
+
+The phrases of an interview type are synthesized once per voice (provider,
+language, output format) - at startup (first request) for the default voice,
+otherwise on first use, in the background - and kept in memory, so sending a filler never
+costs a provider call on the turn itself. Until a voice's bank is ready, turns
+simply go without a filler.
+"""
+
+import os
+import time
+import base64
+import random
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from tts_router import TTSResult
+
+FILLER_ENABLED = os.environ.get("FILLER_ENABLED", "true").lower() == "true"
+FILLER_WARM_ON_STARTUP = os.environ.get("FILLER_WARM_ON_STARTUP", "true").lower() == "true"
+# Output format warmed at startup: the web client's default (audio_codec)
+FILLER_WARM_FORMAT = os.environ.get("FILLER_WARM_FORMAT", "opus:24")
+# Voices (provider, language, output format) kept per process, least recently used dropped first
+FILLER_MAX_VOICES = int(os.environ.get("FILLER_MAX_VOICES", "16"))
+FILLER_RETRY_SECONDS = float(os.environ.get("FILLER_RETRY_SECONDS", "60"))
+
+FILLER_PHRASES: Dict[str, List[str]] = {
+    "technical": [
+        "Got it, let me think about that.",
+        "Okay, interesting approach.",
+        "Alright, give me a second.",
+        "Right, let me consider that.",
+        "Okay, thanks for walking me through it.",
+    ],
+    "behavioral": [
+        "Thanks for sharing that.",
+        "I see, that's helpful.",
+        "Okay, let me think about that.",
+        "Got it, thank you.",
+        "Alright, that makes sense.",
+    ],
+    "case_study": [
+        "Okay, let me work through that.",
+        "Interesting, give me a moment.",
+        "Got it, let me think.",
+        "Right, that's a fair point.",
+        "Alright, let me consider those numbers.",
+    ],
+}
+
+VoiceKey = Tuple[str, ...]
+Synthesizer = Callable[[str], Union[TTSResult, Awaitable[TTSResult]]]
+
+_filler_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="filler")
+
+
+class FillerBank:
+    """Synthesized filler phrases per (interview type, voice), loaded in the background."""
+
+    def __init__(self, phrases: Dict[str, List[str]] = FILLER_PHRASES, max_voices: int = FILLER_MAX_VOICES):
+        self.phrases = phrases
+        self.max_voices = max_voices
+        self._ready: "OrderedDict[VoiceKey, List[Tuple[str, TTSResult]]]" = OrderedDict()
+        self._loading: Dict[VoiceKey, float] = {}  # key -> start time (kept on failure until the retry delay)
+        self._last: Dict[VoiceKey, str] = {}
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.not_ready = 0
+        self.synthesized = 0
+        self.failed = 0
+
+    def _key(self, interview_type: str, voice: VoiceKey) -> VoiceKey:
+        return (interview_type if interview_type in self.phrases else "technical", *voice)
+
+    def _claim(self, key: VoiceKey) -> bool:
+        """Mark the key as loading; False if it is ready, loading, or failed too recently."""
+        with self._lock:
+            if key in self._ready:
+                return False
+            started = self._loading.get(key)
+            if started is not None and time.monotonic() - started < FILLER_RETRY_SECONDS:
+                return False
+            self._loading[key] = time.monotonic()
+            return True
+
+    def _store(self, key: VoiceKey, phrase: str, result: TTSResult):
+        with self._lock:
+            self.synthesized += 1
+            self._ready.setdefault(key, []).append((phrase, result))
+            self._ready.move_to_end(key)
+            while len(self._ready) > self.max_voices:
+                evicted, _ = self._ready.popitem(last=False)
+                self._loading.pop(evicted, None)
+                self._last.pop(evicted, None)
+
+    def _loaded(self, key: VoiceKey, stored: int):
+        with self._lock:
+            if stored:
+                self._loading.pop(key, None)
+
+    def _fail(self, phrase: str, error: Exception):
+        print(f"Filler synthesis failed for '{phrase}': {error}")
+        with self._lock:
+            self.failed += 1
+
+    def _load(self, key: VoiceKey, synthesize: Synthesizer):
+        stored = 0
+        for phrase in self.phrases[key[0]]:
+            try:
+                result = synthesize(phrase)
+            except Exception as e:
+                self._fail(phrase, e)
+                continue
+            if result.audio:
+                self._store(key, phrase, result)
+                stored += 1
+        self._loaded(key, stored)
+
+    async def _load_async(self, key: VoiceKey, synthesize: Synthesizer):
+        stored = 0
+        for phrase in self.phrases[key[0]]:
+            try:
+                result = await synthesize(phrase)
+            except Exception as e:
+                self._fail(phrase, e)
+                continue
+            if result.audio:
+                self._store(key, phrase, result)
+                stored += 1
+        self._loaded(key, stored)
+
+    def warm(self, interview_type: str, voice: VoiceKey, synthesize: Synthesizer):
+        """
+        Start synthesizing the phrases for a voice in the background (no-op if
+        loaded or loading). Coroutine synthesizers run as a task on the current loop.
+        """
+        key = self._key(interview_type, voice)
+        if not FILLER_ENABLED or not self._claim(key):
+            return
+        if asyncio.iscoroutinefunction(synthesize):
+            asyncio.ensure_future(self._load_async(key, synthesize))
+        else:
+            _filler_executor.submit(self._load, key, synthesize)
+
+    def pick(self, interview_type: str, voice: VoiceKey, synthesize: Synthesizer) -> Optional[Tuple[str, TTSResult]]:
+        """
+        A ready (phrase, audio) for the interview type and voice, not repeating
+        the previous one. Returns None (and starts loading the bank) if none is ready yet.
+        """
+        if not FILLER_ENABLED:
+            return None
+        key = self._key(interview_type, voice)
+        with self._lock:
+            ready = self._ready.get(key)
+            if ready:
+                self._ready.move_to_end(key)
+                choices = [entry for entry in ready if entry[0] != self._last.get(key)] or ready
+                phrase, result = random.choice(choices)
+                self._last[key] = phrase
+                self.sent += 1
+                return phrase, result
+            self.not_ready += 1
+        self.warm(interview_type, voice, synthesize)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": FILLER_ENABLED,
+                "voices": len(self._ready),
+                "phrases": sum(len(entries) for entries in self._ready.values()),
+                "bytes": sum(len(result.audio) for entries in self._ready.values() for _, result in entries),
+                "sent": self.sent,
+                "not_ready": self.not_ready,
+                "synthesized": self.synthesized,
+                "failed": self.failed,
+            }
+
+
+def wants_filler(value) -> bool:
+    """Whether a turn request's `filler` field asks for a filler."""
+    return str(value or "").lower() in ("1", "true", "yes")
+
+
+# Process-wide bank
+filler_bank = FillerBank()
+
+
+def filler_payload(filler: Tuple[str, TTSResult]) -> dict:
+    """JSON body of a filler (SSE `filler` event / filler endpoint)."""
+    phrase, result = filler
+    return {
+        "text": phrase,
+        "audio_base64": base64.b64encode(result.audio).decode("utf-8"),
+        "audio_mime": result.mime_type,
+    }
@@ -0,0 +1,15 @@
+"""
+gunicorn settings read from the working directory (Procfile and Dockerfile deploys).
+
+gunicorn stops a worker on SIGTERM by its own signal handling, so queued
+session and transcript writes are committed in the worker_exit hook rather
+than left to atexit.
+"""
+
+
+def worker_exit(server, worker):
+    from session_store import close_sessions
+    from transcript_store import close_transcripts
+
+    close_sessions()
+    close_transcripts()
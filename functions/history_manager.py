@@ -0,0 +1,199 @@
+"""
+Token-budgeted chat history for the interviewer prompt.
+
+Long interviews would otherwise send every prior message to Groq on every
+turn. The window keeps the last HISTORY_KEEP_TURNS turns verbatim and folds
+older turns into a rolling summary:
+
+- Token counts are estimated (~4 characters per token), no tokenizer needed
+- Summaries are cached by a chained hash of the summarized prefix, so each
+  update only summarizes the turns added since the previous summary
+- Summarization runs on a background thread; until it lands, the prompt uses
+  the latest cached summary plus as many unsummarized messages as fit
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "6"))
+SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+SUMMARY_CACHE_SIZE = 1024
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[Optional[str], List[dict]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_with_groq(client, previous_summary: Optional[str], messages: List[dict]) -> str:
+    """Fold new interview messages into the running summary using a small Groq model."""
+    transcript = "\n".join(
+        f"{'Interviewer' if m.get('role') == 'assistant' else 'Candidate'}: {m.get('content', '')}"
+        for m in messages
+    )
+    prompt = (
+        "You maintain a running summary of a job interview for the interviewer.\n"
+        "Keep the questions asked, the candidate's key claims, strengths, gaps and open threads. "
+        "Be concise (under 150 words).\n\n"
+        f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+        f"New exchanges:\n{transcript}\n\n"
+        "Updated summary:"
+    )
+    response = client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=250,
+        temperature=0.2,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+class HistoryWindow:
+    """Fits chat history into a token budget using a rolling summary."""
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS):
+        self.token_budget = token_budget
+        self.keep_messages = keep_turns * 2
+        self._summaries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+        self.turns = 0
+        self.summaries_computed = 0
+        self.total_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    @staticmethod
+    def _prefix_hashes(messages: List[dict]) -> List[str]:
+        """hashes[i] identifies messages[:i] (chained, so each prefix costs O(1))."""
+        hashes = [""]
+        digest = hashlib.sha1()
+        for m in messages:
+            digest.update(f"{m.get('role', 'user')}\x1f{m.get('content', '')}\x1e".encode("utf-8"))
+            hashes.append(digest.copy().hexdigest())
+        return hashes
+
+    def _latest_summary(self, hashes: List[str]) -> Tuple[int, Optional[str]]:
+        """Longest summarized prefix available: (prefix length, summary)."""
+        with self._lock:
+            for length in range(len(hashes) - 1, 0, -1):
+                entry = self._summaries.get(hashes[length])
+                if entry is not None:
+                    self._summaries.move_to_end(hashes[length])
+                    return entry
+        return 0, None
+
+    def _schedule_summary(self, older: List[dict], hashes: List[str], covered: int,
+                          summary: Optional[str], summarize: Summarizer):
+        target = hashes[len(older)]
+        with self._lock:
+            if target in self._summaries or target in self._in_flight:
+                return
+            self._in_flight.add(target)
+
+        def run():
+            try:
+                updated = summarize(summary, older[covered:])
+                with self._lock:
+                    self._summaries[target] = (len(older), updated)
+                    while len(self._summaries) > SUMMARY_CACHE_SIZE:
+                        self._summaries.popitem(last=False)
+                    self.summaries_computed += 1
+            except Exception as e:
+                print(f"History summarization failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(target)
+
+        self._executor.submit(run)
+
+    def fit(self, chat_history: List[dict], reserved_tokens: int,
+            summarize: Optional[Summarizer] = None) -> Tuple[Optional[str], List[dict], dict]:
+        """
+        Fit history into the budget left after reserved_tokens (system prompt + current answer).
+
+        Returns (summary or None, verbatim messages, per-turn metrics).
+        """
+        history = [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in chat_history]
+        available = max(self.token_budget - reserved_tokens, 0)
+        history_tokens = sum(message_tokens(m) for m in history)
+
+        summary = None
+        verbatim = history
+        summarized = 0
+        dropped = 0
+
+        if history_tokens > available:
+            split = max(len(history) - self.keep_messages, 0)
+            older, recent = history[:split], history[split:]
+
+            hashes = self._prefix_hashes(older)
+            covered, summary = self._latest_summary(hashes)
+            summarized = covered
+            if summarize is not None and covered < len(older):
+                self._schedule_summary(older, hashes, covered, summary, summarize)
+
+            # Unsummarized older messages are kept (newest first) while they fit
+            budget = available - (estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0)
+            budget -= sum(message_tokens(m) for m in recent)
+            carried = []
+            for m in reversed(older[covered:]):
+                cost = message_tokens(m)
+                if cost > budget:
+                    break
+                carried.insert(0, m)
+                budget -= cost
+            dropped = len(older) - covered - len(carried)
+
+            # Even the recent turns may not fit on their own; trim from the oldest
+            while recent and budget < 0 and len(recent) > 2:
+                budget += message_tokens(recent.pop(0))
+                dropped += 1
+            verbatim = carried + recent
+
+        prompt_tokens = reserved_tokens + sum(message_tokens(m) for m in verbatim)
+        if summary:
+            prompt_tokens += estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+
+        with self._lock:
+            self.turns += 1
+            self.total_prompt_tokens += prompt_tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+
+        metrics = {
+            "prompt_tokens": prompt_tokens,
+            "history_messages": len(history),
+            "verbatim_messages": len(verbatim),
+            "summarized_messages": summarized,
+            "dropped_messages": dropped,
+        }
+        return summary, verbatim, metrics
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "avg_prompt_tokens": round(self.total_prompt_tokens / self.turns, 1) if self.turns else 0,
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "summaries_computed": self.summaries_computed,
+                "cached_summaries": len(self._summaries),
+                "token_budget": self.token_budget,
+            }
+
+
+# Process-wide window (summaries are shared across sessions by content hash)
+history_window = HistoryWindow()
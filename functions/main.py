@@ -2,247 +2,104 @@
 Firebase Cloud Functions for Interview AI
 
 This module provides the real-time interview processing loop:
-1. Deepgram: Speech-to-Text (STT)
+1. Deepgram / Sarvam: Speech-to-Text (STT)
 2. Groq: LLM Response Generation (FREE tier with no billing!)
-3. ElevenLabs: Text-to-Speech (TTS)
+3. Edge-TTS / Sarvam: Text-to-Speech (TTS)
+
+The stages themselves run in the shared turn pipeline (pipeline.py); the
+functions here only parse, admit and answer the requests.
 """
 
 import os
 import json
-import base64
-import requests
-from typing import Optional
+# Each function runs on its own instances, so sessions must live in Firestore
+# to reach process_interview_turn from create_session
+FIREBASE_SESSION_STORE = os.environ.get("SESSION_STORE", "firestore")
+# The interview documents live in Firestore next to the functions
+FIREBASE_TRANSCRIPT_STORE = os.environ.get("TRANSCRIPT_STORE", "firestore")
+# Seconds a function waits for its queued session and transcript writes before returning
+FIREBASE_FLUSH_TIMEOUT = float(os.environ.get("TRANSCRIPT_FLUSH_TIMEOUT", "5"))
+from startup import startup_profile, warmup, WARMUP_ON_START
+startup_profile.begin("main")
 from firebase_functions import https_fn, options
-from firebase_admin import initialize_app, firestore
-from groq import Groq
-from dotenv import load_dotenv
+startup_profile.mark("firebase_functions")
+import provider_clients
+from streaming import stream_after, sse_event, SSE_HEADERS
+from history_manager import history_window
+from opener_cache import opener_cache
+from admission import admission, AdmissionRejected
+from audio_codec import transcode_stats
+from fillers import filler_bank, filler_payload, wants_filler
+from vad import vad_stats
+from upload_stream import UploadTooLarge
+from stt_router import stt_router
+from tts_cache import tts_cache
+from tts_router import tts_router
+from metrics import TurnTimer, render_metrics, PROMETHEUS_CONTENT_TYPE
+from session_store import load_chat_history, flush_sessions, SESSION_TTL_SECONDS
+from transcript_store import transcript_stats, flush_transcripts
+# The turn pipeline (provider stages, prompts, hooks) is shared with the Flask and aiohttp servers
+from pipeline import (sync_pipeline, TurnContext, admit_turn, spool_turn_audio, turn_response, warmup_steps,
+                      open_session, EMPTY_TRANSCRIPT_RESPONSE,
+                      DEEPGRAM_API_KEY, ELEVENLABS_API_KEY, GROQ_API_KEY, SARVAM_API_KEY)
+startup_profile.mark("pipeline modules")
 
-# Load environment variables for local development
-load_dotenv()
+turn_pipeline = sync_pipeline(FIREBASE_SESSION_STORE, FIREBASE_TRANSCRIPT_STORE)
 
-# Initialize Firebase
-initialize_app()
 
-# Initialize clients from environment variables
+def json_response(payload: dict, status: int, headers: dict = None) -> https_fn.Response:
+    return https_fn.Response(json.dumps(payload), status=status, content_type="application/json", headers=headers)
 
-# Initialize clients from environment variables
-DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY")
-ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
-ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Default: Rachel
-SARVAM_API_KEY = os.environ.get("SARVAM_API_KEY")
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
-# Configure Groq
-groq_client = None
+def admission_error(e: AdmissionRejected) -> https_fn.Response:
+    return json_response(e.payload(), e.status, e.headers())
 
-def get_groq_client():
-    """Lazy initialization of Groq client."""
-    global groq_client
-    if groq_client is None:
-        if not GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    return groq_client
 
-
-def transcribe_audio(audio_data: bytes, language: str = "en", content_type: str = "audio/webm") -> str:
-    """
-    Convert audio to text using Deepgram Nova-2 model.
-    """
-    if not DEEPGRAM_API_KEY:
-        raise ValueError("DEEPGRAM_API_KEY environment variable is not set")
-    
-    response = requests.post(
-        "https://api.deepgram.com/v1/listen",
-        params={
-            "model": "nova-2",
-            "smart_format": "true",
-            "language": language,
-        },
-        headers={
-            "Authorization": f"Token {DEEPGRAM_API_KEY}",
-            "Content-Type": content_type,
-        },
-        data=audio_data,
-        timeout=30,
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"Deepgram API error: {response.status_code} - {response.text}")
-    
-    result = response.json()
-    transcript = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
-    
-    return transcript
+def warmup_response() -> https_fn.Response:
+    """Run the warm-up once per instance and report its step timings."""
+    return json_response({"warmup": warmup.run(warmup_steps())}, 200)
 
 
-def transcribe_audio_sarvam(audio_data: bytes, language_code: str = "hi-IN", content_type: str = "audio/webm") -> str:
+def parse_turn(req: https_fn.Request, timer: TurnTimer):
     """
-    Convert audio to text using Sarvam AI (saarika:v2.5).
+    (TurnContext, None) for a turn upload, or (None, error response): the
+    form's turn options and the chat history (server-side session or the
+    legacy history field). The audio is spooled once the turn is admitted.
     """
-    if not SARVAM_API_KEY:
-        raise ValueError("SARVAM_API_KEY environment variable is not set")
-    
-    headers = {
-        "api-subscription-key": SARVAM_API_KEY,
-    }
-    
-    # Sarvam might reject complex content types, strip params
-    if ";" in content_type:
-        content_type = content_type.split(";")[0].strip()
+    turn = TurnContext.from_params(req.form, req.headers.get("Accept"), timer)
+    if not req.files.get("audio"):
+        print("Error: No audio file provided")
+        return None, json_response({"error": "No audio file provided"}, 400)
+    turn.chat_history = load_chat_history(turn.session_id, req.form.get("history"), FIREBASE_SESSION_STORE)
+    if turn.chat_history is None:
+        return None, json_response({"error": "Session not found or expired"}, 404)
+    timer.lap("parse")
+    return turn, None
 
-    files = {
-        "file": ("audio.webm", audio_data, content_type)
-    }
-    
-    data = {
-        "model": "saarika:v2.5",
-        "language_code": language_code,
-        "with_diarization": "false"
-    }
-
-    response = requests.post(
-        "https://api.sarvam.ai/speech-to-text",
-        headers=headers,
-        files=files,
-        data=data,
-        timeout=30
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"Sarvam STT API error: {response.status_code} - {response.text}")
-    
-    result = response.json()
-    transcript = result.get("transcript", "")
-    
-    return transcript
 
-
-def generate_response(user_message: str, chat_history: list, interview_type: str = "technical") -> str:
+def flush_writes():
     """
-    Generate AI interviewer response using Groq (FREE tier!).
+    Commit the turn's queued session and transcript writes: once the response
+    is sent the instance's CPU is throttled, and it may be stopped without atexit.
     """
-    client = get_groq_client()
-    
-    # System prompts for different interview types
-    system_prompts = {
-        "technical": """You are a senior technical interviewer at a top tech company. 
-Your goal is to assess the candidate's technical skills through thoughtful questions and follow-ups.
-- Ask one question at a time
-- Keep responses concise (2-3 sentences max)
-- Be professional but encouraging
-- If the answer is incomplete, ask a clarifying follow-up
-- Probe for depth of understanding""",
-        
-        "behavioral": """You are an experienced HR interviewer focusing on behavioral competencies.
-Use the STAR method (Situation, Task, Action, Result) to probe candidates.
-- Ask one behavioral question at a time
-- Keep responses brief (2-3 sentences)
-- Be warm and professional
-- Look for specific examples, not general statements
-- Ask follow-up questions to get concrete details""",
-        
-        "case_study": """You are a management consultant conducting a case interview.
-Present business problems and guide the candidate through structured problem-solving.
-- Start with a clear business scenario
-- Keep responses concise (2-3 sentences)
-- Let the candidate lead the analysis
-- Provide hints if they're stuck
-- Evaluate their framework and logical thinking"""
-    }
-    
-    system_prompt = system_prompts.get(interview_type, system_prompts["technical"])
-    
-    # Build messages array (OpenAI-compatible format)
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add chat history
-    for msg in chat_history:
-        messages.append({
-            "role": msg.get("role", "user"),
-            "content": msg.get("content", "")
-        })
-    
-    # Add current user message
-    messages.append({"role": "user", "content": user_message})
-    
-    # Generate response using Groq (llama-3.3-70b-versatile is fast and free)
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=messages,
-        max_tokens=200,
-        temperature=0.7,
-    )
-    
-    return response.choices[0].message.content or ""
-
+    flush_sessions(FIREBASE_FLUSH_TIMEOUT)
+    flush_transcripts(FIREBASE_FLUSH_TIMEOUT)
 
-import asyncio
-import edge_tts
-
-def synthesize_speech_edge(text: str) -> bytes:
-    """
-    Convert text to speech using Edge-TTS (Free).
-    """
-    voice = "en-US-AriaNeural"
-    communicate = edge_tts.Communicate(text, voice)
-    
-    async def get_audio():
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
 
-    try:
-        # Run async function in sync wrapper
-        return asyncio.run(get_audio())
-    except Exception as e:
-        raise Exception(f"Edge-TTS error: {str(e)}")
+def flushed(events):
+    """A turn's SSE events, then its queued writes committed before the stream ends."""
+    yield from events
+    flush_writes()
 
 
-def synthesize_speech_sarvam(text: str, language_code: str = "hi-IN", speaker: str = "priya") -> bytes:
-    """
-    Convert text to speech using Sarvam AI.
-    """
-    if not SARVAM_API_KEY:
-        raise ValueError("SARVAM_API_KEY environment variable is not set")
-    
-    # Map 'en-IN' to a valid speaker if needed, though 'meera' works for multiple
-    
-    headers = {
-        "api-subscription-key": SARVAM_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "inputs": [text],
-        "target_language_code": language_code,
-        "speaker": speaker,
-        "pace": 1.0,
-        "speech_sample_rate": 8000,
-        "enable_preprocessing": True,
-        "model": "bulbul:v3"
-    }
-
-    response = requests.post(
-        "https://api.sarvam.ai/text-to-speech",
-        headers=headers,
-        json=payload,
-        timeout=30
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"Sarvam AI API error: {response.status_code} - {response.text}")
-    
-    result = response.json()
-    # Sarvam returns audio as base64 string in 'audios' array
-    audio_base64 = result.get("audios", [""])[0]
-    
-    if not audio_base64:
-        raise Exception("Sarvam AI returned empty audio")
-        
-    return base64.b64decode(audio_base64)
+def error_response(e: Exception) -> https_fn.Response:
+    """Response for an exception of a turn handler."""
+    if isinstance(e, AdmissionRejected):
+        return admission_error(e)
+    if isinstance(e, UploadTooLarge):
+        return json_response({"error": str(e)}, 413)
+    print(f"Error processing interview turn: {str(e)}")
+    return json_response({"error": str(e)}, 500)
 
 
 # Configure CORS for the function
@@ -263,107 +120,150 @@ def process_interview_turn(req: https_fn.Request) -> https_fn.Response:
     """
     Process a single turn in the interview conversation.
     """
+    # Handle preflight OPTIONS request
+    if req.method == "OPTIONS":
+        return https_fn.Response("", status=204)
+    
+    # Each function scales on its own, so each is warmed through its own URL (.../warmup)
+    if req.path.rstrip("/").endswith("/warmup"):
+        return warmup_response()
+    
+    if req.method != "POST":
+        return json_response({"error": "Method not allowed"}, 405)
+    
+    ticket = None
     try:
-        # Handle preflight OPTIONS request
-        if req.method == "OPTIONS":
-            return https_fn.Response("", status=204)
-        
-        if req.method != "POST":
-            return https_fn.Response(
-                json.dumps({"error": "Method not allowed"}),
-                status=405,
-                content_type="application/json"
-            )
-        
-        # 1. Parse request
-        print("DEBUG: Request Form Data:", req.form)
-        audio_file = req.files.get("audio")
-        history_json = req.form.get("history", "[]")
-        interview_type = req.form.get("interview_type", "technical")
+        timer = TurnTimer()
+        turn, error = parse_turn(req, timer)
+        if error is not None:
+            return error
+        ticket = admit_turn(turn, req.headers.get("X-Forwarded-For"), req.remote_addr)
+        spool_turn_audio(turn, req.files["audio"])
         
-        # TTS Options
-        tts_provider = req.form.get("tts_provider", "edge")  # 'edge' or 'sarvam'
-        tts_language = req.form.get("tts_language", "hi-IN")
-        tts_model = req.form.get("tts_model", "bulbul:v3")
+        # STT -> LLM -> TTS (text-only reply if every TTS provider fails)
+        turn_pipeline.run(turn)
+        if not turn.user_transcript.strip():
+            return json_response(EMPTY_TRANSCRIPT_RESPONSE, 200, timer.headers())
         
-        if not audio_file:
-            print("Error: No audio file provided")
-            return https_fn.Response(
-                json.dumps({"error": "No audio file provided"}),
-                status=400,
-                content_type="application/json"
-            )
-        
-        # Parse chat history
-        try:
-            chat_history = json.loads(history_json)
-        except json.JSONDecodeError:
-            chat_history = []
-        
-        # 2. Speech-to-Text (Deepgram or Sarvam)
-        audio_data = audio_file.read()
-        content_type = audio_file.content_type or "audio/webm"
-        
-        # Check if we should use Sarvam STT (for Indic languages when Sarvam TTS selected)
-        use_sarvam_stt = False
-        if tts_provider == "sarvam" and tts_language:
-            if not tts_language.startswith("en-"):
-                use_sarvam_stt = True
-        
-        if use_sarvam_stt:
-            print(f"Transcribing audio with Sarvam (Language: {tts_language})...")
-            user_transcript = transcribe_audio_sarvam(audio_data, language_code=tts_language, content_type=content_type)
-        else:
-            # Fallback to Deepgram for English
-            stt_language = "en"
-            print(f"Transcribing audio with Deepgram (Language: {stt_language})...")
-            user_transcript = transcribe_audio(audio_data, language=stt_language, content_type=content_type)
+        # JSON+base64, binary or multipart; "url" mode is answered as JSON, since a
+        # separate get_audio function could never read this instance's blobs
+        body, response_type, headers = turn_response(
+            turn,
+            req.form.get("response_mode"),
+            req.headers.get("Accept"),
+            audio_url_base=None,
+        )
+        return https_fn.Response(body, status=200, content_type=response_type, headers=headers)
+    
+    except Exception as e:
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
+        flush_writes()
 
-        print(f"Transcript: '{user_transcript}'")
-        
-        if not user_transcript.strip():
-            print("Error: Empty transcript")
-            return https_fn.Response(
-                json.dumps({
-                    "error": "Could not transcribe audio. Please speak more clearly.",
-                    "user_transcript": "",
-                    "ai_response_text": "",
-                    "audio_base64": ""
-                }),
-                status=200,
-                content_type="application/json"
-            )
-        
-        # 3. Generate AI Response (Groq)
-        ai_response_text = generate_response(user_transcript, chat_history, interview_type)
+
+@https_fn.on_request(
+    cors=cors_options,
+    memory=options.MemoryOption.GB_1,
+    timeout_sec=60,
+    min_instances=0,
+    secrets=["DEEPGRAM_API_KEY", "GROQ_API_KEY", "ELEVENLABS_API_KEY", "ELEVENLABS_VOICE_ID", "SARVAM_API_KEY"],
+)
+def process_interview_turn_stream(req: https_fn.Request) -> https_fn.Response:
+    """
+    Streaming variant of process_interview_turn.
+    
+    Transcribes the audio, then streams the LLM response as Server-Sent Events,
+    synthesizing each sentence as soon as it is complete.
+    """
+    if req.method == "OPTIONS":
+        return https_fn.Response("", status=204)
+    
+    if req.path.rstrip("/").endswith("/warmup"):
+        return warmup_response()
+    
+    if req.method != "POST":
+        return json_response({"error": "Method not allowed"}, 405)
+    
+    ticket = None
+    try:
+        timer = TurnTimer()
+        turn, error = parse_turn(req, timer)
+        if error is not None:
+            return error
+        ticket = admit_turn(turn, req.headers.get("X-Forwarded-For"), req.remote_addr)
+        spool_turn_audio(turn, req.files["audio"])
         
-        # 4. Text-to-Speech
-        print(f"Synthesizing speech using {tts_provider}...")
-        if tts_provider == "sarvam":
-            audio_bytes = synthesize_speech_sarvam(ai_response_text, tts_language)
+        # With a filler ("Got it, ...") the stream opens right away and STT runs inside it
+        filler = turn_pipeline.filler(turn) if wants_filler(req.form.get("filler")) else None
+        if filler is not None:
+            events = stream_after(sse_event("filler", filler_payload(filler)), lambda: turn_pipeline.stream(turn))
         else:
-            audio_bytes = synthesize_speech_edge(ai_response_text)
-            
-        audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-        
-        # 5. Return response
-        return https_fn.Response(
-            json.dumps({
-                "user_transcript": user_transcript,
-                "ai_response_text": ai_response_text,
-                "audio_base64": audio_base64,
-            }),
+            events = turn_pipeline.stream(turn)
+        # Only the pre-stream spans fit in the header; LLM/TTS spans go to /metrics
+        response = https_fn.Response(
+            flushed(events),
             status=200,
-            content_type="application/json"
+            content_type="text/event-stream",
+            headers={**SSE_HEADERS, **timer.headers()},
         )
-        
+        # The provider slots are held until the stream is done
+        response.call_on_close(ticket.release)
+        ticket = None
+        return response
+    
     except Exception as e:
-        print(f"Error processing interview turn: {str(e)}")
+        return error_response(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@https_fn.on_request(cors=options.CorsOptions(cors_origins="*", cors_methods=["GET"]))
+def filler(req: https_fn.Request) -> https_fn.Response:
+    """
+    A pre-synthesized filler phrase ("Got it, let me think about that.") for
+    non-streaming clients to play while their turn is processed.
+    
+    Returns 204 until the phrase bank of the requested voice is ready.
+    """
+    picked = turn_pipeline.filler(TurnContext.from_params(req.args, req.headers.get("Accept"), TurnTimer()))
+    if picked is None:
+        return https_fn.Response("", status=204)
+    return https_fn.Response(json.dumps(filler_payload(picked)), status=200, content_type="application/json")
+
+
+@https_fn.on_request(cors=cors_options)
+def create_session(req: https_fn.Request) -> https_fn.Response:
+    """
+    Create a server-side interview session.
+    
+    Subsequent turns send only the audio plus the returned session_id; the chat
+    history is kept on the server.
+    """
+    if req.method == "OPTIONS":
+        return https_fn.Response("", status=204)
+    
+    if req.method != "POST":
         return https_fn.Response(
-            json.dumps({"error": str(e)}),
-            status=500,
+            json.dumps({"error": "Method not allowed"}),
+            status=405,
             content_type="application/json"
         )
+    
+    session = open_session(req.get_json(silent=True) or req.form, FIREBASE_SESSION_STORE)
+    return https_fn.Response(
+        json.dumps({"session_id": session["session_id"], "expires_in": SESSION_TTL_SECONDS}),
+        status=200,
+        content_type="application/json"
+    )
+
+
+@https_fn.on_request()
+def metrics(req: https_fn.Request) -> https_fn.Response:
+    """Prometheus-style per-stage latency histograms."""
+    return https_fn.Response(render_metrics(), status=200, content_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @https_fn.on_request(
@@ -380,8 +280,25 @@ def health_check(req: https_fn.Request) -> https_fn.Response:
                 "deepgram": bool(DEEPGRAM_API_KEY),
                 "elevenlabs": bool(ELEVENLABS_API_KEY),
                 "sarvam": bool(SARVAM_API_KEY),
-            }
+            },
+            "connection_pools": provider_clients.pool_stats(),
+            "tts_cache": tts_cache.stats(),
+            "history": history_window.stats(),
+            "opener_cache": opener_cache.stats(),
+            "admission": admission.stats(),
+            "vad": vad_stats.snapshot(),
+            "stt_router": stt_router.stats(),
+            "tts_router": tts_router.stats(),
+            "transcode": transcode_stats.snapshot(),
+            "fillers": filler_bank.stats(),
+            "startup": startup_profile.snapshot(),
+            "transcripts": transcript_stats(FIREBASE_TRANSCRIPT_STORE),
         }),
         status=200,
         content_type="application/json"
     )
+
+
+startup_profile.loaded()
+if WARMUP_ON_START:
+    warmup.start(warmup_steps())
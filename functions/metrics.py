@@ -0,0 +1,119 @@
+"""
+Per-stage latency instrumentation for interview turns.
+
+Each turn records timing spans (request parse, audio read, STT, LLM time to
+first token and total, TTS, encoding/serialization). Spans are:
+- emitted as a `Server-Timing` response header
+- aggregated into latency histograms labelled by stage, provider and interview
+  type, exposed in Prometheus text format on the /metrics routes
+
+Histograms are per process; with several gunicorn workers each worker reports
+its own series.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistograms:
+    """Thread-safe cumulative histograms keyed by (stage, provider, interview_type)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, provider: str = "", interview_type: str = ""):
+        key = (stage, provider, interview_type)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += seconds
+
+    def render(self, name: str = "interview_stage_latency_seconds") -> str:
+        lines = [
+            f"# HELP {name} Latency of interview turn pipeline stages.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for (stage, provider, interview_type), series in items:
+            labels = f'stage="{stage}",provider="{provider}",interview_type="{interview_type}"'
+            for i, bound in enumerate(self.buckets):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {series[i]}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series[len(self.buckets)]}')
+            lines.append(f"{name}_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {series[len(self.buckets)]}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide histograms
+stage_latency = LatencyHistograms()
+
+
+class TurnTimer:
+    """Collects the timing spans of a single turn."""
+
+    def __init__(self, interview_type: str = ""):
+        self.interview_type = interview_type
+        self.spans: List[Tuple[str, float, str]] = []  # (stage, seconds, provider)
+        self._lock = threading.Lock()
+        self._last_lap = time.perf_counter()
+
+    def lap(self, stage: str, provider: str = ""):
+        """Record the time since the previous lap (or timer creation) as a span."""
+        now = time.perf_counter()
+        self.record(stage, now - self._last_lap, provider)
+        self._last_lap = now
+
+    @contextmanager
+    def span(self, stage: str, provider: str = ""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, provider)
+
+    def record(self, stage: str, seconds: float, provider: str = ""):
+        """Record a span and add it to the process histograms."""
+        with self._lock:
+            self.spans.append((stage, seconds, provider))
+        stage_latency.observe(stage, seconds, provider, self.interview_type)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. `stt;desc="deepgram";dur=412.3`."""
+        with self._lock:
+            spans = list(self.spans)
+        entries = []
+        for stage, seconds, provider in spans:
+            desc = f';desc="{provider}"' if provider else ""
+            entries.append(f"{stage}{desc};dur={seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+    def headers(self) -> dict:
+        """Response headers exposing the spans to the browser."""
+        return {"Server-Timing": self.server_timing(), "Timing-Allow-Origin": "*"}
+
+
+# Other Prometheus sections appended to the histograms (e.g. admission gauges)
+metric_renderers: List[Callable[[], str]] = []
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition for the /metrics routes."""
+    return stage_latency.render() + "".join(render() for render in metric_renderers)
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,193 @@
+"""
+Response cache for the opening turns of an interview.
+
+The first turn of a session is nearly always a greeting ("Hi, I'm ready to
+start") answered under one of three fixed system prompts, so a Groq round trip
+buys little more than a canned opener. Early turns (at most
+OPENER_CACHE_MAX_HISTORY prior messages) are therefore answered from a cache
+keyed on the interview type and the normalized transcript:
+
+- Normalization lowercases, drops punctuation and filler words ("um", "so"),
+  and maps any short greeting / readiness phrase to a single "<greeting>" key,
+  so "Hello!" and "Hi there, I'm ready." share their openers
+- Each key keeps up to OPENER_CACHE_VARIANTS responses; until it has that
+  many, lookups miss and the LLM reply is added, afterwards a random variant
+  (never the previous one twice in a row) is served without an LLM call
+- LLM replies expire after OPENER_CACHE_TTL_SECONDS; the seeded question bank
+  (OPENER_SEEDS, or a JSON file at OPENER_BANK_FILE) fills the greeting key of
+  every interview type at import and never expires
+
+Cached replies are voiced by TTS as usual and then hit tts_cache, so a seeded
+opener costs neither LLM tokens nor, after its first use, a TTS call.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+OPENER_CACHE_ENABLED = os.environ.get("OPENER_CACHE_ENABLED", "true").lower() == "true"
+OPENER_CACHE_TTL_SECONDS = float(os.environ.get("OPENER_CACHE_TTL_SECONDS", "86400"))
+OPENER_CACHE_VARIANTS = int(os.environ.get("OPENER_CACHE_VARIANTS", "3"))
+# Prior chat messages a turn may have and still count as an opener (0 = first turn only)
+OPENER_CACHE_MAX_HISTORY = int(os.environ.get("OPENER_CACHE_MAX_HISTORY", "0"))
+OPENER_CACHE_MAX_KEYS = int(os.environ.get("OPENER_CACHE_MAX_KEYS", "512"))
+OPENER_BANK_FILE = os.environ.get("OPENER_BANK_FILE", "")
+
+GREETING_KEY = "<greeting>"
+MAX_GREETING_WORDS = 12
+
+FILLER_WORDS = {"um", "umm", "uh", "uhh", "erm", "hmm", "so", "well", "okay", "ok", "alright", "right", "yeah", "like"}
+GREETING_WORDS = {
+    "hi", "hello", "hey", "hiya", "there", "good", "morning", "afternoon", "evening", "greetings",
+    "i", "im", "i'm", "am", "we", "are", "can", "lets", "let's", "let", "us", "get", "started", "start",
+    "begin", "go", "ahead", "ready", "sure", "yes", "thanks", "thank", "you", "for", "having", "me",
+    "nice", "to", "meet", "glad", "be", "here", "the", "interview", "please", "whenever", "doing", "how",
+}
+
+# Seeded question bank: greeting openers per interview type
+OPENER_SEEDS: Dict[str, List[str]] = {
+    "technical": [
+        "Hi, thanks for joining. To start, could you walk me through a recent project you built and the main technical decisions you made?",
+        "Hello, good to meet you. Let's begin with something you know well: which system or feature are you proudest of, and how did you design it?",
+        "Hi there. To warm up, tell me about a tricky bug you tracked down recently and how you found the root cause.",
+    ],
+    "behavioral": [
+        "Hi, thanks for coming in. To start, tell me about a time you had to deliver under a tight deadline. What was the situation?",
+        "Hello, nice to meet you. Can you describe a situation where you disagreed with a teammate, and how you handled it?",
+        "Hi there. Let's begin with a time you took ownership of a problem nobody else was addressing. What happened?",
+    ],
+    "case_study": [
+        "Hi, welcome. Here's our case: a mid-sized coffee chain has seen profits fall 20% over two years while revenue stayed flat. How would you approach this?",
+        "Hello. Our client is a regional airline considering a new route between two mid-sized cities. How would you decide whether they should launch it?",
+        "Hi there. A subscription meal-kit company is losing a third of its customers within three months. How would you structure your analysis?",
+    ],
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+
+def normalize_transcript(transcript: str) -> str:
+    """Cache key text: lowercased, no punctuation or filler words; short greetings become GREETING_KEY."""
+    words = [word.strip("'") for word in _PUNCTUATION.sub(" ", transcript.lower()).split()]
+    words = [word for word in words if word and word not in FILLER_WORDS]
+    if not words:
+        return ""
+    if len(words) <= MAX_GREETING_WORDS and all(word in GREETING_WORDS for word in words):
+        return GREETING_KEY
+    return " ".join(words)
+
+
+def load_seeds(path: str = OPENER_BANK_FILE) -> Dict[str, List[str]]:
+    """The question bank from OPENER_BANK_FILE ({"technical": [...], ...}), or the built-in OPENER_SEEDS."""
+    if not path:
+        return OPENER_SEEDS
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {interview_type: [str(text) for text in texts] for interview_type, texts in json.load(f).items()}
+    except Exception as e:
+        print(f"Could not load opener bank {path}, using the built-in one: {e}")
+        return OPENER_SEEDS
+
+
+class OpenerCache:
+    """Up to `variants` replies per (interview type, normalized transcript) for early turns."""
+
+    def __init__(self, variants: int = OPENER_CACHE_VARIANTS, ttl: float = OPENER_CACHE_TTL_SECONDS,
+                 max_history: int = OPENER_CACHE_MAX_HISTORY, max_keys: int = OPENER_CACHE_MAX_KEYS):
+        self.variants = variants
+        self.ttl = ttl
+        self.max_history = max_history
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Tuple[str, str], List[Tuple[str, float]]]" = OrderedDict()  # key -> [(text, expires)]
+        self._last: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.seeded = 0
+
+    def _key(self, interview_type: str, transcript: str, chat_history: Optional[list]) -> Optional[Tuple[str, str]]:
+        """Cache key, or None if the turn is not an opener (too much history, empty transcript, disabled)."""
+        if not OPENER_CACHE_ENABLED or len(chat_history or []) > self.max_history:
+            return None
+        normalized = normalize_transcript(transcript)
+        if not normalized:
+            return None
+        return interview_type, normalized
+
+    def _live(self, key: Tuple[str, str]) -> List[Tuple[str, float]]:
+        now = time.time()
+        entries = [entry for entry in self._entries.get(key, []) if entry[1] > now]
+        if entries:
+            self._entries[key] = entries
+        else:
+            self._entries.pop(key, None)
+        return entries
+
+    def _add(self, key: Tuple[str, str], text: str, expires: float):
+        entries = self._live(key)
+        if len(entries) >= self.variants or any(existing == text for existing, _ in entries):
+            return False
+        entries.append((text, expires))
+        self._entries[key] = entries
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            evicted, _ = self._entries.popitem(last=False)
+            self._last.pop(evicted, None)
+        return True
+
+    def get(self, interview_type: str, transcript: str, chat_history: Optional[list]) -> Optional[str]:
+        """A cached reply for an opener turn once its key has all its variants, else None."""
+        key = self._key(interview_type, transcript, chat_history)
+        if key is None:
+            return None
+        with self._lock:
+            entries = self._live(key)
+            if len(entries) < self.variants:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            choices = [text for text, _ in entries if text != self._last.get(key)] or [text for text, _ in entries]
+            text = random.choice(choices)
+            self._last[key] = text
+            self.hits += 1
+            return text
+
+    def put(self, interview_type: str, transcript: str, chat_history: Optional[list], response: str):
+        """Remember an LLM reply to an opener turn (no-op for later turns or when the key is full)."""
+        key = self._key(interview_type, transcript, chat_history)
+        if key is None or not response.strip():
+            return
+        with self._lock:
+            if self._add(key, response.strip(), time.time() + self.ttl):
+                self.stored += 1
+
+    def seed(self, bank: Dict[str, List[str]]):
+        """Fill the greeting key of each interview type from a question bank (entries never expire)."""
+        with self._lock:
+            for interview_type, texts in bank.items():
+                for text in texts:
+                    if self._add((interview_type, GREETING_KEY), text.strip(), float("inf")):
+                        self.seeded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": OPENER_CACHE_ENABLED,
+                "keys": len(self._entries),
+                "variants": sum(len(entries) for entries in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stored": self.stored,
+                "seeded": self.seeded,
+            }
+
+
+# Process-wide cache, warmed from the question bank
+opener_cache = OpenerCache()
+opener_cache.seed(load_seeds())
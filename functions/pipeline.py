@@ -0,0 +1,837 @@
+"""
+The interview turn pipeline, shared by every server.
+
+A turn is STT -> LLM -> TTS. The stages (TurnStages) are the provider calls:
+the sync ones in this module (pooled requests sessions, the Groq SDK, the
+Edge-TTS worker loop) or the coroutines of app_async (aiohttp, AsyncGroq), which
+take the same arguments. TurnPipeline runs them for a TurnContext, the parsed
+turn request, and does the rest of a turn the same way for every server:
+
+- timer spans (stt, llm, tts) and a text-only reply when every TTS provider fails
+- the kept speculative reply of a chunk-uploaded turn instead of an LLM call
+- hooks before / after STT and after the turn (the session history is saved by one)
+- filler phrases in the turn's voice, and the non-streaming response body
+
+An executor decides where stage calls run: on the request thread (inline), on
+a bounded thread pool shared by the process (PIPELINE_EXECUTOR=pool, at most
+PIPELINE_POOL_WORKERS provider calls at a time), or awaited on the event loop
+with blocking hooks moved to threads (the async server).
+
+The servers only parse requests, admit them and write responses: main.py
+(Firebase), app.py (Flask, also run by local_server.py) and app_async.py (aiohttp).
+"""
+
+import os
+import base64
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Provider SDKs (groq, edge_tts via tts_worker, requests via provider_clients,
+# firebase_admin via session_store) are imported on first use or by warm-up
+import provider_clients
+from streaming import stream_turn, stream_turn_async, sse_turn_event
+from history_manager import history_window, estimate_tokens, summarize_with_groq
+from opener_cache import opener_cache
+from admission import admission, client_key, Ticket
+from audio_response import negotiate_response_mode, build_turn_response
+from audio_codec import AudioFormat, negotiate_audio_format, encode_speech
+from fillers import filler_bank, FILLER_PHRASES, FILLER_WARM_FORMAT
+from vad import preprocess_audio
+from upload_stream import AudioSource, request_body, multipart_body, spool_upload
+from stt_router import stt_router, stt_plan
+from tts_router import tts_router, tts_plan, parse_allowed, TTSResult, SARVAM_MODEL, SARVAM_SAMPLE_RATE
+from metrics import TurnTimer
+from session_store import get_session_store
+from transcript_store import get_transcript_queue, turn_messages
+from speculative import SpeculativeTurn
+from startup import WARMUP_TTS_TEXT
+
+# Load environment variables for local development
+load_dotenv()
+
+DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY")
+ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY")
+ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Default: Rachel
+SARVAM_API_KEY = os.environ.get("SARVAM_API_KEY")
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+
+# Provider endpoints (overridable to point at local stubs, see bench_load.py;
+# the Groq SDK reads GROQ_BASE_URL itself)
+DEEPGRAM_BASE_URL = os.environ.get("DEEPGRAM_BASE_URL", "https://api.deepgram.com")
+SARVAM_BASE_URL = os.environ.get("SARVAM_BASE_URL", "https://api.sarvam.ai")
+
+# "inline" (request thread) or "pool" (PIPELINE_POOL_WORKERS threads) for the sync servers
+PIPELINE_EXECUTOR = os.environ.get("PIPELINE_EXECUTOR", "inline").lower()
+PIPELINE_POOL_WORKERS = int(os.environ.get("PIPELINE_POOL_WORKERS", "16"))
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+EDGE_VOICE = "en-US-AriaNeural"
+
+# Request defaults (the web client always sends its own)
+DEFAULT_TTS_PROVIDER = "edge"
+DEFAULT_TTS_LANGUAGE = "hi-IN"
+
+# Body of a turn whose audio had no speech or could not be transcribed
+EMPTY_TRANSCRIPT_RESPONSE = {
+    "error": "Could not transcribe audio. Please speak more clearly.",
+    "user_transcript": "",
+    "ai_response_text": "",
+    "audio_base64": "",
+}
+
+# System prompts for different interview types (built once, at import)
+SYSTEM_PROMPTS = {
+    "technical": """You are a senior technical interviewer at a top tech company.
+Your goal is to assess the candidate's technical skills through thoughtful questions and follow-ups.
+- Ask one question at a time
+- Keep responses concise (2-3 sentences max)
+- Be professional but encouraging
+- If the answer is incomplete, ask a clarifying follow-up
+- Probe for depth of understanding""",
+
+    "behavioral": """You are an experienced HR interviewer focusing on behavioral competencies.
+Use the STAR method (Situation, Task, Action, Result) to probe candidates.
+- Ask one behavioral question at a time
+- Keep responses brief (2-3 sentences)
+- Be warm and professional
+- Look for specific examples, not general statements
+- Ask follow-up questions to get concrete details""",
+
+    "case_study": """You are a management consultant conducting a case interview.
+Present business problems and guide the candidate through structured problem-solving.
+- Start with a clear business scenario
+- Keep responses concise (2-3 sentences)
+- Let the candidate lead the analysis
+- Provide hints if they're stuck
+- Evaluate their framework and logical thinking"""
+}
+
+
+# Sync stages
+
+groq_client = None
+
+def get_groq_client():
+    """Lazy initialization of Groq client."""
+    global groq_client
+    if groq_client is None:
+        if not GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY environment variable is not set")
+        from groq import Groq
+
+        groq_client = Groq(api_key=GROQ_API_KEY)
+    return groq_client
+
+
+def transcribe_audio(audio_data: AudioSource, language: str = "en", content_type: str = "audio/webm") -> str:
+    """
+    Convert audio to text using Deepgram Nova-2 model.
+    """
+    if not DEEPGRAM_API_KEY:
+        raise ValueError("DEEPGRAM_API_KEY environment variable is not set")
+
+    response = provider_clients.post(
+        "stt",
+        f"{DEEPGRAM_BASE_URL}/v1/listen",
+        params={
+            "model": "nova-2",
+            "smart_format": "true",
+            "language": language,
+        },
+        headers={
+            "Authorization": f"Token {DEEPGRAM_API_KEY}",
+            "Content-Type": content_type,
+        },
+        data=request_body(audio_data),
+    )
+
+    if response.status_code != 200:
+        raise provider_clients.ProviderError("Deepgram API", response.status_code, response.text)
+
+    result = response.json()
+    transcript = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
+
+    return transcript
+
+
+def transcribe_audio_sarvam(audio_data: AudioSource, language_code: str = "hi-IN", content_type: str = "audio/webm") -> str:
+    """
+    Convert audio to text using Sarvam AI (saarika:v2.5).
+    """
+    if not SARVAM_API_KEY:
+        raise ValueError("SARVAM_API_KEY environment variable is not set")
+
+    # Sarvam might reject complex content types, strip params
+    if ";" in content_type:
+        content_type = content_type.split(";")[0].strip()
+
+    data = {
+        "model": "saarika:v2.5",
+        "language_code": language_code,
+        "with_diarization": "false"
+    }
+
+    # Multipart body streamed from the upload spool (requests' files= would join it in memory)
+    body, body_type = multipart_body(audio_data, "audio.webm", content_type, data)
+    headers = {
+        "api-subscription-key": SARVAM_API_KEY,
+        "Content-Type": body_type,
+    }
+
+    response = provider_clients.post(
+        "stt",
+        f"{SARVAM_BASE_URL}/speech-to-text",
+        headers=headers,
+        data=body,
+    )
+
+    if response.status_code != 200:
+        raise provider_clients.ProviderError("Sarvam STT API", response.status_code, response.text)
+
+    result = response.json()
+    transcript = result.get("transcript", "")
+
+    return transcript
+
+
+def stt_provider_for(tts_provider: str, tts_language: str) -> str:
+    """Sarvam STT for Indic languages when Sarvam TTS is selected, Deepgram otherwise."""
+    if tts_provider == "sarvam" and tts_language and not tts_language.startswith("en-"):
+        return "sarvam"
+    return "deepgram"
+
+
+def configured_stt_plan(tts_provider: str, tts_language: str) -> List[Tuple[str, str]]:
+    """The turn's STT providers and language codes, in preference order (see stt_router.stt_plan)."""
+    return stt_plan(
+        stt_provider_for(tts_provider, tts_language),
+        tts_language,
+        {"deepgram": bool(DEEPGRAM_API_KEY), "sarvam": bool(SARVAM_API_KEY)},
+    )
+
+
+def transcribe_turn_audio(audio_data: AudioSource, content_type: str, tts_provider: str, tts_language: str) -> Tuple[str, str]:
+    """
+    Route STT to Sarvam for Indic languages (when Sarvam TTS is selected), Deepgram otherwise.
+
+    Silence is trimmed first; audio with no speech skips the STT call entirely
+    and returns an empty transcript. The other provider is used as a hedge /
+    failover when it is configured and supports the language (see stt_router).
+
+    Returns (transcript, provider that produced it).
+    """
+    vad_result = preprocess_audio(audio_data, content_type)
+    if not vad_result.has_speech:
+        print("No speech detected, skipping STT")
+        return "", ""
+    audio_data, content_type = vad_result.audio_data, vad_result.content_type
+
+    plan = configured_stt_plan(tts_provider, tts_language)
+    calls = []
+    for provider, language in plan:
+        if provider == "sarvam":
+            calls.append((provider, partial(transcribe_audio_sarvam, audio_data, language, content_type)))
+        else:
+            calls.append((provider, partial(transcribe_audio, audio_data, language, content_type)))
+
+    print(f"Transcribing audio with {' -> '.join(f'{p} ({l})' for p, l in plan) or 'no provider'}...")
+    return stt_router.transcribe(calls)
+
+
+def transcribe_interim(audio_data: AudioSource, content_type: str, tts_provider: str, tts_language: str) -> str:
+    """Interim transcript of a streaming-input turn's audio so far (primary provider, no hedging)."""
+    plan = configured_stt_plan(tts_provider, tts_language)
+    if not plan:
+        raise ValueError("No STT provider configured")
+    provider, language = plan[0]
+    if provider == "sarvam":
+        return transcribe_audio_sarvam(audio_data, language, content_type)
+    return transcribe_audio(audio_data, language, content_type)
+
+
+def build_messages(user_message: str, chat_history: list, interview_type: str = "technical") -> list:
+    """
+    Build the Groq chat messages (system prompt + history + current answer).
+    """
+    system_prompt = SYSTEM_PROMPTS.get(interview_type, SYSTEM_PROMPTS["technical"])
+
+    # Fit the chat history into the token budget (older turns become a rolling summary)
+    summary, recent_history, prompt_metrics = history_window.fit(
+        chat_history,
+        estimate_tokens(system_prompt) + estimate_tokens(user_message),
+        summarize=lambda previous, new: summarize_with_groq(get_groq_client(), previous, new),
+    )
+    print(f"Prompt metrics: {prompt_metrics}")
+
+    # Build messages array (OpenAI-compatible format)
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the interview so far:\n{summary}"})
+
+    # Add chat history
+    messages.extend(recent_history)
+
+    # Add current user message
+    messages.append({"role": "user", "content": user_message})
+
+    return messages
+
+
+def generate_response(user_message: str, chat_history: list, interview_type: str = "technical") -> str:
+    """
+    Generate AI interviewer response using Groq (FREE tier!).
+    """
+    # Opening turns (a greeting under a fixed system prompt) are answered from the cache
+    cached = opener_cache.get(interview_type, user_message, chat_history)
+    if cached is not None:
+        return cached
+    client = get_groq_client()
+    messages = build_messages(user_message, chat_history, interview_type)
+
+    # Generate response using Groq (llama-3.3-70b-versatile is fast and free)
+    response = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=messages,
+        max_tokens=200,
+        temperature=0.7,
+    )
+
+    ai_response = response.choices[0].message.content or ""
+    opener_cache.put(interview_type, user_message, chat_history, ai_response)
+    return ai_response
+
+
+def generate_response_stream(user_message: str, chat_history: list, interview_type: str = "technical"):
+    """
+    Stream the AI interviewer response from Groq, yielding text deltas.
+    """
+    cached = opener_cache.get(interview_type, user_message, chat_history)
+    if cached is not None:
+        yield cached
+        return
+    client = get_groq_client()
+    messages = build_messages(user_message, chat_history, interview_type)
+
+    stream = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=messages,
+        max_tokens=200,
+        temperature=0.7,
+        stream=True,
+    )
+
+    deltas = []
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            deltas.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    opener_cache.put(interview_type, user_message, chat_history, "".join(deltas))
+
+
+def request_speech_sarvam(text: str, language_code: str = "hi-IN", speaker: str = "priya") -> bytes:
+    """
+    Call Sarvam AI text-to-speech (uncached).
+    """
+    if not SARVAM_API_KEY:
+        raise ValueError("SARVAM_API_KEY environment variable is not set")
+
+    headers = {
+        "api-subscription-key": SARVAM_API_KEY,
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "inputs": [text],
+        "target_language_code": language_code,
+        "speaker": speaker,
+        "pace": 1.0,
+        "speech_sample_rate": SARVAM_SAMPLE_RATE,
+        "enable_preprocessing": True,
+        "model": SARVAM_MODEL
+    }
+
+    response = provider_clients.post(
+        "tts",
+        f"{SARVAM_BASE_URL}/text-to-speech",
+        headers=headers,
+        json=payload,
+    )
+
+    if response.status_code != 200:
+        raise provider_clients.ProviderError("Sarvam AI API", response.status_code, response.text)
+
+    result = response.json()
+    # Sarvam returns audio as base64 string in 'audios' array
+    audio_base64 = result.get("audios", [""])[0]
+
+    if not audio_base64:
+        raise Exception("Sarvam AI returned empty audio")
+
+    return base64.b64decode(audio_base64)
+
+
+def request_speech_edge(text: str, voice: str = EDGE_VOICE) -> bytes:
+    """
+    Synthesize with Edge-TTS on the process-wide worker loop (uncached).
+    """
+    import tts_worker  # edge_tts + aiohttp, off the cold-start path
+
+    try:
+        return tts_worker.synthesize(text, voice)
+    except Exception as e:
+        raise Exception(f"Edge-TTS error: {str(e)}")
+
+
+# Uncached provider calls used by the TTS router
+TTS_SYNTHESIZERS = {
+    "edge": lambda option, text: request_speech_edge(text, option.voice),
+    "sarvam": lambda option, text: request_speech_sarvam(text, option.language, option.voice),
+}
+
+
+def synthesize_turn_speech(text: str, tts_provider: str, tts_language: str, tts_allowed: Optional[str] = None,
+                           audio_format: Optional[AudioFormat] = None) -> TTSResult:
+    """
+    Synthesize the AI response, preferring the TTS provider selected by the client.
+
+    The router may pick a faster compatible provider or fall back when the
+    preferred one fails (see tts_router); tts_allowed restricts the fallbacks.
+    The audio is re-encoded to audio_format when one was negotiated (see audio_codec).
+    """
+    options = tts_plan(
+        tts_provider,
+        tts_language,
+        {"edge": True, "sarvam": bool(SARVAM_API_KEY)},
+        parse_allowed(tts_allowed),
+    )
+    return encode_speech(tts_router.synthesize(text, options, TTS_SYNTHESIZERS), audio_format)
+
+
+def audio_mime_type(tts_provider: str) -> str:
+    """Content type of the audio produced by a TTS provider."""
+    return "audio/wav" if tts_provider == "sarvam" else "audio/mpeg"
+
+
+# Engine
+
+class TurnStages(NamedTuple):
+    """The provider calls of a turn (plain functions, or coroutines for the async executor)."""
+    transcribe: Callable  # (audio, content_type, tts_provider, tts_language) -> (transcript, provider)
+    transcribe_interim: Callable  # (audio, content_type, tts_provider, tts_language) -> transcript
+    generate: Callable  # (user_message, chat_history, interview_type) -> reply text
+    generate_stream: Callable  # same arguments -> reply text deltas
+    synthesize: Callable  # (text, tts_provider, tts_language, tts_allowed, audio_format) -> TTSResult
+
+
+SYNC_STAGES = TurnStages(transcribe_turn_audio, transcribe_interim, generate_response, generate_response_stream,
+                         synthesize_turn_speech)
+
+HOOK_POINTS = ("before_stt", "after_stt", "after_turn")
+
+
+class TurnContext:
+    """A turn's request parameters, filled in with its results as the pipeline runs."""
+
+    def __init__(self, timer: TurnTimer, interview_type: str = "technical", tts_provider: str = DEFAULT_TTS_PROVIDER,
+                 tts_language: str = DEFAULT_TTS_LANGUAGE, tts_allowed: Optional[str] = None,
+                 audio_format: Optional[AudioFormat] = None, session_id: Optional[str] = None,
+                 user_id: Optional[str] = None, interview_id: Optional[str] = None):
+        self.timer = timer
+        self.interview_type = interview_type
+        self.tts_provider = tts_provider
+        self.tts_language = tts_language
+        self.tts_allowed = tts_allowed
+        self.audio_format = audio_format
+        self.session_id = session_id
+        # Firestore interview the transcript is persisted to (see transcript_store)
+        self.user_id = user_id
+        self.interview_id = interview_id
+        self.chat_history: list = []
+        self.audio_data: Optional[AudioSource] = None
+        self.content_type = "audio/webm"
+        self.speculative_turn: Optional[SpeculativeTurn] = None
+        # Results
+        self.user_transcript = ""
+        self.stt_provider = ""
+        self.speculation = None
+        self.llm_provider = "groq"
+        self.ai_response_text = ""
+        self.speech: Optional[TTSResult] = None
+        self.tts_error: Optional[str] = None
+        timer.interview_type = interview_type
+
+    @classmethod
+    def from_params(cls, params, accept: Optional[str], timer: TurnTimer) -> "TurnContext":
+        """The turn options of a request's form / JSON fields (history and audio are the server's)."""
+        return cls(
+            timer,
+            interview_type=params.get("interview_type", "technical"),
+            tts_provider=params.get("tts_provider", DEFAULT_TTS_PROVIDER),
+            tts_language=params.get("tts_language", DEFAULT_TTS_LANGUAGE),
+            tts_allowed=params.get("tts_allowed"),  # optional fallback restriction, e.g. "sarvam"
+            # Output codec: opus / mp3 / pcm / wav, optionally with a bitrate (e.g. "opus:16")
+            audio_format=negotiate_audio_format(params.get("audio_format"), accept),
+            session_id=params.get("session_id"),
+            user_id=params.get("user_id"),
+            interview_id=params.get("interview_id"),
+        )
+
+    def providers(self) -> Tuple[str, str, str]:
+        """The providers the turn holds admission slots on: its STT provider, Groq and its TTS provider."""
+        return stt_provider_for(self.tts_provider, self.tts_language), "groq", self.tts_provider
+
+    def voice(self) -> Tuple[str, str, str]:
+        """Filler bank key of the turn's voice and output format."""
+        return self.tts_provider, self.tts_language, self.audio_format.name if self.audio_format else ""
+
+
+class InlineExecutor:
+    """Stage calls run on the calling (request) thread."""
+
+    name = "inline"
+
+    def run(self, fn: Callable, *args):
+        return fn(*args)
+
+
+class PoolExecutor:
+    """Stage calls run on a bounded thread pool shared by every turn of the process."""
+
+    name = "pool"
+
+    def __init__(self, workers: int = PIPELINE_POOL_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+
+    def run(self, fn: Callable, *args):
+        return self._pool.submit(fn, *args).result()
+
+
+class AsyncExecutor:
+    """Coroutine stages are awaited on the event loop; plain functions (blocking hooks) run in a thread."""
+
+    name = "async"
+
+    async def run(self, fn: Callable, *args):
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+
+class TurnPipeline:
+    """
+    Runs the stages of a turn with an executor. The sync methods (run, stream)
+    are for the inline and pool executors, the *_async ones for AsyncExecutor.
+    """
+
+    def __init__(self, stages: TurnStages, executor=None):
+        self.stages = stages
+        self.executor = executor or InlineExecutor()
+        self.hooks: Dict[str, List[Callable[[TurnContext], None]]] = {point: [] for point in HOOK_POINTS}
+
+    def add_hook(self, point: str, hook: Callable[[TurnContext], None]):
+        """
+        Run hook(turn) at a point of every turn: before_stt, after_stt or after_turn (reply complete).
+        Hook errors are logged, not raised.
+        """
+        if point not in self.hooks:
+            raise ValueError(f"Unknown hook point '{point}', expected one of {', '.join(HOOK_POINTS)}")
+        self.hooks[point].append(hook)
+
+    def _transcribed(self, turn: TurnContext, transcript: str, provider: str):
+        turn.user_transcript, turn.stt_provider = transcript, provider
+        turn.timer.lap("stt", provider)
+        print(f"Transcript: '{transcript}'")
+        if turn.speculative_turn is not None:
+            # Usually already generated while the candidate was finishing the answer
+            turn.speculation = turn.speculative_turn.finish(transcript)
+            print(f"Speculative response {'kept' if turn.speculation else 'not used'} for: {transcript}")
+            if turn.speculation is not None:
+                turn.llm_provider = "speculative"
+
+    def _synthesized(self, turn: TurnContext):
+        turn.timer.lap("tts", turn.speech.provider if turn.speech is not None else turn.tts_provider)
+
+    def _stream_options(self, turn: TurnContext, on_complete) -> dict:
+        return {
+            "on_complete": on_complete,
+            "timer": turn.timer,
+            "tts_provider": turn.tts_provider,
+            "llm_provider": turn.llm_provider,
+        }
+
+    def _speaker(self, turn: TurnContext, tts_allowed: Optional[str]):
+        return partial(self.stages.synthesize, tts_provider=turn.tts_provider, tts_language=turn.tts_language,
+                       tts_allowed=tts_allowed, audio_format=turn.audio_format)
+
+    @staticmethod
+    def _hook_failed(point: str, hook, error: Exception):
+        name = getattr(getattr(hook, "func", hook), "__name__", repr(hook))
+        print(f"{point} hook {name} failed: {error}")
+
+    def _run_hooks(self, point: str, turn: TurnContext):
+        """Run the hooks of a point; a failing hook is logged and doesn't stop the others or fail the turn."""
+        for hook in self.hooks[point]:
+            try:
+                self.executor.run(hook, turn)
+            except Exception as e:
+                self._hook_failed(point, hook, e)
+
+    def transcribe(self, turn: TurnContext) -> str:
+        """STT for the turn's audio (empty when it has no speech)."""
+        self._run_hooks("before_stt", turn)
+        transcript, provider = self.executor.run(
+            self.stages.transcribe, turn.audio_data, turn.content_type, turn.tts_provider, turn.tts_language)
+        self._transcribed(turn, transcript, provider)
+        self._run_hooks("after_stt", turn)
+        return transcript
+
+    def respond(self, turn: TurnContext):
+        """LLM and TTS for a transcribed turn; if every TTS provider fails the reply is text-only."""
+        if turn.speculation is not None:
+            turn.ai_response_text = "".join(turn.speculation.deltas())
+        else:
+            turn.ai_response_text = self.executor.run(
+                self.stages.generate, turn.user_transcript, turn.chat_history, turn.interview_type)
+        turn.timer.lap("llm", turn.llm_provider)
+        try:
+            turn.speech = self.executor.run(self._speaker(turn, turn.tts_allowed), turn.ai_response_text)
+        except Exception as e:
+            print(f"TTS failed: {e}")
+            turn.tts_error = str(e)
+        self._synthesized(turn)
+        self._run_hooks("after_turn", turn)
+
+    def run(self, turn: TurnContext) -> TurnContext:
+        """A whole non-streaming turn (no reply when the transcript is empty)."""
+        if self.transcribe(turn).strip():
+            self.respond(turn)
+        return turn
+
+    def stream(self, turn: TurnContext) -> Iterator[str]:
+        """Transcribe, then return the reply's SSE events (see streaming.stream_turn)."""
+        self.transcribe(turn)
+        if turn.speculation is not None:
+            token_stream = turn.speculation.deltas
+        else:
+            token_stream = partial(self.stages.generate_stream, turn.user_transcript, turn.chat_history, turn.interview_type)
+
+        def completed(ai_response_text: str):
+            turn.ai_response_text = ai_response_text
+            self._run_hooks("after_turn", turn)
+
+        return stream_turn(turn.user_transcript, token_stream, self._speaker(turn, turn.tts_allowed),
+                           **self._stream_options(turn, completed))
+
+    async def _run_hooks_async(self, point: str, turn: TurnContext):
+        for hook in self.hooks[point]:
+            try:
+                await self.executor.run(hook, turn)
+            except Exception as e:
+                self._hook_failed(point, hook, e)
+
+    async def transcribe_async(self, turn: TurnContext) -> str:
+        await self._run_hooks_async("before_stt", turn)
+        transcript, provider = await self.executor.run(
+            self.stages.transcribe, turn.audio_data, turn.content_type, turn.tts_provider, turn.tts_language)
+        self._transcribed(turn, transcript, provider)
+        await self._run_hooks_async("after_stt", turn)
+        return transcript
+
+    async def respond_async(self, turn: TurnContext):
+        if turn.speculation is not None:
+            turn.ai_response_text = "".join([delta async for delta in turn.speculation.deltas()])
+        else:
+            turn.ai_response_text = await self.executor.run(
+                self.stages.generate, turn.user_transcript, turn.chat_history, turn.interview_type)
+        turn.timer.lap("llm", turn.llm_provider)
+        try:
+            turn.speech = await self.executor.run(self._speaker(turn, turn.tts_allowed), turn.ai_response_text)
+        except Exception as e:
+            print(f"TTS failed: {e}")
+            turn.tts_error = str(e)
+        self._synthesized(turn)
+        await self._run_hooks_async("after_turn", turn)
+
+    async def interrupted_async(self, turn: TurnContext, partial_text: str):
+        """The after_turn hooks of a reply cut short (barge-in), with the text streamed before it stopped."""
+        turn.ai_response_text = partial_text
+        await self._run_hooks_async("after_turn", turn)
+
+    async def run_async(self, turn: TurnContext) -> TurnContext:
+        if (await self.transcribe_async(turn)).strip():
+            await self.respond_async(turn)
+        return turn
+
+    async def stream_async(self, turn: TurnContext, event_format: Callable[[str, dict], Any] = sse_turn_event):
+        """Transcribe, then return the reply's events, SSE by default (see streaming.stream_turn_async)."""
+        await self.transcribe_async(turn)
+        if turn.speculation is not None:
+            token_stream = turn.speculation.deltas
+        else:
+            token_stream = partial(self.stages.generate_stream, turn.user_transcript, turn.chat_history, turn.interview_type)
+
+        async def completed(ai_response_text: str):
+            turn.ai_response_text = ai_response_text
+            await self._run_hooks_async("after_turn", turn)
+
+        return stream_turn_async(turn.user_transcript, token_stream, self._speaker(turn, turn.tts_allowed),
+                                 event_format=event_format, **self._stream_options(turn, completed))
+
+    def filler(self, turn: TurnContext):
+        """
+        A ready (phrase, TTSResult) filler in the turn's voice and format, or None.
+
+        The phrase bank of a voice is synthesized in the background on its first
+        use (see fillers), so the turn itself never waits for it.
+        """
+        return filler_bank.pick(turn.interview_type, turn.voice(), self._speaker(turn, None))
+
+    def warm_fillers(self):
+        """Synthesize the filler phrases of the web client's default voice and format in the background."""
+        turn = TurnContext(TurnTimer(), tts_provider="edge", tts_language=EDGE_VOICE,
+                           audio_format=negotiate_audio_format(FILLER_WARM_FORMAT, None))
+        for interview_type in FILLER_PHRASES:
+            filler_bank.warm(interview_type, turn.voice(), self._speaker(turn, None))
+
+    def speculative_turn(self, turn: TurnContext, content_type: str, turn_class=SpeculativeTurn) -> SpeculativeTurn:
+        """A streaming-input turn (see speculative) that interim-transcribes and speculates with these stages."""
+        return turn_class(
+            content_type,
+            partial(self.stages.transcribe_interim, tts_provider=turn.tts_provider, tts_language=turn.tts_language),
+            lambda transcript: self.stages.generate_stream(transcript, turn.chat_history, turn.interview_type),
+            params={"turn": turn},
+            reserve=partial(reserve_background_call, turn),
+        )
+
+
+def resume_speculative_turn(speculative: SpeculativeTurn, timer: TurnTimer) -> TurnContext:
+    """The TurnContext of a finished recording, its audio closed (STT and the speculation check are still to run)."""
+    turn = speculative.params["turn"]
+    turn.timer = timer
+    timer.interview_type = turn.interview_type
+    speculative.close_audio()
+    turn.audio_data, turn.content_type = speculative.audio(), speculative.content_type
+    turn.speculative_turn = speculative
+    timer.lap("audio_read")
+    return turn
+
+
+def spool_turn_audio(turn: TurnContext, audio_file):
+    """Spool a werkzeug file upload (Firebase and Flask servers) as the turn's audio."""
+    turn.content_type = audio_file.content_type or "audio/webm"
+    turn.audio_data = spool_upload(audio_file.stream, turn.content_type)
+    turn.timer.lap("audio_read")
+
+
+def open_session(params, backend: Optional[str] = None) -> dict:
+    """A new server-side session with a create_session request's options (the same defaults as a turn's)."""
+    return get_session_store(backend).create(
+        interview_type=params.get("interview_type", "technical"),
+        tts_provider=params.get("tts_provider", DEFAULT_TTS_PROVIDER),
+        tts_language=params.get("tts_language", DEFAULT_TTS_LANGUAGE),
+    )
+
+
+def save_turn(turn: TurnContext, backend: Optional[str] = None):
+    """after_turn hook: append the exchange to the turn's server-side session."""
+    if turn.session_id:
+        get_session_store(backend).append_turn(turn.session_id, turn.user_transcript, turn.ai_response_text)
+
+
+def persist_turn(turn: TurnContext, backend: Optional[str] = None):
+    """after_turn hook: queue the exchange for write-behind persistence to the candidate's interview."""
+    transcripts = get_transcript_queue(backend)
+    if transcripts is not None and turn.user_id and turn.interview_id:
+        transcripts.put(turn_messages(turn.user_id, turn.interview_id, len(turn.chat_history),
+                                      turn.user_transcript, turn.ai_response_text))
+
+
+def reserve_background_call(turn: TurnContext, kind: str) -> Optional[Ticket]:
+    """
+    A free admission slot for a streaming-input turn's interim STT ("interim")
+    or speculative reply ("speculation"), or None while that provider is at its cap.
+    """
+    stt_provider, llm_provider, _ = turn.providers()
+    return admission.reserve((stt_provider,) if kind == "interim" else (llm_provider,))
+
+
+def admit_turn(turn: TurnContext, forwarded_for: Optional[str], remote_addr: Optional[str]) -> Ticket:
+    """
+    Admit a turn on its STT provider, Groq and its TTS provider, waiting if
+    they are at capacity (see admission). Raises AdmissionRejected (429 / 503).
+    """
+    return admission.admit(client_key(turn.session_id, forwarded_for, remote_addr), turn.providers(), turn.timer)
+
+
+def turn_response(turn: TurnContext, response_mode: Optional[str], accept: Optional[str],
+                  audio_url_base: Optional[str]) -> Tuple[bytes, str, Dict[str, str]]:
+    """
+    (body, content type, headers) of a finished non-streaming turn: JSON+base64, binary, multipart or URL.
+
+    audio_url_base is None on servers without a get_audio route sharing the
+    process's blob store (Firebase); "url" mode then falls back to JSON+base64.
+    """
+    metadata = {"user_transcript": turn.user_transcript, "ai_response_text": turn.ai_response_text}
+    if turn.tts_error:
+        metadata["tts_error"] = turn.tts_error
+    if turn.speech is not None:
+        audio_bytes, audio_mime = turn.speech.audio, turn.speech.mime_type
+    else:
+        audio_bytes, audio_mime = b"", audio_mime_type(turn.tts_provider)
+    mode = negotiate_response_mode(response_mode, accept)
+    if mode == "url" and audio_url_base is None:
+        mode = "json"
+    body, content_type, headers = build_turn_response(
+        mode,
+        metadata,
+        audio_bytes,
+        audio_mime,
+        audio_url_base=audio_url_base,
+    )
+    turn.timer.lap("encode")
+    return body, content_type, {**headers, **turn.timer.headers()}
+
+
+def warmup_steps() -> dict:
+    """
+    What the first turn of a fresh instance would otherwise pay for: provider
+    SDK imports, provider connections, prompt building and the Edge-TTS worker.
+    """
+    steps = {
+        "groq": lambda: get_groq_client().models.list(),
+        "prompts": lambda: [build_messages("Hello", [], interview_type) for interview_type in SYSTEM_PROMPTS],
+        "tts": lambda: synthesize_turn_speech(WARMUP_TTS_TEXT, "edge", EDGE_VOICE),
+    }
+    if DEEPGRAM_API_KEY:
+        steps["deepgram"] = lambda: provider_clients.warm("stt", DEEPGRAM_BASE_URL)
+    if SARVAM_API_KEY:
+        steps["sarvam"] = lambda: provider_clients.warm("stt", SARVAM_BASE_URL)
+    return steps
+
+
+def pipeline_executor():
+    """The executor of the sync servers' pipeline (PIPELINE_EXECUTOR)."""
+    if PIPELINE_EXECUTOR == "pool":
+        return PoolExecutor()
+    if PIPELINE_EXECUTOR != "inline":
+        print(f"Unknown PIPELINE_EXECUTOR '{PIPELINE_EXECUTOR}', running stages inline")
+    return InlineExecutor()
+
+
+def sync_pipeline(session_backend: Optional[str] = None, transcript_backend: Optional[str] = None) -> TurnPipeline:
+    """
+    A pipeline of the sync servers, saving sessions to session_backend and
+    transcripts to transcript_backend (SESSION_STORE / TRANSCRIPT_STORE by default).
+    """
+    pipeline = TurnPipeline(SYNC_STAGES, pipeline_executor())
+    pipeline.add_hook("after_turn", partial(save_turn, backend=session_backend))
+    pipeline.add_hook("after_turn", partial(persist_turn, backend=transcript_backend))
+    return pipeline
+
+
+# Process-wide pipeline of the Flask server (main.py builds its own with Firebase's backends)
+turn_pipeline = sync_pipeline()
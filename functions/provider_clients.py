@@ -0,0 +1,121 @@
+"""
+Shared HTTP client layer for provider APIs (Deepgram, Sarvam).
+
+Every provider host gets one long-lived requests.Session with its own
+keep-alive connection pool, shared by all requests and worker threads in the
+process. This avoids a fresh DNS lookup + TLS handshake on every turn.
+requests itself is imported with the first session, off the cold-start path.
+
+Tuning (environment variables):
+- PROVIDER_POOL_CONNECTIONS: number of pools cached per session (default 4)
+- PROVIDER_POOL_MAXSIZE: max keep-alive connections per host (default 16)
+- PROVIDER_POOL_BLOCK: block instead of opening extra connections when full
+- {STAGE}_CONNECT_TIMEOUT / {STAGE}_READ_TIMEOUT: per-stage timeouts in seconds
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+POOL_CONNECTIONS = int(os.environ.get("PROVIDER_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("PROVIDER_POOL_MAXSIZE", "16"))
+POOL_BLOCK = os.environ.get("PROVIDER_POOL_BLOCK", "false").lower() == "true"
+
+# Default (connect, read) timeouts per pipeline stage
+DEFAULT_TIMEOUTS = {
+    "stt": (5.0, 30.0),
+    "tts": (5.0, 30.0),
+    "llm": (5.0, 30.0),
+}
+
+_sessions: Dict[str, "requests.Session"] = {}
+_sessions_lock = threading.Lock()
+
+
+def stage_timeout(stage: str) -> Tuple[float, float]:
+    """Return the (connect, read) timeout for a pipeline stage."""
+    connect, read = DEFAULT_TIMEOUTS.get(stage, (5.0, 30.0))
+    prefix = stage.upper()
+    return (
+        float(os.environ.get(f"{prefix}_CONNECT_TIMEOUT", connect)),
+        float(os.environ.get(f"{prefix}_READ_TIMEOUT", read)),
+    )
+
+
+def get_session(host: str) -> "requests.Session":
+    """Return the shared session for a host, creating it on first use."""
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                pool_block=POOL_BLOCK,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+    return session
+
+
+class ProviderError(Exception):
+    """A provider answered with an error status; status_code tells rate limits (429) and outages (5xx) from bad requests."""
+
+    def __init__(self, provider: str, status_code: int, body: str):
+        self.provider = provider
+        self.status_code = status_code
+        super().__init__(f"{provider} error: {status_code} - {body}")
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code == 429 or self.status_code >= 500
+
+
+def post(stage: str, url: str, **kwargs) -> "requests.Response":
+    """POST through the pooled session for the URL's host, with the stage's timeout."""
+    kwargs.setdefault("timeout", stage_timeout(stage))
+    return get_session(urlsplit(url).netloc).post(url, **kwargs)
+
+
+def warm(stage: str, url: str):
+    """Open a keep-alive connection to the URL's host (warm-up); the response status is irrelevant."""
+    get_session(urlsplit(url).netloc).head(url, timeout=stage_timeout(stage))
+
+
+def pool_stats() -> dict:
+    """
+    Connection reuse counters per host.
+
+    A "miss" is a request that had to open a new connection; a "hit" reused a
+    keep-alive connection from the pool.
+    """
+    stats = {}
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+
+    for host, session in sessions:
+        requests_made = 0
+        connections = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+        stats[host] = {
+            "requests": requests_made,
+            "hits": max(requests_made - connections, 0),
+            "misses": connections,
+        }
+    return stats
@@ -0,0 +1,364 @@
+"""
+Batch post-interview scoring (calculateSessionScore in docs/FIREBASE_ARCHITECTURE.md).
+
+Scores finished interviews answer by answer: every candidate answer is
+evaluated against a rubric by Groq, and the evaluations are aggregated into
+one feedback document per session.
+
+- Evaluations of all sessions share one pool of SCORING_CONCURRENCY
+  in-flight requests, spaced to at most SCORING_RPM requests per minute
+- A 429 (or Groq reporting its request / token quota spent) pauses every
+  worker until the quota resets; failed calls are retried with backoff
+- Results are written in bulk as sessions finish: to a JSONL file, and with
+  --firestore as batched merges into users/{userId}/interviews/{interviewId}
+
+Input is a directory of JSONL transcripts, one session per file and one
+message per line: transcript_store message documents (role "ai" / "user",
+text, sequenceNumber) or session history entries (role, content). The
+message documents don't carry their ids, so an export of
+users/{userId}/interviews/{interviewId}/messages is laid out as
+{userId}/{interviewId}.jsonl; a flat directory of one user's interviews
+takes --user-id instead. A userId / interviewId field on the first line wins.
+
+Usage:
+    python session_scoring.py transcripts/                        # scores.jsonl
+    python session_scoring.py transcripts/ --out backfill.jsonl -c 16 --rpm 120
+    python session_scoring.py transcripts/ --firestore            # also update the interview documents
+    python session_scoring.py alice/ --user-id alice --firestore  # one user's {interviewId}.jsonl files
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import groq
+from groq import AsyncGroq
+
+from transcript_store import WriteBehindQueue, FirestoreMessageStore
+
+SCORING_MODEL = os.environ.get("SCORING_MODEL", "llama-3.3-70b-versatile")
+SCORING_CONCURRENCY = int(os.environ.get("SCORING_CONCURRENCY", "8"))
+SCORING_RPM = float(os.environ.get("SCORING_RPM", "30"))
+SCORING_RETRIES = int(os.environ.get("SCORING_RETRIES", "4"))
+SCORING_MAX_TOKENS = int(os.environ.get("SCORING_MAX_TOKENS", "600"))
+# Pause when fewer tokens than this are left in Groq's rate-limit window (about one evaluation)
+SCORING_MIN_TOKENS_REMAINING = int(os.environ.get("SCORING_MIN_TOKENS_REMAINING", "1500"))
+
+RUBRIC_DIMENSIONS = ("technicalAccuracy", "communicationClarity", "confidence", "starCompliance")
+
+RUBRIC_PROMPT = """You are an expert interview coach scoring one answer from a mock interview.
+
+Score the candidate's answer to the interviewer's question from 0 to 100 on each of:
+- technicalAccuracy: correctness and depth of the content
+- communicationClarity: structure and clarity of the explanation
+- confidence: decisiveness and ownership, without hedging
+- starCompliance: use of Situation, Task, Action, Result where the question calls for an example
+
+Reply with a JSON object only:
+{"technicalAccuracy": 0-100, "communicationClarity": 0-100, "confidence": 0-100, "starCompliance": 0-100,
+ "score": 0-100, "answerSummary": "one sentence", "feedback": "one or two sentences",
+ "improvedAnswer": "a stronger answer in two or three sentences, or null"}"""
+
+RETRYABLE_ERRORS = (groq.RateLimitError, groq.APIConnectionError, groq.APITimeoutError, groq.InternalServerError)
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds of a Groq rate-limit reset header ("7.66s", "2m59.56s", "120ms")."""
+    if not value:
+        return None
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    unit_seconds = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(amount) * unit_seconds[unit] for amount, unit in parts)
+
+
+class RateGate:
+    """
+    Request pacing shared by every evaluation: slots SCORING_RPM apart, and a
+    common pause after a 429 or when the response headers show the quota spent.
+    """
+
+    def __init__(self, rpm: float = SCORING_RPM, min_tokens_remaining: int = SCORING_MIN_TOKENS_REMAINING):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self.min_tokens_remaining = min_tokens_remaining
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self.pauses = 0
+        self.waited = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._paused_until)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            self.waited += slot - now
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self.pauses += 1
+
+    def observe(self, headers):
+        """Pause until the reset when Groq reports the request or token quota (nearly) spent."""
+        for kind, floor in (("requests", 1), ("tokens", self.min_tokens_remaining)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+            try:
+                spent = remaining is not None and float(remaining) < floor
+            except ValueError:
+                spent = False
+            if spent and reset:
+                self.pause(reset)
+
+
+def backoff(attempt: int) -> float:
+    return min(0.5 * 2 ** attempt, 20.0) * random.uniform(0.8, 1.2)
+
+
+def parse_rubric(content: str) -> dict:
+    """A rubric evaluation from the model's JSON reply; ValueError if it is unusable."""
+    reply = json.loads(content)
+    if not isinstance(reply, dict) or any(dim not in reply for dim in RUBRIC_DIMENSIONS):
+        raise ValueError(f"Rubric reply is missing scores: {content[:200]}")
+    evaluation = {dim: max(0, min(100, round(float(reply[dim])))) for dim in RUBRIC_DIMENSIONS}
+    score = reply.get("score")
+    evaluation["score"] = (max(0, min(100, round(float(score)))) if score is not None
+                           else round(statistics.mean(evaluation.values())))
+    evaluation["answerSummary"] = str(reply.get("answerSummary") or "")
+    evaluation["feedback"] = str(reply.get("feedback") or "")
+    evaluation["improvedAnswer"] = reply.get("improvedAnswer") or None
+    return evaluation
+
+
+async def evaluate_answer(client: AsyncGroq, gate: RateGate, question: str, answer: str, interview_type: str,
+                          stats: dict, model: str = SCORING_MODEL) -> dict:
+    """Rubric evaluation of one answer, retried on rate limits, provider errors and malformed replies."""
+    messages = [
+        {"role": "system", "content": RUBRIC_PROMPT},
+        {"role": "user", "content": f"Interview type: {interview_type}\n\nQuestion:\n{question or '(opening)'}"
+                                    f"\n\nAnswer:\n{answer}"},
+    ]
+    for attempt in range(SCORING_RETRIES + 1):
+        await gate.wait()
+        try:
+            response = await client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+                max_tokens=SCORING_MAX_TOKENS,
+                response_format={"type": "json_object"},
+            )
+            gate.observe(response.headers)
+            completion = await response.parse()
+            return parse_rubric(completion.choices[0].message.content)
+        except groq.RateLimitError as e:
+            delay = parse_reset(e.response.headers.get("retry-after")) or backoff(attempt)
+            gate.pause(delay)
+            stats["rate_limited"] += 1
+            error = e
+        except RETRYABLE_ERRORS + (ValueError,) as e:
+            delay = backoff(attempt)
+            error = e
+        if attempt == SCORING_RETRIES:
+            raise error
+        stats["retries"] += 1
+        await asyncio.sleep(delay)
+
+
+def read_transcript(path: Path, root: Path, user_id: Optional[str] = None) -> dict:
+    """
+    A session of a JSONL transcript file (messages in sequence order). The
+    userId is the file's directory under root ({userId}/{interviewId}.jsonl),
+    else user_id; the interviewId is the file name.
+    """
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                messages.append(json.loads(line))
+    if all("sequenceNumber" in m for m in messages):
+        messages.sort(key=lambda m: m["sequenceNumber"])
+    first = messages[0] if messages else {}
+    directory = path.parent.relative_to(root)
+    return {
+        "session": str(path.relative_to(root).with_suffix("")),
+        "userId": first.get("userId") or (directory.name if directory.parts else user_id),
+        "interviewId": first.get("interviewId") or path.stem,
+        "interviewType": first.get("interviewType"),
+        "messages": [{
+            "id": m.get("id"),
+            "role": "ai" if m.get("role") == "assistant" else m.get("role"),
+            "text": m.get("text", m.get("content", "")),
+        } for m in messages],
+    }
+
+
+def answer_pairs(messages: list) -> list:
+    """(answer message id, question, answer) of every candidate answer; the question is the last AI message."""
+    pairs, question = [], ""
+    for message in messages:
+        if message["role"] == "ai":
+            question = message["text"]
+        elif message["role"] == "user" and message["text"].strip():
+            pairs.append((message["id"], question, message["text"]))
+    return pairs
+
+
+def session_feedback(session: dict, pairs: list, evaluations: list, model: str) -> dict:
+    """Feedback document of a session from its per-answer evaluations (failed ones are left out of the scores)."""
+    scored = [(pair, evaluation) for pair, evaluation in zip(pairs, evaluations) if evaluation is not None]
+    scores = {}
+    if scored:
+        scores = {dim: round(statistics.mean(e[dim] for _, e in scored)) for dim in RUBRIC_DIMENSIONS}
+        scores["overall"] = round(statistics.mean(e["score"] for _, e in scored))
+    messages = session["messages"]
+    return {
+        "interviewId": session["interviewId"],
+        "scores": scores,
+        "questionFeedback": [{
+            "messageId": message_id,
+            "questionText": question,
+            "answerSummary": e["answerSummary"],
+            "score": e["score"],
+            "feedback": e["feedback"],
+            "improvedAnswer": e["improvedAnswer"],
+        } for (message_id, question, _), e in scored],
+        "answersScored": len(scored),
+        "answersFailed": len(pairs) - len(scored),
+        "generatedAt": datetime.now(timezone.utc),
+        "modelVersion": model,
+        "metrics": {
+            "totalQuestions": sum(1 for m in messages if m["role"] == "ai"),
+            "totalUserWords": sum(len(m["text"].split()) for m in messages if m["role"] == "user"),
+        },
+    }
+
+
+def feedback_writes(session: dict, feedback: dict) -> list:
+    """The Firestore merge of a session's feedback into its interview document."""
+    path = f"users/{session['userId']}/interviews/{session['interviewId']}"
+    document = {key: value for key, value in feedback.items() if key != "metrics"}
+    return [(path, {"feedback": document, "metrics": feedback["metrics"]})]
+
+
+async def score_sessions(sessions: list, out_file, firestore: Optional[WriteBehindQueue] = None,
+                         concurrency: int = SCORING_CONCURRENCY, rpm: float = SCORING_RPM,
+                         interview_type: str = "technical", model: str = SCORING_MODEL) -> dict:
+    """Score every session, writing each one's feedback as soon as its answers are evaluated; returns stats."""
+    client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+    gate = RateGate(rpm)
+    stats = {"sessions": 0, "answers": 0, "failed": 0, "retries": 0, "rate_limited": 0,
+             "skipped_firestore": 0, "latencies": []}
+
+    async def evaluate(question: str, answer: str, session_type: str) -> Optional[dict]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                evaluation = await evaluate_answer(client, gate, question, answer, session_type, stats, model)
+            except RETRYABLE_ERRORS + (ValueError,) as e:
+                print(f"Scoring failed after {SCORING_RETRIES} retries: {e}")
+                stats["failed"] += 1
+                return None
+            except Exception as e:
+                print(f"Scoring failed (not retried): {e}")
+                stats["failed"] += 1
+                return None
+            stats["latencies"].append(time.perf_counter() - started)
+            stats["answers"] += 1
+            return evaluation
+
+    async def score(session: dict):
+        pairs = answer_pairs(session["messages"])
+        session_type = session["interviewType"] or interview_type
+        evaluations = await asyncio.gather(*(evaluate(question, answer, session_type)
+                                             for _, question, answer in pairs))
+        feedback = session_feedback(session, pairs, evaluations, model)
+        out_file.write(json.dumps({"session": session["session"], "userId": session["userId"], **feedback},
+                                  default=lambda value: value.isoformat()) + "\n")
+        if firestore is not None:
+            if session["userId"]:
+                firestore.put(feedback_writes(session, feedback))
+            else:
+                stats["skipped_firestore"] += 1
+        stats["sessions"] += 1
+
+    try:
+        await asyncio.gather(*(score(session) for session in sessions))
+    finally:
+        await client.close()
+    stats["rate_limit_pauses"] = gate.pauses
+    stats["paced_seconds"] = round(gate.waited, 1)
+    return stats
+
+
+def report(stats: dict, wall: float):
+    latencies = sorted(stats.pop("latencies"))
+    minutes = wall / 60
+    print(f"\nsessions   {stats['sessions']} in {wall:.1f}s = {stats['sessions'] / minutes:.1f} sessions/min")
+    print(f"answers    {stats['answers']} scored, {stats['failed']} failed = {stats['answers'] / wall:.2f} answers/s")
+    if latencies:
+        print(f"evaluation (with pacing) p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f}ms")
+    print(f"retries    {stats['retries']} ({stats['rate_limited']} rate limited), "
+          f"{stats['rate_limit_pauses']} pauses, {stats['paced_seconds']}s summed wait for a request slot")
+    if stats["skipped_firestore"]:
+        print(f"firestore  {stats['skipped_firestore']} sessions without a userId were not written "
+              f"(use {{userId}}/{{interviewId}}.jsonl or --user-id)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score finished interviews from JSONL transcripts.")
+    parser.add_argument("transcripts", help="directory of {userId}/{interviewId}.jsonl (or *.jsonl) transcripts")
+    parser.add_argument("--user-id", help="userId of transcripts directly in the directory")
+    parser.add_argument("--out", default="scores.jsonl", help="JSONL file for the feedback documents")
+    parser.add_argument("--firestore", action="store_true", help="also merge feedback into the interview documents")
+    parser.add_argument("-c", "--concurrency", type=int, default=SCORING_CONCURRENCY, help="in-flight evaluations")
+    parser.add_argument("--rpm", type=float, default=SCORING_RPM, help="Groq requests per minute (0 = unpaced)")
+    parser.add_argument("--interview-type", default="technical", help="for transcripts that don't carry one")
+    parser.add_argument("--model", default=SCORING_MODEL)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.environ.get("GROQ_API_KEY"):
+        sys.exit("GROQ_API_KEY is not set")
+
+    root = Path(args.transcripts)
+    sessions = [read_transcript(path, root, args.user_id) for path in sorted(root.glob("*.jsonl"))]
+    sessions += [read_transcript(path, root) for path in sorted(root.glob("*/*.jsonl"))]
+    print(f"Scoring {sum(len(answer_pairs(s['messages'])) for s in sessions)} answers "
+          f"of {len(sessions)} sessions ({args.concurrency} concurrent, {args.rpm:g} rpm)")
+
+    firestore = None
+    if args.firestore:
+        # One interview document per write; nothing waits on the queue, it is flushed at the end
+        firestore = WriteBehindQueue(FirestoreMessageStore(merge=True), max_queued=len(sessions) + 1)
+
+    started = time.perf_counter()
+    with open(args.out, "w", encoding="utf-8") as out_file:
+        stats = asyncio.run(score_sessions(sessions, out_file, firestore, args.concurrency, args.rpm,
+                                           args.interview_type, args.model))
+    if firestore is not None:
+        firestore.close(timeout=120)
+        print(f"firestore  {firestore.stats()}")
+    report(stats, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
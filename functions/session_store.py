@@ -0,0 +1,219 @@
+"""
+Server-side interview session store.
+
+Clients create a session once and then send a session_id with each turn;
+the chat history lives here instead of being re-parsed on every request.
+Clients may keep sending their `history` as well: it is used when the
+session is unknown to this instance or has expired.
+
+Backends (SESSION_STORE environment variable, or passed by the server):
+- "memory" (default): in-process dict with TTL eviction
+- "firestore": `interview_sessions/{sessionId}` documents, shared across instances
+  (the default of the Firebase functions in main.py, whose instances share nothing).
+  Appended turns go through a transcript_store write-behind queue, so saving a
+  turn adds no Firestore round trip to it; the queue commits within
+  TRANSCRIPT_FLUSH_INTERVAL, and the Firebase functions flush it before they return
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+from typing import Dict, Optional
+
+from transcript_store import WriteBehindQueue, FirestoreMessageStore
+
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(2 * 60 * 60)))
+SESSION_COLLECTION = os.environ.get("SESSION_COLLECTION", "interview_sessions")
+
+
+def new_session(interview_type: str, tts_provider: str, tts_language: str) -> dict:
+    """Build a fresh session record."""
+    now = time.time()
+    return {
+        "session_id": uuid.uuid4().hex,
+        "interview_type": interview_type,
+        "tts_provider": tts_provider,
+        "tts_language": tts_language,
+        "history": [],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+class InMemorySessionStore:
+    """Process-local session store with sliding TTL expiry."""
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float):
+        expired = [sid for sid, s in self._sessions.items() if now - s["updated_at"] > self.ttl_seconds]
+        for sid in expired:
+            del self._sessions[sid]
+
+    def create(self, interview_type: str = "technical", tts_provider: str = "edge", tts_language: str = "") -> dict:
+        session = new_session(interview_type, tts_provider, tts_language)
+        with self._lock:
+            self._evict_expired(session["created_at"])
+            self._sessions[session["session_id"]] = session
+        return dict(session)
+
+    def get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session["updated_at"] > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            return {**session, "history": list(session["history"])}
+
+    def append_turn(self, session_id: str, user_text: str, ai_text: str):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session["history"].append({"role": "user", "content": user_text, "timestamp": now})
+            session["history"].append({"role": "assistant", "content": ai_text, "timestamp": now})
+            session["updated_at"] = now
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class FirestoreSessionStore:
+    """
+    Firestore-backed session store, shared by every instance.
+
+    Expiry is enforced on read; configure a Firestore TTL policy on `expires_at`
+    to have old documents deleted automatically.
+    """
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, collection: str = SESSION_COLLECTION):
+        import firebase_admin
+        from firebase_admin import firestore
+
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app()
+
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self._firestore = firestore
+        self._collection = firestore.client().collection(collection)
+        self.writes = WriteBehindQueue(FirestoreMessageStore(merge=True))
+        atexit.register(self.writes.close)
+
+    def _expires_at(self, now: float):
+        from datetime import datetime, timezone
+        return datetime.fromtimestamp(now + self.ttl_seconds, tz=timezone.utc)
+
+    def create(self, interview_type: str = "technical", tts_provider: str = "edge", tts_language: str = "") -> dict:
+        session = new_session(interview_type, tts_provider, tts_language)
+        self._collection.document(session["session_id"]).set({
+            **session,
+            "expires_at": self._expires_at(session["created_at"]),
+        })
+        return session
+
+    def get(self, session_id: str) -> Optional[dict]:
+        snapshot = self._collection.document(session_id).get()
+        if not snapshot.exists:
+            return None
+        session = snapshot.to_dict()
+        session.pop("expires_at", None)
+        # A merged append recreates a document the TTL policy deleted, without the earlier turns
+        if "created_at" not in session or time.time() - session.get("updated_at", 0) > self.ttl_seconds:
+            return None
+        return session
+
+    def append_turn(self, session_id: str, user_text: str, ai_text: str):
+        """Queue the exchange; the write-behind queue merges it into the session document."""
+        now = time.time()
+        self.writes.put([(f"{self.collection}/{session_id}", {
+            "history": self._firestore.ArrayUnion([
+                {"role": "user", "content": user_text, "timestamp": now},
+                {"role": "assistant", "content": ai_text, "timestamp": now},
+            ]),
+            "updated_at": now,
+            "expires_at": self._expires_at(now),
+        })])
+
+    def flush(self, timeout: float) -> bool:
+        return self.writes.flush(timeout)
+
+    def delete(self, session_id: str):
+        self._collection.document(session_id).delete()
+
+
+_stores: Dict[str, object] = {}
+_store_lock = threading.Lock()
+
+
+def get_session_store(backend: Optional[str] = None):
+    """Return the process-wide session store of a backend, SESSION_STORE by default."""
+    backend = backend or SESSION_STORE
+    with _store_lock:
+        if backend not in _stores:
+            _stores[backend] = FirestoreSessionStore() if backend == "firestore" else InMemorySessionStore()
+        return _stores[backend]
+
+
+def flush_sessions(timeout: float):
+    """Commit the queued session writes now (Firebase functions, before their instance is throttled)."""
+    with _store_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        if hasattr(store, "flush") and not store.flush(timeout):
+            print(f"Session writes not flushed within {timeout}s")
+
+
+def close_sessions():
+    """Commit the queued session writes and stop their writers (server shutdown)."""
+    with _store_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        if hasattr(store, "writes"):
+            store.writes.close()
+
+
+def parse_history(history) -> list:
+    """The client's `history` field: a JSON string (form field) or an already decoded list."""
+    if isinstance(history, list):
+        return history
+    try:
+        parsed = json.loads(history) if history else []
+    except json.JSONDecodeError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def load_chat_history(session_id: Optional[str], history=None, backend: Optional[str] = None) -> Optional[list]:
+    """
+    Chat history for a turn.
+
+    Uses the session store (of backend, SESSION_STORE by default) when a
+    session_id is given, otherwise the client's `history` field. Returns None
+    if the session is unknown or expired and the client sent no history to
+    fall back on.
+    """
+    if session_id:
+        session = get_session_store(backend).get(session_id)
+        if session is not None:
+            return session["history"]
+        if history is None:
+            return None
+        print(f"Session {session_id} not found, using the client's history")
+    return parse_history(history)
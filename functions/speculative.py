@@ -0,0 +1,472 @@
+"""
+Speculative LLM generation on interim transcripts (streaming-input turns).
+
+Instead of uploading the whole recording once the candidate stops talking, the
+client opens a turn (begin_turn), posts the recorder's chunks as they are
+produced (append_turn_audio) and closes it (finish_turn / finish_turn_stream).
+While audio arrives:
+- the audio received so far is transcribed every SPECULATIVE_INTERIM_INTERVAL
+  seconds (interim transcripts), at most SPECULATIVE_MAX_INTERIMS times per
+  turn: each interim re-sends the whole recording so far (a WebM fragment
+  can't be decoded without its head), so an unbounded loop would bill STT
+  quadratically in the answer's length
+- once two consecutive interim transcripts agree (the candidate has paused),
+  the response is generated speculatively from that transcript
+- a later stable interim that differs cancels and restarts the speculation
+- if nothing was stable by the end of the recording, the latest interim is
+  speculated on while the final transcription runs
+
+On finish the final transcript (VAD + hedged STT, as for a normal turn) is
+compared with the speculated one. If they are similar enough
+(SPECULATIVE_MIN_SIMILARITY, word-level), the speculative response - often
+already complete - is used; otherwise it is cancelled and the response is
+generated from the final transcript as usual.
+
+The turn's audio is appended to an upload_stream.AudioSpool (bounded memory,
+spilling to a temporary file); interims and the final transcription stream
+slices of it. The interim transcriber is a plain callable (audio so far,
+content type) -> transcript. The servers re-send the accumulated audio to the batch STT
+provider; bench_load.py's stub STT returns growing transcripts for such
+prefixes.
+
+Interims and speculations are background provider calls: each takes a slot
+from reserve("interim" / "speculation") first (admission.reserve in the
+servers) and is skipped while the provider is at its cap.
+
+Turns live in process memory, so chunk uploads need a single worker or sticky
+routing (like the "url" response mode).
+"""
+
+import os
+import re
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+
+from upload_stream import AudioSource, AudioSpool
+
+SPECULATIVE_ENABLED = os.environ.get("SPECULATIVE_ENABLED", "true").lower() == "true"
+# Seconds between interim transcriptions of a turn's audio
+SPECULATIVE_INTERIM_INTERVAL = float(os.environ.get("SPECULATIVE_INTERIM_INTERVAL", "1.0"))
+# Interim transcriptions per turn; later chunks are only transcribed by the final STT call
+SPECULATIVE_MAX_INTERIMS = int(os.environ.get("SPECULATIVE_MAX_INTERIMS", "8"))
+# Word-level similarity (0-1) a final transcript needs to keep the speculative response
+SPECULATIVE_MIN_SIMILARITY = float(os.environ.get("SPECULATIVE_MIN_SIMILARITY", "0.9"))
+SPECULATIVE_TURN_TTL_SECONDS = int(os.environ.get("SPECULATIVE_TURN_TTL_SECONDS", "120"))
+SPECULATIVE_MAX_AUDIO_BYTES = int(os.environ.get("SPECULATIVE_MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
+SPECULATIVE_WORKERS = int(os.environ.get("SPECULATIVE_WORKERS", "16"))
+
+_WORD_RE = re.compile(r"[\w']+")
+
+
+def normalize_words(transcript: str) -> List[str]:
+    """Lowercased words without punctuation (STT formatting varies between calls)."""
+    return _WORD_RE.findall((transcript or "").lower())
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity ratio between two transcripts (1.0 = same words)."""
+    words_a, words_b = normalize_words(a), normalize_words(b)
+    if not words_a and not words_b:
+        return 1.0
+    return SequenceMatcher(None, words_a, words_b).ratio()
+
+
+class SpeculationStats:
+    """Per-process counters reported on health_check."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.interims = 0
+        self.started = 0
+        self.restarted = 0
+        self.kept = 0
+        self.discarded = 0
+        self.missed = 0  # finished before any interim was stable
+        self.throttled = 0  # interims or speculations skipped at a provider cap
+        self.capped = 0  # turns that used up SPECULATIVE_MAX_INTERIMS
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": SPECULATIVE_ENABLED,
+                "turns": self.turns,
+                "interims": self.interims,
+                "started": self.started,
+                "restarted": self.restarted,
+                "kept": self.kept,
+                "discarded": self.discarded,
+                "missed": self.missed,
+                "throttled": self.throttled,
+                "capped": self.capped,
+            }
+
+
+speculation_stats = SpeculationStats()
+
+# Interim transcriptions and speculative generations of every turn in the process
+_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative")
+
+
+class Speculation:
+    """A response generated in the background; deltas() replays it and follows it live."""
+
+    def __init__(self, transcript: str, generate: Callable[[str], Iterator[str]], ticket=None):
+        self.transcript = transcript
+        self._ticket = ticket
+        self._deltas: List[str] = []
+        self._done = False
+        self._error: Optional[Exception] = None
+        self._cancelled = threading.Event()
+        self._cond = threading.Condition()
+        _executor.submit(self._run, generate)
+
+    def _run(self, generate):
+        stream = None
+        try:
+            stream = generate(self.transcript)
+            for delta in stream:
+                if self._cancelled.is_set():
+                    break
+                with self._cond:
+                    self._deltas.append(delta)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            if self._ticket is not None:
+                self._ticket.release()
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def deltas(self) -> Iterator[str]:
+        """Response deltas produced so far, then the rest as they arrive."""
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._deltas) and not self._done:
+                    self._cond.wait()
+                pending = self._deltas[i:]
+                done = self._done
+            for delta in pending:
+                yield delta
+            i += len(pending)
+            if done and i >= len(self._deltas):
+                break
+        if self._error is not None:
+            raise self._error
+
+
+class SpeculativeTurn:
+    """
+    A streaming-input turn: buffers uploaded audio, runs interim transcriptions
+    and keeps at most one speculative generation going.
+
+    transcribe_interim(audio, content_type) -> transcript
+    generate(transcript) -> iterator of response deltas
+    reserve("interim" / "speculation") -> ticket to release() when the call is done, or None to skip it
+    params holds whatever the server needs at finish (history, interview type, TTS options).
+    """
+
+    def __init__(self, content_type: str, transcribe_interim: Callable[[AudioSource, str], str],
+                 generate: Callable[[str], Iterator[str]], params: Optional[dict] = None,
+                 reserve: Optional[Callable[[str], object]] = None):
+        self.turn_id = uuid.uuid4().hex
+        self.content_type = content_type
+        self.params = params or {}
+        self.interim_transcript = ""
+        self.last_activity = time.time()
+        self._transcribe_interim = transcribe_interim
+        self._generate = generate
+        self._reserve = reserve
+        self._spool = AudioSpool(content_type, SPECULATIVE_MAX_AUDIO_BYTES)
+        self._lock = threading.Lock()
+        self._interim_running = False
+        self._interims_started = 0
+        self._last_interim_at = time.monotonic()
+        self._finished = False
+        self.speculation: Optional[Speculation] = None
+        speculation_stats.count("turns")
+
+    @property
+    def size(self) -> int:
+        return self._spool.size
+
+    def _take_slot(self, kind: str):
+        """(proceed, ticket): a background call may run only if reserve() gives it a slot."""
+        if self._reserve is None:
+            return True, None
+        ticket = self._reserve(kind)
+        if ticket is None:
+            speculation_stats.count("throttled")
+            return False, None
+        return True, ticket
+
+    def _interim_due(self) -> bool:
+        return (
+            SPECULATIVE_ENABLED
+            and not self._finished
+            and not self._interim_running
+            and self._interims_started < SPECULATIVE_MAX_INTERIMS
+            and time.monotonic() - self._last_interim_at >= SPECULATIVE_INTERIM_INTERVAL
+        )
+
+    def _interim_started(self):
+        self._interim_running = True
+        self._interims_started += 1
+        if self._interims_started == SPECULATIVE_MAX_INTERIMS:
+            speculation_stats.count("capped")
+
+    def audio(self) -> AudioSource:
+        """The audio received so far (a spool slice; later chunks are not part of it)."""
+        return self._spool.slice()
+
+    def feed(self, chunk: bytes):
+        """Append an audio chunk (UploadTooLarge past the limit); starts an interim transcription when one is due."""
+        with self._lock:
+            self._spool.write(chunk)
+            self.last_activity = time.time()
+            due = self._interim_due()
+            if due:
+                # A skipped interim is retried a full interval later
+                self._last_interim_at = time.monotonic()
+                due, ticket = self._take_slot("interim")
+            if due:
+                self._interim_started()
+                audio = self._spool.slice()
+        if due:
+            _executor.submit(self._run_interim, audio, ticket)
+
+    def _run_interim(self, audio: AudioSource, ticket=None):
+        try:
+            transcript = self._transcribe_interim(audio, self.content_type)
+        except Exception as e:
+            print(f"Interim STT failed: {e}")
+            transcript = None
+        finally:
+            if ticket is not None:
+                ticket.release()
+        with self._lock:
+            self._interim_running = False
+            if transcript is None or self._finished:
+                return
+            previous, self.interim_transcript = self.interim_transcript, transcript
+        speculation_stats.count("interims")
+        if normalize_words(transcript) and normalize_words(transcript) == normalize_words(previous):
+            self._speculate(transcript)
+
+    def _speculate(self, transcript: str):
+        with self._lock:
+            if self._finished:
+                return
+            current = self.speculation
+            if current is not None and transcript_similarity(current.transcript, transcript) >= SPECULATIVE_MIN_SIMILARITY:
+                return
+            proceed, ticket = self._take_slot("speculation")
+            if not proceed:
+                return
+            if current is not None:
+                current.cancel()
+                speculation_stats.count("restarted")
+            else:
+                speculation_stats.count("started")
+            print(f"Speculating on interim transcript: {transcript}")
+            self.speculation = Speculation(transcript, self._generate, ticket)
+
+    def close_audio(self):
+        """
+        The recording has ended: stop interim transcriptions and, if nothing is
+        being speculated yet, speculate on the latest interim transcript while
+        the final transcription runs.
+        """
+        with self._lock:
+            self._last_interim_at = float("inf")
+            latest = self.interim_transcript if self.speculation is None else ""
+        if normalize_words(latest):
+            self._speculate(latest)
+
+    def finish(self, final_transcript: str) -> Optional[Speculation]:
+        """Stop speculating; returns the speculation if it matches the final transcript."""
+        with self._lock:
+            self._finished = True
+            speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            speculation_stats.count("missed")
+            return None
+        if final_transcript.strip() and transcript_similarity(speculation.transcript, final_transcript) >= SPECULATIVE_MIN_SIMILARITY:
+            speculation_stats.count("kept")
+            return speculation
+        speculation.cancel()
+        speculation_stats.count("discarded")
+        return None
+
+    def cancel(self):
+        """Abandon the turn (expired or superseded) without counting it."""
+        with self._lock:
+            self._finished = True
+            speculation, self.speculation = self.speculation, None
+        if speculation is not None:
+            speculation.cancel()
+
+
+class AsyncSpeculation:
+    """Speculation for the async server: the generation runs as a task on the event loop."""
+
+    def __init__(self, transcript: str, generate: Callable[[str], AsyncIterator[str]], ticket=None):
+        self.transcript = transcript
+        self._deltas: List[str] = []
+        self._done = False
+        self._error: Optional[Exception] = None
+        self._changed = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run(generate))
+        if ticket is not None:
+            # Also released if the task is cancelled before it starts
+            self._task.add_done_callback(lambda _: ticket.release())
+
+    async def _run(self, generate):
+        try:
+            async for delta in generate(self.transcript):
+                self._deltas.append(delta)
+                self._changed.set()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._changed.set()
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def deltas(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self._deltas):
+                yield self._deltas[i]
+                i += 1
+            if self._done:
+                break
+            self._changed.clear()
+            await self._changed.wait()
+        if self._error is not None:
+            raise self._error
+
+
+class AsyncSpeculativeTurn(SpeculativeTurn):
+    """SpeculativeTurn for coroutine transcribers / async-generator LLM streams (single event loop)."""
+
+    def __init__(self, content_type: str, transcribe_interim: Callable[[AudioSource, str], Awaitable[str]],
+                 generate: Callable[[str], AsyncIterator[str]], params: Optional[dict] = None,
+                 reserve: Optional[Callable[[str], object]] = None):
+        super().__init__(content_type, transcribe_interim, generate, params, reserve)
+        self._interim_task: Optional[asyncio.Task] = None
+
+    def feed(self, chunk: bytes):
+        self._spool.write(chunk)
+        self.last_activity = time.time()
+        if self._interim_due():
+            self._last_interim_at = time.monotonic()
+            proceed, ticket = self._take_slot("interim")
+            if not proceed:
+                return
+            self._interim_started()
+            self._interim_task = asyncio.ensure_future(self._run_interim_async(self._spool.slice()))
+            if ticket is not None:
+                self._interim_task.add_done_callback(lambda _: ticket.release())
+
+    async def _run_interim_async(self, audio: AudioSource):
+        try:
+            transcript = await self._transcribe_interim(audio, self.content_type)
+        except Exception as e:
+            print(f"Interim STT failed: {e}")
+            transcript = None
+        self._interim_running = False
+        if transcript is None or self._finished:
+            return
+        previous, self.interim_transcript = self.interim_transcript, transcript
+        speculation_stats.count("interims")
+        if normalize_words(transcript) and normalize_words(transcript) == normalize_words(previous):
+            self._speculate(transcript)
+
+    def _speculate(self, transcript: str):
+        if self._finished:
+            return
+        current = self.speculation
+        if current is not None and transcript_similarity(current.transcript, transcript) >= SPECULATIVE_MIN_SIMILARITY:
+            return
+        proceed, ticket = self._take_slot("speculation")
+        if not proceed:
+            return
+        if current is not None:
+            current.cancel()
+            speculation_stats.count("restarted")
+        else:
+            speculation_stats.count("started")
+        print(f"Speculating on interim transcript: {transcript}")
+        self.speculation = AsyncSpeculation(transcript, self._generate, ticket)
+
+    def finish(self, final_transcript: str) -> Optional[AsyncSpeculation]:
+        if self._interim_task is not None:
+            self._interim_task.cancel()
+        return super().finish(final_transcript)
+
+    def cancel(self):
+        if self._interim_task is not None:
+            self._interim_task.cancel()
+        super().cancel()
+
+
+class SpeculativeTurnStore:
+    """Open streaming-input turns, expired after SPECULATIVE_TURN_TTL_SECONDS without a chunk."""
+
+    def __init__(self, ttl_seconds: int = SPECULATIVE_TURN_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._turns: "OrderedDict[str, SpeculativeTurn]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        expired = [t for t in self._turns.values() if now - t.last_activity > self.ttl_seconds]
+        for turn in expired:
+            del self._turns[turn.turn_id]
+            turn.cancel()
+
+    def put(self, turn: SpeculativeTurn) -> str:
+        with self._lock:
+            self._evict(time.time())
+            self._turns[turn.turn_id] = turn
+        return turn.turn_id
+
+    def get(self, turn_id: str) -> Optional[SpeculativeTurn]:
+        with self._lock:
+            self._evict(time.time())
+            return self._turns.get(turn_id)
+
+    def pop(self, turn_id: str) -> Optional[SpeculativeTurn]:
+        with self._lock:
+            self._evict(time.time())
+            return self._turns.pop(turn_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._turns)
+
+
+# Process-wide store of open turns
+speculative_turns = SpeculativeTurnStore()
@@ -0,0 +1,160 @@
+"""
+Cold-start profiling and warm-up.
+
+With min_instances=0 every scale-up pays the module imports before the first
+byte, and the first turn then pays for everything still cold: SDK imports
+deferred to first use, provider connections (DNS + TLS), the Edge-TTS worker
+loop. This module measures the former and front-loads the latter:
+
+- startup_profile: the entry point marks its import phases ("firebase_functions",
+  "pipeline modules", ...); the breakdown is printed once it is loaded and
+  reported under `startup` in health_check. Entry points imported by another
+  one (app_async imports app) neither profile nor warm up
+- warmup: runs an entry point's warm-up steps (import the provider SDKs, open
+  provider connections, build the prompts, synthesize a short TTS sample) once
+  per process, in the background at boot when WARMUP_ON_START is set, or on
+  the warmup route, which returns the step timings
+- `python startup.py [module]` prints the import time of a module
+  (default: main) grouped by top-level package, from `python -X importtime`
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "false").lower() == "true"
+# Text synthesized by the TTS warm-up step (also lands in tts_cache)
+WARMUP_TTS_TEXT = "Hello."
+
+
+class StartupProfile:
+    """Import phases of the process' entry point, timed from the import of this module."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.entry_point: Optional[str] = None
+        self.phases: List[Tuple[str, float]] = []
+        self.loaded_seconds: Optional[float] = None
+
+    def begin(self, entry_point: str) -> bool:
+        """Claim the profile for an entry point; False if another one was imported first."""
+        if self.entry_point is None:
+            self.entry_point = entry_point
+        return self.entry_point == entry_point
+
+    def mark(self, phase: str):
+        """Record the time since the previous mark as a phase."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def loaded(self):
+        """The entry point finished importing: record the total and print the breakdown."""
+        self.loaded_seconds = time.perf_counter() - self.started
+        breakdown = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        print(f"Loaded in {self.loaded_seconds * 1000:.0f}ms ({breakdown})")
+
+    def snapshot(self) -> dict:
+        return {
+            "entry_point": self.entry_point,
+            "import_ms": round(self.loaded_seconds * 1000, 1) if self.loaded_seconds is not None else None,
+            "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.phases},
+            "warmup": warmup.results,
+        }
+
+
+def _step_result(started: float, error: Optional[Exception] = None) -> dict:
+    result = {"ok": error is None, "ms": round((time.perf_counter() - started) * 1000, 1)}
+    if error is not None:
+        result["error"] = str(error)
+    return result
+
+
+class Warmup:
+    """Runs warm-up steps once per process; later calls return the first run's results."""
+
+    def __init__(self):
+        self.results: Optional[Dict[str, dict]] = None
+        self._lock = threading.Lock()
+        self._pending: Optional[asyncio.Future] = None
+
+    def _finish(self, results: Dict[str, dict]) -> Dict[str, dict]:
+        self.results = results
+        print("Warm-up: " + ", ".join(
+            f"{name} {result['ms']:.0f}ms{'' if result['ok'] else ' (failed)'}" for name, result in results.items()
+        ))
+        return results
+
+    def run(self, steps: Dict[str, Callable[[], object]]) -> Dict[str, dict]:
+        with self._lock:
+            if self.results is not None:
+                return self.results
+            results = {}
+            for name, step in steps.items():
+                started = time.perf_counter()
+                try:
+                    step()
+                    results[name] = _step_result(started)
+                except Exception as e:
+                    results[name] = _step_result(started, e)
+            return self._finish(results)
+
+    def start(self, steps: Dict[str, Callable[[], object]]):
+        """Run the steps on a background thread (boot-time warm-up)."""
+        threading.Thread(target=self.run, args=(steps,), name="warmup", daemon=True).start()
+
+    async def run_async(self, steps: Dict[str, Callable[[], Awaitable]]) -> Dict[str, dict]:
+        """run for the async server: the steps are coroutines awaited on its event loop."""
+        if self.results is not None:
+            return self.results
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._run_async(steps))
+        return await asyncio.shield(self._pending)
+
+    async def _run_async(self, steps: Dict[str, Callable[[], Awaitable]]) -> Dict[str, dict]:
+        results = {}
+        for name, step in steps.items():
+            started = time.perf_counter()
+            try:
+                await step()
+                results[name] = _step_result(started)
+            except Exception as e:
+                results[name] = _step_result(started, e)
+        return self._finish(results)
+
+
+startup_profile = StartupProfile()
+warmup = Warmup()
+
+
+def import_breakdown(module: str = "main", top: int = 15) -> List[Tuple[str, float]]:
+    """(top-level package, self seconds) for `import module`, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    totals: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # header
+        totals[fields[2].strip().split(".")[0]] += int(fields[0]) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "main"
+    packages = import_breakdown(target)
+    print(f"{'package':<28}{'self ms':>10}")
+    for package, seconds in packages:
+        print(f"{package:<28}{seconds * 1000:>10.1f}")
@@ -0,0 +1,347 @@
+"""
+Streaming helpers for the interview turn endpoint.
+
+The regular turn endpoint runs STT -> LLM -> TTS in sequence and only answers
+once the whole reply has been synthesized. The streaming variant instead:
+1. Streams LLM tokens as they arrive
+2. Cuts the token stream at sentence boundaries
+3. Synthesizes each finished sentence on a worker thread while generation continues
+4. Emits transcript, text deltas and audio chunks as Server-Sent Events
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, Optional
+
+from tts_router import TTSResult
+
+# Sentence terminator followed by whitespace (closing quotes/brackets allowed)
+SENTENCE_BOUNDARY = re.compile(r"[.!?…]+[\"')\]]*\s+")
+
+# Very short fragments ("Great." / "Okay.") are merged into the next sentence
+# so we don't pay a TTS round trip for half a second of audio.
+MIN_SENTENCE_CHARS = int(os.environ.get("STREAM_MIN_SENTENCE_CHARS", "20"))
+
+# Shared pool for per-sentence synthesis, reused across requests
+_tts_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("STREAM_TTS_WORKERS", "4")),
+    thread_name_prefix="stream-tts",
+)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx / Railway)
+}
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_turn_event(event: str, data: dict) -> str:
+    """sse_event for stream_turn_async events: raw `audio` bytes are sent as audio_base64."""
+    if "audio" in data:
+        encoded = {}
+        for key, value in data.items():
+            if key == "audio":
+                encoded["audio_base64"] = base64.b64encode(value).decode("utf-8")
+            else:
+                encoded[key] = value
+        data = encoded
+    return sse_event(event, data)
+
+
+class SentenceChunker:
+    """Accumulates text deltas and returns complete sentences."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a text delta and return any sentences completed by it."""
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is left once the token stream has ended."""
+        tail = self.buffer.strip()
+        self.buffer = ""
+        return tail or None
+
+
+def stream_after(first_event: str, rest: Callable[[], Iterable[str]]) -> Iterator[str]:
+    """
+    Send first_event (e.g. a filler) right away, then the events of rest().
+
+    rest() only starts once first_event has been handed to the server, so the
+    work it does (STT) overlaps with the client playing the filler; its
+    exceptions become an `error` event.
+    """
+    yield first_event
+    try:
+        yield from rest()
+    except Exception as e:
+        print(f"Error streaming interview turn: {str(e)}")
+        yield sse_event("error", {"error": str(e)})
+
+
+def stream_turn(
+    user_transcript: str,
+    token_stream: Callable[[], Iterable[str]],
+    synthesize: Callable[[str], TTSResult],
+    on_complete: Optional[Callable[[str], None]] = None,
+    timer=None,
+    tts_provider: str = "",
+    llm_provider: str = "groq",
+) -> Iterator[str]:
+    """
+    Run the LLM + TTS half of a turn, yielding SSE events.
+
+    Events: transcript, text (delta), audio (one per sentence, in order),
+    tts_error, error and finally done (with the full response text).
+    synthesize returns a tts_router.TTSResult; audio events carry its MIME type
+    since fallback can switch provider mid-reply.
+    on_complete is called with the full response text before `done` is sent.
+    If a metrics.TurnTimer is given, llm_ttft / llm / tts / tts_first_audio
+    spans are recorded on it (tts_provider labels failed syntheses, llm_provider
+    the LLM spans, e.g. "speculative" when replaying a speculative response).
+    """
+    yield sse_event("transcript", {"user_transcript": user_transcript})
+
+    if not user_transcript.strip():
+        yield sse_event("error", {"error": "Could not transcribe audio. Please speak more clearly."})
+        return
+
+    chunker = SentenceChunker()
+    pending = deque()  # (sentence, future) in playback order
+    text_parts = []
+    next_index = 0
+
+    started = time.perf_counter()
+    first_audio_sent = False
+
+    def timed_synthesize(sentence: str):
+        start = time.perf_counter()
+        provider = tts_provider
+        try:
+            result = synthesize(sentence)
+            provider = result.provider
+            return result
+        finally:
+            if timer is not None:
+                timer.record("tts", time.perf_counter() - start, provider)
+
+    def submit(sentence: str):
+        pending.append((sentence, _tts_executor.submit(timed_synthesize, sentence)))
+
+    def drain(block: bool) -> Iterator[str]:
+        nonlocal next_index, first_audio_sent
+        while pending and (block or pending[0][1].done()):
+            sentence, future = pending.popleft()
+            index = next_index
+            next_index += 1
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Streaming TTS failed for sentence {index}: {e}")
+                yield sse_event("tts_error", {"index": index, "text": sentence, "tts_error": str(e)})
+                continue
+            if timer is not None and not first_audio_sent:
+                timer.record("tts_first_audio", time.perf_counter() - started, result.provider)
+            first_audio_sent = True
+            yield sse_event("audio", {
+                "index": index,
+                "text": sentence,
+                "audio_base64": base64.b64encode(result.audio).decode("utf-8"),
+                "audio_mime": result.mime_type,
+            })
+
+    try:
+        for delta in token_stream():
+            if not delta:
+                continue
+            if timer is not None and not text_parts:
+                timer.record("llm_ttft", time.perf_counter() - started, llm_provider)
+            text_parts.append(delta)
+            yield sse_event("text", {"delta": delta})
+            for sentence in chunker.feed(delta):
+                submit(sentence)
+            # Push out any audio that finished while we were generating
+            yield from drain(block=False)
+
+        if timer is not None:
+            timer.record("llm", time.perf_counter() - started, llm_provider)
+
+        tail = chunker.flush()
+        if tail:
+            submit(tail)
+        yield from drain(block=True)
+    except Exception as e:
+        print(f"Error streaming interview turn: {str(e)}")
+        yield sse_event("error", {"error": str(e)})
+        return
+    finally:
+        # After an error or a client disconnect (GeneratorExit), sentences still
+        # queued on the shared pool are not synthesized
+        for _, future in pending:
+            future.cancel()
+
+    ai_response_text = "".join(text_parts)
+    if on_complete is not None:
+        # The reply has been delivered; a failed hook (e.g. saving the session) must not cut off `done`
+        try:
+            on_complete(ai_response_text)
+        except Exception as e:
+            print(f"Turn completion hook failed: {e}")
+
+    yield sse_event("done", {
+        "user_transcript": user_transcript,
+        "ai_response_text": ai_response_text,
+    })
+
+
+async def stream_after_async(first_event: str, rest: Callable[[], Awaitable[AsyncIterable[str]]]) -> AsyncIterator[str]:
+    """stream_after for the async server: rest is a coroutine returning the async event stream."""
+    yield first_event
+    try:
+        async for event in await rest():
+            yield event
+    except Exception as e:
+        print(f"Error streaming interview turn: {str(e)}")
+        yield sse_event("error", {"error": str(e)})
+
+
+async def stream_turn_async(
+    user_transcript: str,
+    token_stream: Callable[[], AsyncIterable[str]],
+    synthesize: Callable[[str], Awaitable[TTSResult]],
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None,
+    timer=None,
+    tts_provider: str = "",
+    llm_provider: str = "groq",
+    event_format: Callable[[str, dict], Any] = sse_turn_event,
+) -> AsyncIterator[Any]:
+    """
+    asyncio version of stream_turn for the async server: same events, but
+    sentences are synthesized as tasks on the running loop instead of threads.
+
+    event_format(event, data) builds what is yielded (SSE text by default);
+    `audio` events carry the raw audio bytes. Closing the stream early (e.g. a
+    barge-in) cancels the sentences still being synthesized.
+    """
+    yield event_format("transcript", {"user_transcript": user_transcript})
+
+    if not user_transcript.strip():
+        yield event_format("error", {"error": "Could not transcribe audio. Please speak more clearly."})
+        return
+
+    chunker = SentenceChunker()
+    pending = deque()  # (sentence, task) in playback order
+    text_parts = []
+    next_index = 0
+
+    started = time.perf_counter()
+    first_audio_sent = False
+
+    async def timed_synthesize(sentence: str):
+        start = time.perf_counter()
+        provider = tts_provider
+        try:
+            result = await synthesize(sentence)
+            provider = result.provider
+            return result
+        finally:
+            if timer is not None:
+                timer.record("tts", time.perf_counter() - start, provider)
+
+    def submit(sentence: str):
+        pending.append((sentence, asyncio.ensure_future(timed_synthesize(sentence))))
+
+    async def drain() -> List[str]:
+        """Events for the finished sentences at the head of the queue."""
+        nonlocal next_index, first_audio_sent
+        events = []
+        while pending and pending[0][1].done():
+            sentence, task = pending.popleft()
+            index = next_index
+            next_index += 1
+            try:
+                result = await task
+            except Exception as e:
+                print(f"Streaming TTS failed for sentence {index}: {e}")
+                events.append(event_format("tts_error", {"index": index, "text": sentence, "tts_error": str(e)}))
+                continue
+            if timer is not None and not first_audio_sent:
+                timer.record("tts_first_audio", time.perf_counter() - started, result.provider)
+            first_audio_sent = True
+            events.append(event_format("audio", {
+                "index": index,
+                "text": sentence,
+                "audio": result.audio,
+                "audio_mime": result.mime_type,
+            }))
+        return events
+
+    try:
+        async for delta in token_stream():
+            if not delta:
+                continue
+            if timer is not None and not text_parts:
+                timer.record("llm_ttft", time.perf_counter() - started, llm_provider)
+            text_parts.append(delta)
+            yield event_format("text", {"delta": delta})
+            for sentence in chunker.feed(delta):
+                submit(sentence)
+            for event in await drain():
+                yield event
+
+        if timer is not None:
+            timer.record("llm", time.perf_counter() - started, llm_provider)
+
+        tail = chunker.flush()
+        if tail:
+            submit(tail)
+        while pending:
+            # Wait for the head sentence only, so each chunk goes out as soon as it is ready
+            await asyncio.wait([pending[0][1]])
+            for event in await drain():
+                yield event
+    except (asyncio.CancelledError, GeneratorExit):
+        for _, task in pending:
+            task.cancel()
+        raise
+    except Exception as e:
+        print(f"Error streaming interview turn: {str(e)}")
+        for _, task in pending:
+            task.cancel()
+        yield event_format("error", {"error": str(e)})
+        return
+
+    ai_response_text = "".join(text_parts)
+    if on_complete is not None:
+        try:
+            await on_complete(ai_response_text)
+        except Exception as e:
+            print(f"Turn completion hook failed: {e}")
+
+    yield event_format("done", {
+        "user_transcript": user_transcript,
+        "ai_response_text": ai_response_text,
+    })
@@ -0,0 +1,335 @@
+"""
+Hedged, failover-aware routing of speech-to-text requests.
+
+Each turn is sent to the preferred provider first. If it hasn't answered
+within a delay derived from its recent p95 latency, the same audio is also
+sent to the next provider and the first good transcript wins. A provider
+that errors is failed over immediately.
+
+Every provider has a circuit breaker: after STT_BREAKER_FAILURES consecutive
+failures it is skipped for STT_BREAKER_COOLDOWN seconds, then a single trial
+request decides whether it closes again. Only rate limits, 5xx answers and
+transport errors (timeouts, connection failures) count as failures; a 4xx
+answer is the request's fault (e.g. empty or malformed audio) and shows the
+provider is up, so a few bad uploads can't open the circuit for everyone. A degraded provider therefore costs
+one failed request per cooldown instead of a full timeout on every turn.
+
+Sync servers run the calls on a small thread pool (the losing request is left
+to finish in the background); the async server uses tasks and cancels the loser.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from provider_clients import ProviderError
+
+STT_HEDGE_ENABLED = os.environ.get("STT_HEDGE_ENABLED", "true").lower() == "true"
+STT_HEDGE_MIN_DELAY = float(os.environ.get("STT_HEDGE_MIN_DELAY", "0.5"))
+STT_HEDGE_MAX_DELAY = float(os.environ.get("STT_HEDGE_MAX_DELAY", "5.0"))
+# Used until a provider has STT_HEDGE_MIN_SAMPLES successful calls
+STT_HEDGE_DEFAULT_DELAY = float(os.environ.get("STT_HEDGE_DEFAULT_DELAY", "2.0"))
+STT_HEDGE_MIN_SAMPLES = int(os.environ.get("STT_HEDGE_MIN_SAMPLES", "20"))
+STT_BREAKER_FAILURES = int(os.environ.get("STT_BREAKER_FAILURES", "5"))
+STT_BREAKER_COOLDOWN = float(os.environ.get("STT_BREAKER_COOLDOWN", "30"))
+LATENCY_WINDOW = 200
+
+# Language codes each provider's model accepts for an interview language
+DEEPGRAM_LANGUAGES = {"en": "en", "hi": "hi"}
+
+Call = Tuple[str, Callable[[], str]]
+AsyncCall = Tuple[str, Callable[[], Awaitable[str]]]
+
+
+def stt_plan(primary: str, tts_language: str, configured: Dict[str, bool]) -> List[Tuple[str, str]]:
+    """
+    Providers to try for a turn, in preference order: [(provider, language code)].
+
+    Deepgram nova-2 only covers English and Hindi here; Sarvam saarika:v2.5
+    covers English (en-IN) and the Indic languages.
+    """
+    base = (tts_language or "en").split("-")[0]
+    options = {
+        "deepgram": DEEPGRAM_LANGUAGES.get(base),
+        "sarvam": tts_language if tts_language and base != "en" else "en-IN",
+    }
+    order = [primary] + [p for p in ("deepgram", "sarvam") if p != primary]
+    return [(p, options[p]) for p in order if configured.get(p) and options.get(p)]
+
+
+def provider_fault(error: Exception) -> bool:
+    """Whether a failed STT call counts against the provider: anything but a client error (4xx other than 429)."""
+    return not isinstance(error, ProviderError) or error.retryable
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after the cooldown."""
+
+    def __init__(self, failure_threshold: int = STT_BREAKER_FAILURES, cooldown: float = STT_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the half-open trial slot)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"STT circuit breaker opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """A request that was cancelled before it answered; a cancelled trial reopens for another cooldown."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class STTRouter:
+    """Hedges and fails over STT calls, tracking latency and health per provider."""
+
+    def __init__(self, hedge_enabled: bool = STT_HEDGE_ENABLED, max_workers: int = 16):
+        self.hedge_enabled = hedge_enabled
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt-router")
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker()
+                self._latencies[provider] = deque(maxlen=LATENCY_WINDOW)
+            return self._breakers[provider]
+
+    def _p95(self, provider: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if len(samples) < STT_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for a provider before hedging: its p95, clamped."""
+        p95 = self._p95(provider)
+        if p95 is None:
+            return STT_HEDGE_DEFAULT_DELAY
+        return min(max(p95, STT_HEDGE_MIN_DELAY), STT_HEDGE_MAX_DELAY)
+
+    def _succeeded(self, provider: str, seconds: float):
+        self.breaker(provider).record_success()
+        with self._lock:
+            self._latencies[provider].append(seconds)
+
+    def _next_allowed(self, calls: list) -> Optional[tuple]:
+        """Pop and return the first call whose breaker lets it through."""
+        while calls:
+            call = calls.pop(0)
+            if self.breaker(call[0]).allow():
+                return call
+        return None
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _failed(self, provider: str, error: Exception):
+        if provider_fault(error):
+            self.breaker(provider).record_failure()
+        else:
+            # The provider answered; only the request was bad
+            self.breaker(provider).record_success()
+
+    def _run(self, provider: str, fn: Callable[[], str]) -> str:
+        start = time.perf_counter()
+        try:
+            transcript = fn()
+        except Exception as e:
+            self._failed(provider, e)
+            raise
+        self._succeeded(provider, time.perf_counter() - start)
+        return transcript
+
+    def transcribe(self, calls: List[Call]) -> Tuple[str, str]:
+        """
+        Run STT calls (in preference order) with hedging and failover.
+
+        Returns (transcript, provider that produced it). An empty transcript
+        only wins if no other request is still in flight.
+        """
+        if not calls:
+            raise ValueError("No STT provider configured")
+        remaining = list(calls)
+        first = self._next_allowed(remaining) or calls[0]  # all breakers open: try the preferred one anyway
+        primary = first[0]
+
+        pending = {}
+        errors = []
+        empty = None
+        hedged = False
+
+        def launch(call):
+            pending[self._executor.submit(self._run, *call)] = call[0]
+
+        launch(first)
+        hedge_at = time.monotonic() + self.hedge_delay(primary)
+
+        while pending:
+            can_hedge = self.hedge_enabled and not hedged and remaining
+            timeout = max(hedge_at - time.monotonic(), 0) if can_hedge else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                call = self._next_allowed(remaining)
+                hedged = True
+                if call is not None:
+                    print(f"STT: {primary} slow, hedging with {call[0]}")
+                    self._count("hedges")
+                    launch(call)
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    transcript = future.result()
+                except Exception as e:
+                    print(f"STT provider {provider} failed: {e}")
+                    errors.append(f"{provider}: {e}")
+                    call = self._next_allowed(remaining) if not pending else None
+                    if call is not None:
+                        self._count("failovers")
+                        launch(call)
+                    continue
+
+                if not transcript.strip() and pending:
+                    empty = (transcript, provider)
+                    continue
+                if provider != primary and hedged:
+                    self._count("hedge_wins")
+                return transcript, provider
+
+        if empty is not None:
+            return empty
+        raise Exception(f"All STT providers failed: {'; '.join(errors)}")
+
+    async def _run_async(self, provider: str, fn: Callable[[], Awaitable[str]]) -> str:
+        start = time.perf_counter()
+        try:
+            transcript = await fn()
+        except asyncio.CancelledError:
+            self.breaker(provider).record_cancelled()
+            raise
+        except Exception as e:
+            self._failed(provider, e)
+            raise
+        self._succeeded(provider, time.perf_counter() - start)
+        return transcript
+
+    async def transcribe_async(self, calls: List[AsyncCall]) -> Tuple[str, str]:
+        """transcribe() for coroutine STT calls; the losing request is cancelled."""
+        if not calls:
+            raise ValueError("No STT provider configured")
+        remaining = list(calls)
+        first = self._next_allowed(remaining) or calls[0]
+        primary = first[0]
+
+        pending = {}
+        errors = []
+        empty = None
+        hedged = False
+
+        def launch(call):
+            pending[asyncio.ensure_future(self._run_async(*call))] = call[0]
+
+        launch(first)
+        hedge_at = time.monotonic() + self.hedge_delay(primary)
+
+        try:
+            while pending:
+                can_hedge = self.hedge_enabled and not hedged and remaining
+                timeout = max(hedge_at - time.monotonic(), 0) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    call = self._next_allowed(remaining)
+                    hedged = True
+                    if call is not None:
+                        print(f"STT: {primary} slow, hedging with {call[0]}")
+                        self._count("hedges")
+                        launch(call)
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        transcript = task.result()
+                    except Exception as e:
+                        print(f"STT provider {provider} failed: {e}")
+                        errors.append(f"{provider}: {e}")
+                        call = self._next_allowed(remaining) if not pending else None
+                        if call is not None:
+                            self._count("failovers")
+                            launch(call)
+                        continue
+
+                    if not transcript.strip() and pending:
+                        empty = (transcript, provider)
+                        continue
+                    if provider != primary and hedged:
+                        self._count("hedge_wins")
+                    return transcript, provider
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if empty is not None:
+            return empty
+        raise Exception(f"All STT providers failed: {'; '.join(errors)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            providers = list(self._breakers.items())
+            counters = {"hedges": self.hedges, "hedge_wins": self.hedge_wins, "failovers": self.failovers}
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            **counters,
+            "providers": {
+                name: {
+                    "state": breaker.state,
+                    "consecutive_failures": breaker.failures,
+                    "hedge_delay_ms": round(self.hedge_delay(name) * 1000),
+                }
+                for name, breaker in providers
+            },
+        }
+
+
+# Process-wide router (breaker state and latency history are per process)
+stt_router = STTRouter()
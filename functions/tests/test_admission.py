@@ -0,0 +1,191 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, TokenBucket, client_key, parse_limits
+
+
+def controller(**kwargs):
+    options = {"queue_size": 4, "queue_timeout": 1.0, "user_rate": 0, "user_burst": 1}
+    options.update(kwargs)
+    admission = AdmissionController({"groq": 1, "deepgram": 1}, **options)
+    admission.turn_seconds = 0.01
+    return admission
+
+
+def test_parse_limits():
+    assert parse_limits("groq=16, edge=32,") == {"groq": 16, "edge": 32}
+
+
+def test_client_key_prefers_session_then_proxy_address():
+    assert client_key("abc", "1.1.1.1", "2.2.2.2") == "session:abc"
+    assert client_key(None, "9.9.9.9, 1.1.1.1", "2.2.2.2") == "ip:1.1.1.1"
+    assert client_key(None, None, "2.2.2.2") == "ip:2.2.2.2"
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    wait = bucket.take()
+    assert 0 < wait <= 0.1
+    time.sleep(wait + 0.01)
+    assert bucket.take() == 0
+
+
+def test_user_rate_limit_rejects_with_429():
+    admission = controller(user_rate=1, user_burst=1)
+    admission.admit("user", ()).release()
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("user", ())
+    assert rejected.value.status == 429 and rejected.value.reason == "rate_limited"
+    assert rejected.value.headers()["Retry-After"] == "1"
+    # Other users have their own bucket
+    admission.admit("other", ()).release()
+
+
+def test_queued_turn_is_admitted_when_a_slot_frees():
+    admission = controller()
+    first = admission.admit("a", ("groq",))
+    threading.Timer(0.05, first.release).start()
+    second = admission.admit("b", ("groq",))
+    assert second.waited > 0
+    assert admission.stats()["queued"] == 1
+    second.release()
+    assert admission.stats()["in_flight"]["groq"] == 0
+
+
+def test_queue_timeout_and_full_queue_shed_with_503():
+    admission = controller(queue_size=1, queue_timeout=0.05)
+    held = admission.admit("a", ("groq",))
+    with pytest.raises(AdmissionRejected) as timed_out:
+        admission.admit("b", ("groq",))
+    assert (timed_out.value.status, timed_out.value.reason) == (503, "queue_timeout")
+
+    waiting = threading.Thread(target=lambda: pytest.raises(AdmissionRejected, admission.admit, "c", ("groq",)))
+    waiting.start()
+    time.sleep(0.01)
+    with pytest.raises(AdmissionRejected) as full:
+        admission.admit("d", ("groq",))
+    assert full.value.reason == "queue_full"
+    waiting.join()
+    held.release()
+
+
+def test_overloaded_when_expected_wait_exceeds_timeout():
+    admission = controller(queue_timeout=0.5)
+    admission.turn_seconds = 3.0
+    held = admission.admit("a", ("groq",))
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("b", ("groq",))  # expected wait: one turn of INITIAL_TURN_SECONDS
+    assert rejected.value.reason == "overloaded"
+    held.release()
+
+
+def test_unlisted_providers_are_unlimited():
+    admission = controller()
+    tickets = [admission.admit(str(i), ("edge",)) for i in range(10)]
+    for ticket in tickets:
+        ticket.release()
+
+
+def test_async_admission_waits_on_the_loop():
+    admission = controller()
+
+    async def run():
+        first = await admission.admit_async("a", ("groq",))
+        asyncio.get_running_loop().call_later(0.05, first.release)
+        second = await admission.admit_async("b", ("groq",))
+        second.release()
+        return second.waited
+
+    assert asyncio.run(run()) > 0
+    assert admission.stats()["in_flight"]["groq"] == 0
+
+
+def test_reserve_takes_free_slots_only():
+    admission = controller()
+    background = admission.reserve(("groq",))
+    assert background is not None
+    assert admission.reserve(("groq",)) is None
+    background.release()
+    turn_seconds = admission.turn_seconds
+    assert admission.reserve(("groq",)) is not None
+    # Background calls don't count as turns or feed the turn time average
+    assert admission.stats()["admitted"] == 0
+    assert admission.turn_seconds == turn_seconds
+
+
+def test_reserve_yields_to_queued_turns():
+    admission = controller()
+    held = admission.admit("a", ("groq",))
+    waiter = threading.Thread(target=lambda: admission.admit("b", ("groq", "deepgram")).release())
+    waiter.start()
+    assert wait_for(lambda: admission.stats()["queue_depth"] == 1)
+    # deepgram is free, but a queued turn goes first
+    assert admission.reserve(("deepgram",)) is None
+    held.release()
+    waiter.join()
+    assert admission.reserve(("deepgram",)) is not None
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_turn_shed_for_capacity_gets_its_rate_limit_token_back():
+    admission = controller(queue_size=0, user_rate=0.001, user_burst=2)
+    held = admission.admit("a", ("groq",))
+    for _ in range(3):
+        with pytest.raises(AdmissionRejected) as shed:
+            admission.admit("b", ("groq",))
+        assert shed.value.reason == "queue_full"
+    held.release()
+    # b's two tokens are still there once capacity frees up
+    admission.admit("b", ("groq",)).release()
+    admission.admit("b", ("groq",)).release()
+
+
+def test_slots_go_to_the_head_of_the_queue_first():
+    admission = AdmissionController({"groq": 1, "deepgram": 1}, queue_size=4, queue_timeout=2.0, user_rate=0,
+                                    sync_queue_timeout=2.0)
+    admission.turn_seconds = 0.01
+    groq = admission.admit("a", ("groq",))
+    deepgram = admission.admit("b", ("deepgram",))
+    order = []
+
+    def turn(key, providers):
+        ticket = admission.admit(key, providers)
+        order.append(key)
+        time.sleep(0.02)
+        ticket.release()
+
+    head = threading.Thread(target=turn, args=("head", ("groq", "deepgram")))
+    head.start()
+    assert wait_for(lambda: admission.stats()["queue_depth"] == 1)
+    behind = threading.Thread(target=turn, args=("behind", ("deepgram",)))
+    behind.start()
+    assert wait_for(lambda: admission.stats()["queue_depth"] == 2)
+    # deepgram frees first, but the later deepgram-only turn must not overtake the head
+    deepgram.release()
+    time.sleep(0.05)
+    assert order == []
+    groq.release()
+    head.join()
+    behind.join()
+    assert order == ["head", "behind"]
+
+
+def test_sync_admission_waits_at_most_the_sync_timeout():
+    admission = controller(queue_timeout=10.0, sync_queue_timeout=0.05)
+    held = admission.admit("a", ("groq",))
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected) as timed_out:
+        admission.admit("b", ("groq",))
+    assert timed_out.value.reason == "queue_timeout"
+    assert time.monotonic() - started < 1.0
+    held.release()
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import app_async
+from pipeline import TurnStages
+from tts_router import TTSResult
+
+SESSION_URL = f"{app_async.ROUTE_PREFIX}/interview_session"
+
+
+class Stages:
+    """Async stand-ins for the provider calls; hold() stops the reply after its first sentence."""
+
+    def __init__(self):
+        self.hold = asyncio.Event()
+        self.holding = False
+
+    async def transcribe(self, audio, content_type, tts_provider, tts_language):
+        return "tell me about caching", "deepgram"
+
+    async def transcribe_interim(self, audio, content_type, tts_provider, tts_language):
+        return ""
+
+    async def generate(self, user_message, chat_history, interview_type):
+        return "Sure."
+
+    async def generate_stream(self, user_message, chat_history, interview_type):
+        yield "Caching keeps hot data close. "
+        if self.holding:
+            await self.hold.wait()
+        yield "It trades memory for latency."
+
+    async def synthesize(self, text, tts_provider, tts_language, tts_allowed=None, audio_format=None):
+        return TTSResult(text.encode("utf-8"), "edge", tts_language, "audio/mpeg")
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    stages = Stages()
+    monkeypatch.setattr(app_async.turn_pipeline, "stages", TurnStages(
+        stages.transcribe, stages.transcribe_interim, stages.generate, stages.generate_stream, stages.synthesize))
+    saved = []
+    monkeypatch.setitem(app_async.turn_pipeline.hooks, "after_turn",
+                        [lambda turn: saved.append((turn.user_transcript, turn.ai_response_text, len(turn.chat_history)))])
+    stages.saved = saved
+    return stages
+
+
+def run(scenario):
+    async def main():
+        app = web.Application()
+        app.add_routes(app_async.routes)
+        async with TestClient(TestServer(app)) as client:
+            ws = await client.ws_connect(SESSION_URL)
+            try:
+                return await asyncio.wait_for(scenario(ws), 5)
+            finally:
+                await ws.close()
+
+    return asyncio.run(main())
+
+
+async def receive_until(ws, kind):
+    """Messages up to and including the first of a type (binary audio frames as bytes)."""
+    messages = []
+    while True:
+        message = await ws.receive()
+        data = message.data if message.type.name == "BINARY" else message.json()
+        messages.append(data)
+        if isinstance(data, dict) and data["type"] == kind:
+            return messages
+
+
+async def start(ws):
+    await ws.send_json({"type": "start", "interview_type": "technical", "tts_language": "en-US-AriaNeural"})
+    assert (await ws.receive_json())["type"] == "ready"
+    await ws.send_bytes(b"\x1a\x45\xdf\xa3" + b"\x00" * 200)
+
+
+def test_turn_streams_its_reply_and_saves_it(stages):
+    async def scenario(ws):
+        await start(ws)
+        await ws.send_json({"type": "turn_end"})
+        return await receive_until(ws, "done")
+
+    messages = run(scenario)
+    kinds = [m["type"] if isinstance(m, dict) else "bytes" for m in messages]
+    assert kinds[0] == "transcript" and kinds[-1] == "done"
+    audio = [m for m in messages if isinstance(m, dict) and m["type"] == "audio"]
+    assert len(audio) == 2
+    # Each audio message is followed by its binary frame
+    first = kinds.index("audio")
+    assert messages[first + 1] == b"Caching keeps hot data close."
+    assert len(messages[first + 1]) == audio[0]["bytes"]
+    assert stages.saved == [("tell me about caching", "Caching keeps hot data close. It trades memory for latency.", 0)]
+
+
+def test_barge_in_saves_the_interrupted_reply_as_streamed(stages):
+    stages.holding = True
+
+    async def scenario(ws):
+        await start(ws)
+        await ws.send_json({"type": "turn_end"})
+        await receive_until(ws, "text")
+        await ws.send_json({"type": "barge_in"})
+        await receive_until(ws, "cancelled")
+        # The next turn sees (and persists after) the interrupted exchange
+        stages.holding = False
+        await ws.send_bytes(b"\x1a\x45\xdf\xa3" + b"\x00" * 200)
+        await ws.send_json({"type": "turn_end"})
+        await receive_until(ws, "done")
+
+    run(scenario)
+    assert stages.saved[0] == ("tell me about caching", "Caching keeps hot data close. ", 0)
+    assert stages.saved[1][2] == 2
+
+
+def test_socket_keeps_reading_while_a_turn_waits_for_admission(stages, monkeypatch):
+    admitted = asyncio.Event()
+
+    async def queued_admission(request, turn):
+        await admitted.wait()
+
+    monkeypatch.setattr(app_async, "admit_turn", queued_admission)
+
+    async def scenario(ws):
+        await start(ws)
+        await ws.send_json({"type": "turn_end"})
+        await ws.send_json({"type": "barge_in"})
+        return await receive_until(ws, "cancelled")
+
+    assert run(scenario)[-1]["type"] == "cancelled"
+    assert stages.saved == []
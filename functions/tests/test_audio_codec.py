@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+import audio_codec
+import tts_cache
+from tts_cache import TTSCache
+from tts_router import TTSResult
+from audio_codec import encode_speech, DEFAULT_OPUS_KBPS, negotiate_audio_format, parse_audio_format
+
+
+@pytest.mark.parametrize("value, name", [
+    ("opus", f"opus:{DEFAULT_OPUS_KBPS}"),
+    ("opus:16", "opus:16"),
+    ("OPUS:16k", "opus:16"),
+    ("opus:1", "opus:6"),
+    ("mp3", "mp3:48"),
+    ("mp3:40", "mp3:32"),
+    ("mp3:1000", "mp3:128"),
+    ("pcm:16000", "pcm:16000"),
+    (" wav ", "wav:24000"),
+    ("mp3:fast", "mp3:48"),
+])
+def test_parses_format_and_parameter(value, name):
+    assert parse_audio_format(value).name == name
+
+
+@pytest.mark.parametrize("value", [None, "", "flac", "aac:64"])
+def test_absent_or_unknown_formats_send_the_provider_audio(value):
+    assert parse_audio_format(value) is None
+
+
+def test_mime_types_describe_the_encoded_bytes():
+    assert parse_audio_format("pcm:16000").mime_type == "audio/L16;rate=16000;channels=1"
+    assert parse_audio_format("opus").mime_type == "audio/webm;codecs=opus"
+
+
+def test_form_field_wins_over_accept_header():
+    assert negotiate_audio_format("mp3:64", "audio/webm").name == "mp3:64"
+    assert negotiate_audio_format(None, "audio/ogg, */*").name.startswith("opus:")
+    assert negotiate_audio_format(None, "*/*") is None
+
+
+def test_encodes_on_the_calling_thread_into_its_own_cache(monkeypatch):
+    monkeypatch.setattr(audio_codec, "FFMPEG", "ffmpeg")
+    monkeypatch.setattr(audio_codec, "transcode_cache", TTSCache(max_bytes=1024 * 1024, disk_dir=None))
+    threads = []
+
+    def transcode(audio, audio_format):
+        threads.append(threading.current_thread())
+        return b"opus:" + audio
+
+    monkeypatch.setattr(audio_codec, "transcode", transcode)
+    result = TTSResult(b"wav-bytes", "sarvam", "hi-IN", "audio/wav")
+    opus = parse_audio_format("opus")
+    tts_hits = tts_cache.tts_cache.stats()["hits"]
+
+    first = encode_speech(result, opus)
+    second = encode_speech(result, opus)
+    assert first.audio == second.audio == b"opus:wav-bytes"
+    assert first.mime_type == "audio/webm;codecs=opus"
+    assert threads == [threading.current_thread()]
+    assert audio_codec.transcode_cache.stats()["hits"] == 1
+    assert tts_cache.tts_cache.stats()["hits"] == tts_hits
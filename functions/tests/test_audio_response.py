@@ -0,0 +1,65 @@
+import json
+import base64
+from urllib.parse import unquote
+
+from audio_response import AudioBlobStore, audio_blobs, build_turn_response, negotiate_response_mode
+
+METADATA = {"user_transcript": "what is a cache", "ai_response_text": "Fast storage, é."}
+
+
+def test_response_mode_prefers_the_form_field_then_accept():
+    assert negotiate_response_mode("url", "audio/mpeg") == "url"
+    assert negotiate_response_mode("bogus", "multipart/mixed") == "multipart"
+    assert negotiate_response_mode(None, "audio/webm") == "binary"
+    assert negotiate_response_mode(None, "audio/*, application/json") == "json"
+    assert negotiate_response_mode(None, None) == "json"
+
+
+def test_json_mode_carries_base64_audio():
+    body, content_type, headers = build_turn_response("json", METADATA, b"\x00mp3", "audio/mpeg")
+    payload = json.loads(body)
+    assert content_type == "application/json" and headers == {}
+    assert base64.b64decode(payload["audio_base64"]) == b"\x00mp3"
+    assert payload["audio_mime"] == "audio/mpeg"
+    assert payload["ai_response_text"] == METADATA["ai_response_text"]
+
+
+def test_binary_mode_sends_raw_audio_with_metadata_header():
+    body, content_type, headers = build_turn_response("binary", METADATA, b"\x00mp3", "audio/mpeg")
+    assert (body, content_type) == (b"\x00mp3", "audio/mpeg")
+    assert json.loads(unquote(headers["X-Turn-Metadata"])) == METADATA
+    assert headers["Access-Control-Expose-Headers"] == "X-Turn-Metadata"
+
+
+def test_multipart_mode_has_metadata_then_audio_part():
+    audio = b"\r\n--not-a-boundary\x00\xff"
+    body, content_type, _ = build_turn_response("multipart", METADATA, audio, "audio/ogg")
+    assert content_type.startswith("multipart/mixed; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert body.startswith(b"--" + boundary + b"\r\n") and body.endswith(b"\r\n--" + boundary + b"--\r\n")
+    parts = body[len(boundary) + 4:-(len(boundary) + 8)].split(b"\r\n--" + boundary + b"\r\n")
+    headers, metadata = parts[0].split(b"\r\n\r\n", 1)
+    assert headers == b"Content-Type: application/json" and json.loads(metadata) == METADATA
+    headers, audio_part = parts[1].split(b"\r\n\r\n", 1)
+    assert headers == b"Content-Type: audio/ogg" and audio_part == audio
+
+
+def test_url_mode_stores_the_audio_for_get_audio():
+    body, _, _ = build_turn_response("url", METADATA, b"mp3", "audio/mpeg", audio_url_base="/get_audio")
+    payload = json.loads(body)
+    assert payload["audio_url"].startswith("/get_audio?id=") and payload["audio_base64"] == ""
+    assert audio_blobs.get(payload["audio_url"].split("id=")[1]) == (b"mp3", "audio/mpeg")
+    # A text-only reply has no audio to fetch
+    assert "audio_url" not in json.loads(build_turn_response("url", METADATA, b"", "audio/mpeg")[0])
+
+
+def test_blob_store_evicts_oldest_over_budget_and_expired():
+    store = AudioBlobStore(ttl_seconds=60, max_bytes=8)
+    first = store.put(b"aaaa", "audio/mpeg")
+    second = store.put(b"bbbb", "audio/mpeg")
+    third = store.put(b"cccc", "audio/mpeg")
+    assert store.get(first) is None
+    assert store.get(second) == (b"bbbb", "audio/mpeg") and store.get(third) is not None
+
+    expiring = AudioBlobStore(ttl_seconds=-1)
+    assert expiring.get(expiring.put(b"a", "audio/mpeg")) is None
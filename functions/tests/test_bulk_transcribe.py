@@ -0,0 +1,59 @@
+import pytest
+import requests
+
+import bulk_transcribe
+from bulk_transcribe import BulkTranscriber
+from provider_clients import ProviderError
+
+
+@pytest.fixture
+def transcriber(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_transcribe.time, "sleep", lambda seconds: None)
+    t = BulkTranscriber(str(tmp_path / "out.jsonl"), deepgram_rps=0, sarvam_rps=0, retries=2)
+    yield t
+    t.close()
+
+
+def failing_then(monkeypatch, errors, transcript="hello"):
+    calls = []
+
+    def call(audio, language, content_type):
+        calls.append(language)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return transcript
+
+    monkeypatch.setitem(bulk_transcribe.STT_CALLS, "deepgram", call)
+    return calls
+
+
+def test_retries_rate_limits_and_pauses_the_provider(transcriber, monkeypatch):
+    calls = failing_then(monkeypatch, [ProviderError("Deepgram API", 429, "slow down")])
+    paused = []
+    monkeypatch.setattr(transcriber.pacers["deepgram"], "pause", paused.append)
+    assert transcriber._call("deepgram", "en", b"audio", "audio/webm") == "hello"
+    assert len(calls) == 2
+    assert paused == [bulk_transcribe.BULK_RATE_LIMIT_PAUSE]
+
+
+def test_retries_outages_and_connection_errors_without_pausing(transcriber, monkeypatch):
+    calls = failing_then(monkeypatch, [ProviderError("Deepgram API", 503, "unavailable"), requests.ConnectionError()])
+    paused = []
+    monkeypatch.setattr(transcriber.pacers["deepgram"], "pause", paused.append)
+    assert transcriber._call("deepgram", "en", b"audio", "audio/webm") == "hello"
+    assert len(calls) == 3
+    assert paused == []
+
+
+def test_client_errors_fail_without_retrying(transcriber, monkeypatch):
+    calls = failing_then(monkeypatch, [ProviderError("Deepgram API", 400, "bad audio")])
+    with pytest.raises(ProviderError):
+        transcriber._call("deepgram", "en", b"audio", "audio/webm")
+    assert len(calls) == 1
+
+
+def test_gives_up_after_the_configured_retries(transcriber, monkeypatch):
+    calls = failing_then(monkeypatch, [ProviderError("Deepgram API", 500, "down")] * 5)
+    with pytest.raises(ProviderError, match="500"):
+        transcriber._call("deepgram", "en", b"audio", "audio/webm")
+    assert len(calls) == 3
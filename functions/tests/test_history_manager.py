@@ -0,0 +1,61 @@
+import time
+
+from history_manager import HistoryWindow, estimate_tokens, message_tokens
+
+
+def messages(count, start=0):
+    # 15 estimated tokens each (40 characters + chat overhead)
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:02d}" + "x" * 38}
+            for i in range(start, start + count)]
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_history_within_budget_is_sent_verbatim():
+    window = HistoryWindow(token_budget=1000, keep_turns=1)
+    history = messages(4)
+    summary, verbatim, metrics = window.fit(history, reserved_tokens=100)
+    assert summary is None and verbatim == history
+    assert metrics["prompt_tokens"] == 100 + 4 * message_tokens(history[0])
+    assert estimate_tokens("x" * 40) == 11
+
+
+def test_older_turns_are_summarized_in_the_background():
+    window = HistoryWindow(token_budget=100, keep_turns=1)
+    calls = []
+
+    def summarize(previous, new_messages):
+        calls.append((previous, [m["content"][:2] for m in new_messages]))
+        return f"summary of {len(new_messages)}"
+
+    history = messages(10)
+    summary, verbatim, metrics = window.fit(history, 0, summarize)
+    # No summary yet: the recent turn plus as many older messages as fit, newest first
+    assert summary is None
+    assert [m["content"][:2] for m in verbatim] == ["04", "05", "06", "07", "08", "09"]
+    assert metrics["dropped_messages"] == 4
+
+    assert wait_for(lambda: window.stats()["summaries_computed"] == 1)
+    summary, verbatim, metrics = window.fit(history, 0, summarize)
+    assert summary == "summary of 8"
+    assert verbatim == history[-2:]
+    assert (metrics["summarized_messages"], metrics["dropped_messages"]) == (8, 0)
+
+    # A later turn only summarizes the messages added since the cached summary
+    window.fit(history + messages(2, start=10), 0, summarize)
+    assert wait_for(lambda: window.stats()["summaries_computed"] == 2)
+    assert calls == [(None, ["00", "01", "02", "03", "04", "05", "06", "07"]), ("summary of 8", ["08", "09"])]
+
+
+def test_recent_turns_are_trimmed_to_the_last_exchange_when_over_budget():
+    window = HistoryWindow(token_budget=40, keep_turns=3)
+    history = messages(6)
+    summary, verbatim, metrics = window.fit(history, 0)
+    assert summary is None
+    assert verbatim == history[-2:]
+    assert metrics["dropped_messages"] == 4
@@ -0,0 +1,25 @@
+import pytest
+
+from opener_cache import GREETING_KEY, normalize_transcript
+
+
+@pytest.mark.parametrize("transcript", ["Hello!", "Hi there, I'm ready.", "Um, hey, good morning. Let's get started",
+                                        "Okay so... I am ready to begin"])
+def test_short_greetings_share_one_key(transcript):
+    assert normalize_transcript(transcript) == GREETING_KEY
+
+
+def test_answers_keep_their_words_without_punctuation_or_fillers():
+    assert normalize_transcript("Um, so I built a REST API... in Flask!") == "i built a rest api in flask"
+    assert normalize_transcript("I built a REST API in Flask") == normalize_transcript("so, i built a rest api in flask")
+
+
+def test_only_fillers_or_punctuation_is_empty():
+    assert normalize_transcript("Um... uh, okay?") == ""
+    assert normalize_transcript("") == ""
+
+
+def test_long_greetings_are_not_collapsed():
+    long_hello = "hi hello hey good morning thanks for having me nice to meet you here"
+    assert len(long_hello.split()) > 12
+    assert normalize_transcript(long_hello) == long_hello
@@ -0,0 +1,51 @@
+import asyncio
+
+from metrics import TurnTimer
+from pipeline import AsyncExecutor, TurnContext, TurnPipeline, TurnStages
+from tts_router import TTSResult
+
+
+def sync_stages():
+    return TurnStages(
+        transcribe=lambda audio, content_type, tts_provider, tts_language: ("what is a cache", "deepgram"),
+        transcribe_interim=lambda audio, content_type, tts_provider, tts_language: "",
+        generate=lambda user_message, chat_history, interview_type: "Fast storage.",
+        generate_stream=lambda user_message, chat_history, interview_type: iter(["Fast storage."]),
+        synthesize=lambda text, tts_provider, tts_language, tts_allowed=None, audio_format=None:
+            TTSResult(b"mp3", "edge", tts_language, "audio/mpeg"),
+    )
+
+
+def failing_save(turn):
+    raise RuntimeError("Firestore unavailable")
+
+
+def test_failing_hook_does_not_stop_later_hooks_or_fail_the_turn():
+    pipeline = TurnPipeline(sync_stages())
+    persisted = []
+    pipeline.add_hook("after_turn", failing_save)
+    pipeline.add_hook("after_turn", lambda turn: persisted.append(turn.ai_response_text))
+
+    turn = pipeline.run(TurnContext(TurnTimer()))
+    assert turn.ai_response_text == "Fast storage."
+    assert persisted == ["Fast storage."]
+
+
+def test_failing_hook_is_isolated_on_the_async_pipeline():
+    async def transcribe(audio, content_type, tts_provider, tts_language):
+        return "what is a cache", "deepgram"
+
+    async def generate(user_message, chat_history, interview_type):
+        return "Fast storage."
+
+    async def synthesize(text, tts_provider, tts_language, tts_allowed=None, audio_format=None):
+        return TTSResult(b"mp3", "edge", tts_language, "audio/mpeg")
+
+    pipeline = TurnPipeline(TurnStages(transcribe, None, generate, None, synthesize), AsyncExecutor())
+    persisted = []
+    pipeline.add_hook("after_turn", failing_save)
+    pipeline.add_hook("after_turn", lambda turn: persisted.append(turn.ai_response_text))
+
+    turn = asyncio.run(pipeline.run_async(TurnContext(TurnTimer())))
+    assert turn.speech.audio == b"mp3"
+    assert persisted == ["Fast storage."]
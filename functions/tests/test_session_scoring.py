@@ -0,0 +1,38 @@
+import json
+
+from session_scoring import answer_pairs, feedback_writes, read_transcript
+from transcript_store import turn_messages
+
+
+def write_session(path, user_id="alice", interview_id="int-1"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    messages = turn_messages(user_id, interview_id, 0, "I built the cache.", "Why that design?")
+    with open(path, "w", encoding="utf-8") as f:
+        for _, document in reversed(messages):
+            f.write(json.dumps(document, default=str) + "\n")
+    return messages
+
+
+def test_ids_come_from_the_user_directory_and_file_name(tmp_path):
+    write_session(tmp_path / "alice" / "int-1.jsonl")
+    session = read_transcript(tmp_path / "alice" / "int-1.jsonl", tmp_path)
+    assert (session["userId"], session["interviewId"]) == ("alice", "int-1")
+    assert [m["role"] for m in session["messages"]] == ["user", "ai"]
+    assert feedback_writes(session, {"metrics": {}})[0][0] == "users/alice/interviews/int-1"
+
+
+def test_flat_files_take_the_user_id_flag(tmp_path):
+    write_session(tmp_path / "int-2.jsonl")
+    assert read_transcript(tmp_path / "int-2.jsonl", tmp_path)["userId"] is None
+    session = read_transcript(tmp_path / "int-2.jsonl", tmp_path, user_id="bob")
+    assert (session["userId"], session["interviewId"]) == ("bob", "int-2")
+
+
+def test_ids_on_the_first_line_win(tmp_path):
+    path = tmp_path / "alice" / "export.jsonl"
+    path.parent.mkdir()
+    path.write_text(json.dumps({"userId": "carol", "interviewId": "int-9", "role": "assistant", "content": "Hi"})
+                    + "\n" + json.dumps({"role": "user", "content": "Hello"}) + "\n")
+    session = read_transcript(path, tmp_path)
+    assert (session["userId"], session["interviewId"]) == ("carol", "int-9")
+    assert answer_pairs(session["messages"]) == [(None, "Hi", "Hello")]
@@ -0,0 +1,75 @@
+import time
+
+from session_store import InMemorySessionStore, load_chat_history, parse_history
+import session_store
+
+
+def test_create_get_and_append_turn():
+    store = InMemorySessionStore(ttl_seconds=60)
+    session = store.create("behavioral", "sarvam", "hi-IN")
+    store.append_turn(session["session_id"], "hello", "hi there")
+    history = store.get(session["session_id"])["history"]
+    assert [(m["role"], m["content"]) for m in history] == [("user", "hello"), ("assistant", "hi there")]
+    assert store.get(session["session_id"])["interview_type"] == "behavioral"
+
+
+def test_get_returns_a_copy_of_the_history():
+    store = InMemorySessionStore(ttl_seconds=60)
+    session_id = store.create()["session_id"]
+    store.get(session_id)["history"].append({"role": "user", "content": "x"})
+    assert store.get(session_id)["history"] == []
+
+
+def test_sessions_expire_after_ttl():
+    store = InMemorySessionStore(ttl_seconds=0.05)
+    session_id = store.create()["session_id"]
+    time.sleep(0.06)
+    assert store.get(session_id) is None
+    assert len(store) == 0
+
+
+def test_parse_history_accepts_json_or_list():
+    assert parse_history('[{"role": "user", "content": "a"}]') == [{"role": "user", "content": "a"}]
+    assert parse_history([{"role": "user", "content": "b"}]) == [{"role": "user", "content": "b"}]
+    assert parse_history("not json") == []
+    assert parse_history('{"role": "user"}') == []
+    assert parse_history(None) == []
+
+
+def test_load_chat_history_prefers_the_session(monkeypatch):
+    store = InMemorySessionStore(ttl_seconds=60)
+    monkeypatch.setattr(session_store, "_stores", {"memory": store})
+    session_id = store.create()["session_id"]
+    store.append_turn(session_id, "q", "a")
+    history = load_chat_history(session_id, '[{"role": "user", "content": "stale"}]')
+    assert [m["content"] for m in history] == ["q", "a"]
+
+
+def test_unknown_session_falls_back_to_client_history(monkeypatch):
+    monkeypatch.setattr(session_store, "_stores", {"memory": InMemorySessionStore(ttl_seconds=60)})
+    assert load_chat_history("missing", None) is None
+    assert load_chat_history("missing", '[{"role": "user", "content": "x"}]') == [{"role": "user", "content": "x"}]
+    assert load_chat_history("missing", "[]") == []
+
+
+def test_backend_is_chosen_per_call_not_per_process(monkeypatch):
+    monkeypatch.setattr(session_store, "_stores", {})
+    monkeypatch.setattr(session_store, "SESSION_STORE", "memory")
+    default = session_store.get_session_store()
+    assert session_store.get_session_store("memory") is default
+    other = InMemorySessionStore(ttl_seconds=60)
+    session_store._stores["other"] = other
+    session_id = other.create()["session_id"]
+    assert load_chat_history(session_id, None, backend="other") == []
+    assert load_chat_history(session_id, None) is None
+
+
+def test_sessions_get_the_same_defaults_as_turns(monkeypatch):
+    import pipeline
+
+    monkeypatch.setattr(session_store, "_stores", {"memory": InMemorySessionStore(ttl_seconds=60)})
+    monkeypatch.setattr(session_store, "SESSION_STORE", "memory")
+    session = pipeline.open_session({})
+    turn = pipeline.TurnContext.from_params({}, None, pipeline.TurnTimer())
+    assert (session["tts_provider"], session["tts_language"]) == (turn.tts_provider, turn.tts_language)
+    assert pipeline.open_session({"tts_language": "en-IN"})["tts_language"] == "en-IN"
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import speculative
+from speculative import SpeculativeTurn, speculation_stats, transcript_similarity
+
+
+class Slots:
+    """reserve() stand-in: a fixed number of free slots."""
+
+    def __init__(self, free: int):
+        self.free = free
+        self.kinds = []
+
+    def __call__(self, kind):
+        if self.free <= 0:
+            return None
+        self.free -= 1
+        self.kinds.append(kind)
+        return self
+
+    def release(self):
+        self.free += 1
+
+
+def test_transcript_similarity_ignores_case_and_punctuation():
+    assert transcript_similarity("Hello, World!", "hello world") == 1.0
+    assert transcript_similarity("", "") == 1.0
+    assert transcript_similarity("one two three", "four five six") == 0.0
+
+
+def make_turn(monkeypatch, slots):
+    monkeypatch.setattr(speculative, "SPECULATIVE_INTERIM_INTERVAL", 0.0)
+    return SpeculativeTurn("audio/webm", lambda audio, content_type: "tell me about yourself",
+                           lambda transcript: iter(["I ", "am ", "ready."]), reserve=slots)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_speculation_is_kept_and_its_slot_released(monkeypatch):
+    slots = Slots(free=1)
+    turn = make_turn(monkeypatch, slots)
+    for _ in range(3):
+        turn.feed(b"x" * 100)
+        assert wait_for(lambda: not turn._interim_running)
+    assert wait_for(lambda: turn.speculation is not None)
+    speculation = turn.finish("Tell me about yourself.")
+    assert "".join(speculation.deltas()) == "I am ready."
+    assert wait_for(lambda: slots.free == 1)
+    assert "interim" in slots.kinds and "speculation" in slots.kinds
+
+
+def test_background_calls_skipped_without_a_slot(monkeypatch):
+    slots = Slots(free=0)
+    turn = make_turn(monkeypatch, slots)
+    throttled = speculation_stats.throttled
+    for _ in range(3):
+        turn.feed(b"x" * 100)
+    turn.close_audio()
+    assert turn.interim_transcript == ""
+    assert turn.speculation is None
+    assert speculation_stats.throttled > throttled
+    assert turn.finish("anything") is None
+
+
+def test_long_upload_runs_a_bounded_number_of_interims(monkeypatch):
+    monkeypatch.setattr(speculative, "SPECULATIVE_MAX_INTERIMS", 3)
+    sent = []
+
+    def transcribe(audio, content_type):
+        sent.append(audio.size)
+        return f"answer part {len(sent)}"
+
+    monkeypatch.setattr(speculative, "SPECULATIVE_INTERIM_INTERVAL", 0.0)
+    turn = SpeculativeTurn("audio/webm", transcribe, lambda transcript: iter([]))
+    capped = speculation_stats.capped
+    for _ in range(30):
+        turn.feed(b"x" * 100)
+        assert wait_for(lambda: not turn._interim_running)
+    assert sent == [100, 200, 300]
+    assert speculation_stats.capped == capped + 1
+    turn.cancel()
+
+
+def test_async_turn_shares_the_interim_budget(monkeypatch):
+    monkeypatch.setattr(speculative, "SPECULATIVE_MAX_INTERIMS", 2)
+    monkeypatch.setattr(speculative, "SPECULATIVE_INTERIM_INTERVAL", 0.0)
+    sent = []
+
+    async def transcribe(audio, content_type):
+        sent.append(audio.size)
+        return "same words"
+
+    async def generate(transcript):
+        yield "reply"
+
+    async def upload():
+        turn = speculative.AsyncSpeculativeTurn("audio/webm", transcribe, generate)
+        for _ in range(10):
+            turn.feed(b"x" * 10)
+            await asyncio.sleep(0.01)
+        turn.cancel()
+
+    asyncio.run(upload())
+    assert sent == [10, 20]
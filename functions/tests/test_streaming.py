@@ -0,0 +1,128 @@
+import json
+import asyncio
+import threading
+
+import streaming
+from streaming import SentenceChunker, stream_turn, stream_turn_async
+from tts_router import TTSResult
+
+
+def events(stream):
+    parsed = []
+    for raw in stream:
+        lines = raw.strip().split("\n")
+        parsed.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return parsed
+
+
+def test_chunker_cuts_at_sentence_boundaries():
+    chunker = SentenceChunker()
+    sentences = []
+    for delta in ["That is a good start. Can you ", "walk me through it? Take ", "your time."]:
+        sentences += chunker.feed(delta)
+    assert sentences == ["That is a good start.", "Can you walk me through it?"]
+    assert chunker.flush() == "Take your time."
+    assert chunker.flush() is None
+
+
+def test_chunker_merges_short_fragments():
+    chunker = SentenceChunker()
+    assert chunker.feed("Great. ") == []
+    assert chunker.feed("Now tell me about your last project. ") == ["Great. Now tell me about your last project."]
+
+
+def test_chunker_waits_for_whitespace_after_terminator():
+    chunker = SentenceChunker()
+    assert chunker.feed("We used version 3.") == []
+    assert chunker.feed("5 of the library in production. ") == ["We used version 3.5 of the library in production."]
+
+
+def speak(sentence):
+    return TTSResult(sentence.encode("utf-8"), "edge", "en-US-AriaNeural", "audio/mpeg")
+
+
+def test_stream_turn_emits_audio_in_order_and_done():
+    completed = []
+    stream = stream_turn("hello", lambda: iter(["Thanks for joining today. ", "Tell me about yourself please."]),
+                         speak, on_complete=completed.append)
+    parsed = events(stream)
+    kinds = [kind for kind, _ in parsed]
+    assert kinds[0] == "transcript" and kinds[-1] == "done"
+    audio = [data for kind, data in parsed if kind == "audio"]
+    assert [a["index"] for a in audio] == [0, 1]
+    assert audio[1]["text"] == "Tell me about yourself please."
+    assert completed == ["Thanks for joining today. Tell me about yourself please."]
+
+
+def test_empty_transcript_is_an_error():
+    assert [kind for kind, _ in events(stream_turn("  ", lambda: iter([]), speak))] == ["transcript", "error"]
+
+
+def test_disconnect_cancels_queued_sentences(monkeypatch):
+    release = threading.Event()
+    synthesized = []
+
+    def slow_speak(sentence):
+        release.wait(2)
+        synthesized.append(sentence)
+        return speak(sentence)
+
+    pool = streaming.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(streaming, "_tts_executor", pool)
+    sentences = [f"This is sentence number {i} of the reply. " for i in range(6)]
+    stream = stream_turn("hello", lambda: iter(sentences), slow_speak)
+    for event in stream:
+        if event.startswith("event: text") and "number 5" in event:
+            break
+    stream.close()  # client went away
+    release.set()
+    pool.shutdown(wait=True)
+    assert len(synthesized) == 1  # only the sentence already running
+
+
+def test_error_cancels_queued_sentences(monkeypatch):
+    release = threading.Event()
+    synthesized = []
+
+    def slow_speak(sentence):
+        release.wait(2)
+        synthesized.append(sentence)
+        return speak(sentence)
+
+    def failing_tokens():
+        for i in range(4):
+            yield f"This is sentence number {i} of the reply. "
+        raise RuntimeError("Groq stream reset")
+
+    pool = streaming.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(streaming, "_tts_executor", pool)
+    parsed = events(stream_turn("hello", failing_tokens, slow_speak))
+    release.set()
+    pool.shutdown(wait=True)
+    assert parsed[-1] == ("error", {"error": "Groq stream reset"})
+    assert len(synthesized) == 1
+
+
+def test_failing_completion_hook_still_ends_with_done():
+    def save(text):
+        raise RuntimeError("Firestore unavailable")
+
+    parsed = events(stream_turn("hello", lambda: iter(["Thanks for joining today. "]), speak, on_complete=save))
+    assert [kind for kind, _ in parsed] == ["transcript", "text", "audio", "done"]
+    assert parsed[-1][1]["ai_response_text"] == "Thanks for joining today. "
+
+
+def test_failing_async_completion_hook_still_ends_with_done():
+    async def tokens():
+        yield "Thanks for joining today. "
+
+    async def speak_async(sentence):
+        return speak(sentence)
+
+    async def save(text):
+        raise RuntimeError("transcript queue full")
+
+    async def collect():
+        return [event async for event in stream_turn_async("hello", tokens, speak_async, on_complete=save)]
+
+    assert [kind for kind, _ in events(asyncio.run(collect()))] == ["transcript", "text", "audio", "done"]
@@ -0,0 +1,163 @@
+import time
+import asyncio
+
+import pytest
+
+import stt_router
+from provider_clients import ProviderError
+from stt_router import CircuitBreaker, STTRouter
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    open_breaker(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    open_breaker(breaker)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+    open_breaker(breaker)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_cancelled_trial_reopens_for_another_cooldown():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_cancelled()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_cancelled_request_leaves_closed_breaker_alone():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_cancelled()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_hedge_loser_cancelled_during_half_open_trial(monkeypatch):
+    monkeypatch.setattr(stt_router, "STT_HEDGE_DEFAULT_DELAY", 0.01)
+    router = STTRouter(hedge_enabled=True)
+    breaker = router.breaker("deepgram")
+    breaker.cooldown = 0.05
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    async def slow():
+        await asyncio.sleep(10)
+        return "never"
+
+    async def fast():
+        await asyncio.sleep(0.02)
+        return "hello"
+
+    # deepgram's half-open trial is slow, the sarvam hedge wins and the trial is cancelled
+    result = asyncio.run(router.transcribe_async([("deepgram", slow), ("sarvam", fast)]))
+    assert result == ("hello", "sarvam")
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_cancelled_turn_releases_half_open_trial():
+    router = STTRouter(hedge_enabled=False)
+    breaker = router.breaker("deepgram")
+    breaker.cooldown = 0.05
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    async def slow():
+        await asyncio.sleep(10)
+        return "never"
+
+    async def run():
+        task = asyncio.ensure_future(router.transcribe_async([("deepgram", slow)]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_async_failover_to_next_provider():
+    router = STTRouter(hedge_enabled=False)
+
+    async def broken():
+        raise RuntimeError("Deepgram API error 500")
+
+    async def ok():
+        return "transcript"
+
+    assert asyncio.run(router.transcribe_async([("deepgram", broken), ("sarvam", ok)])) == ("transcript", "sarvam")
+    assert router.failovers == 1
+
+
+def test_sync_transcribe_prefers_first_provider():
+    router = STTRouter(hedge_enabled=False, max_workers=2)
+    assert router.transcribe([("deepgram", lambda: "hi"), ("sarvam", lambda: "other")]) == ("hi", "deepgram")
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    router = STTRouter(hedge_enabled=False, max_workers=2)
+
+    def bad_audio():
+        raise ProviderError("Deepgram API", 400, "corrupt or unsupported data")
+
+    for _ in range(stt_router.STT_BREAKER_FAILURES + 2):
+        with pytest.raises(Exception, match="All STT providers failed"):
+            router.transcribe([("deepgram", bad_audio)])
+    assert router.breaker("deepgram").state == "closed"
+
+
+def test_rate_limits_outages_and_transport_errors_trip_the_breaker():
+    for error in (ProviderError("Deepgram API", 429, "slow down"), ProviderError("Deepgram API", 503, "down"),
+                  TimeoutError("read timed out")):
+        router = STTRouter(hedge_enabled=False)
+
+        async def failing():
+            raise error
+
+        for _ in range(stt_router.STT_BREAKER_FAILURES):
+            with pytest.raises(Exception):
+                asyncio.run(router.transcribe_async([("deepgram", failing)]))
+        assert router.breaker("deepgram").state == "open"
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+import transcript_store
+from transcript_store import InMemoryMessageStore, WriteBehindQueue, turn_messages
+
+
+class BlockingStore(InMemoryMessageStore):
+    """Holds every commit until released, so turns pile up in the queue."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.entered = threading.Event()
+
+    def commit(self, writes):
+        self.entered.set()
+        self.release.wait(5)
+        super().commit(writes)
+
+
+class FlakyStore(InMemoryMessageStore):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def commit(self, writes):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("DEADLINE_EXCEEDED")
+        super().commit(writes)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(transcript_store.time, "sleep", lambda seconds: None)
+
+
+def test_turn_messages_link_the_follow_up_to_the_answer():
+    (user_path, user), (ai_path, ai) = turn_messages("alice", "int-1", 4, "answer", "question", now=0)
+    assert user_path == f"users/alice/interviews/int-1/messages/{user['id']}"
+    assert ai_path.startswith("users/alice/interviews/int-1/messages/")
+    assert (user["sequenceNumber"], ai["sequenceNumber"]) == (4, 5)
+    assert ai["questionMetadata"] == {"followUpTo": user["id"]}
+
+
+def test_queued_turns_are_committed_in_batches():
+    store = BlockingStore()
+    writer = WriteBehindQueue(store, batch_size=3, flush_interval=0.5)
+    writer.put(turn_messages("alice", "int-1", 0, "first", "q"))
+    assert store.entered.wait(5)
+    for n in range(1, 7):
+        writer.put(turn_messages("alice", "int-1", n * 2, f"answer {n}", "q"))
+    store.release.set()
+    writer.close()
+    # The first turn alone, then the six turns that waited behind it in batches of three
+    assert store.batches == 3
+    assert len(store.messages("alice", "int-1")) == 14
+    stats = writer.stats()
+    assert (stats["queued"], stats["written"], stats["batches"], stats["pending"]) == (7, 14, 3, 0)
+
+
+def test_close_flushes_queued_turns_and_later_puts_write_inline():
+    store = InMemoryMessageStore()
+    writer = WriteBehindQueue(store, batch_size=50, flush_interval=60)
+    writer.put(turn_messages("alice", "int-1", 0, "answer", "q"))
+    writer.close(timeout=5)
+    assert len(store.messages("alice", "int-1")) == 2
+    assert writer.put(turn_messages("alice", "int-1", 2, "late", "q"))
+    assert len(store.messages("alice", "int-1")) == 4
+
+
+def test_full_queue_drops_the_turn_after_the_timeout():
+    store = BlockingStore()
+    writer = WriteBehindQueue(store, batch_size=1, flush_interval=0, max_queued=1, enqueue_timeout=0.01)
+    writer.put(turn_messages("alice", "int-1", 0, "first", "q"))
+    assert store.entered.wait(5)
+    assert writer.put(turn_messages("alice", "int-1", 2, "queued", "q"))
+    assert not writer.put(turn_messages("alice", "int-1", 4, "dropped", "q"))
+    stats = writer.stats()
+    assert (stats["blocked"], stats["dropped"]) == (1, 2)
+    store.release.set()
+    writer.close()
+    assert [m["text"] for m in store.messages("alice", "int-1")] == ["first", "q", "queued", "q"]
+
+
+def test_failed_commits_are_retried_then_dropped():
+    store = FlakyStore(failures=2)
+    writer = WriteBehindQueue(store, retries=2, flush_interval=0)
+    writer.put(turn_messages("alice", "int-1", 0, "answer", "q"))
+    writer.close()
+    assert len(store.messages("alice", "int-1")) == 2
+
+    store = FlakyStore(failures=5)
+    writer = WriteBehindQueue(store, retries=1, flush_interval=0)
+    writer.put(turn_messages("alice", "int-1", 0, "answer", "q"))
+    writer.close()
+    assert store.documents == {}
+    assert writer.stats()["failed"] == 2
+
+
+def test_flush_commits_without_waiting_for_the_batch_to_fill():
+    store = InMemoryMessageStore()
+    writer = WriteBehindQueue(store, batch_size=50, flush_interval=60)
+    writer.put(turn_messages("alice", "int-1", 0, "answer", "q"))
+    assert writer.flush(timeout=5)
+    assert len(store.messages("alice", "int-1")) == 2
+    writer.put(turn_messages("alice", "int-1", 2, "next", "q"))
+    assert writer.flush(timeout=5)
+    assert len(store.messages("alice", "int-1")) == 4
+    writer.close(timeout=5)
+    assert writer.flush(timeout=0.1)
+
+
+def test_queues_are_kept_per_backend(monkeypatch):
+    monkeypatch.setattr(transcript_store, "_transcripts", {})
+    monkeypatch.setattr(transcript_store, "TRANSCRIPT_STORE", "off")
+    assert transcript_store.get_transcript_queue() is None
+    memory = transcript_store.get_transcript_queue("memory")
+    assert transcript_store.get_transcript_queue("memory") is memory
+    memory.put(turn_messages("alice", "int-1", 0, "answer", "q"))
+    transcript_store.flush_transcripts(timeout=5)
+    assert len(memory.store.messages("alice", "int-1")) == 2
+    assert transcript_store.transcript_stats("memory")["written"] == 2
+    transcript_store.close_transcripts()
@@ -0,0 +1,49 @@
+import os
+import time
+
+from tts_cache import TTSCache, cache_key
+
+
+def test_cache_key_ignores_whitespace_but_not_case():
+    key = cache_key("edge", "en-US-AriaNeural", "", "", 24000, "Hello  world ")
+    assert key == cache_key("edge", "en-US-AriaNeural", "", "", 24000, "Hello world")
+    assert key != cache_key("edge", "en-US-AriaNeural", "", "", 24000, "hello world")
+    assert key != cache_key("sarvam", "priya", "en-IN", "bulbul:v3", 8000, "Hello world")
+
+
+def test_memory_lru_is_bounded_by_bytes():
+    cache = TTSCache(max_bytes=10, disk_dir=None)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # a is now the most recent
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_serves_other_instances(tmp_path):
+    writer = TTSCache(max_bytes=1024, disk_dir=str(tmp_path))
+    writer.put("ab" + "0" * 62, b"audio")
+    reader = TTSCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert reader.get("ab" + "0" * 62) == b"audio"
+    assert reader.stats()["disk_hits"] == 1
+    assert reader.stats()["disk_bytes"] == 5
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(max_bytes=1, disk_dir=str(tmp_path), disk_max_bytes=300)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, bytes(100))
+        path = cache._disk_path(key)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+    # Reading the oldest entry makes it the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.put("99" + "0" * 62, bytes(100))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    stats = cache.stats()
+    assert stats["disk_evictions"] >= 1
+    assert stats["disk_bytes"] <= 300 * 0.8
+    assert sum(f[1] for f in cache._disk_files()) == stats["disk_bytes"]
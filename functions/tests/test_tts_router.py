@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import tts_router
+from tts_cache import TTSCache
+from tts_router import TTSRouter, edge_option, sarvam_option, tts_plan
+
+EDGE = edge_option("en-IN-NeerjaNeural")
+SARVAM = sarvam_option("en-IN")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = TTSCache(max_bytes=1024 * 1024, disk_dir=None)
+    monkeypatch.setattr(tts_router, "tts_cache", cache)
+    return cache
+
+
+def test_plan_puts_preferred_provider_first():
+    plan = tts_plan("sarvam", "hi-IN", {"edge": True, "sarvam": True})
+    assert [option.provider for option in plan] == ["sarvam", "edge"]
+    assert plan[1].voice == "hi-IN-SwaraNeural"
+    assert [o.provider for o in tts_plan("edge", "", {"edge": True, "sarvam": True}, allowed=["edge"])] == ["edge"]
+
+
+def test_falls_back_when_preferred_provider_fails():
+    router = TTSRouter()
+
+    def broken(option, text):
+        raise RuntimeError("Edge-TTS timeout")
+
+    result = router.synthesize("Hello", [EDGE, SARVAM], {"edge": broken, "sarvam": lambda option, text: b"wav"})
+    assert (result.provider, result.audio) == ("sarvam", b"wav")
+    assert router.fallbacks == 1
+
+
+def test_all_providers_failing_raises():
+    router = TTSRouter()
+    with pytest.raises(Exception, match="All TTS providers failed"):
+        router.synthesize("Hello", [EDGE], {"edge": lambda option, text: b""})
+
+
+def test_fallback_voice_cache_does_not_replace_healthy_preferred_voice(fresh_cache):
+    router = TTSRouter()
+    fresh_cache.put(SARVAM.cache_key("Hello"), b"fallback voice")
+    calls = []
+
+    def edge(option, text):
+        calls.append(option.provider)
+        return b"preferred voice"
+
+    result = router.synthesize("Hello", [EDGE, SARVAM], {"edge": edge, "sarvam": edge})
+    assert (result.provider, result.audio) == ("edge", b"preferred voice")
+    assert calls == ["edge"]
+
+
+def test_chosen_voice_is_served_from_cache_first(fresh_cache):
+    router = TTSRouter()
+    fresh_cache.put(EDGE.cache_key("Hello"), b"cached")
+
+    def never(option, text):
+        raise AssertionError("provider called on a cache hit")
+
+    assert router.synthesize("Hello", [EDGE, SARVAM], {"edge": never, "sarvam": never}).audio == b"cached"
+
+
+def test_async_synthesis_caches_the_result(fresh_cache):
+    router = TTSRouter()
+
+    async def edge(option, text):
+        return b"mp3"
+
+    result = asyncio.run(router.synthesize_async("Hi there", [EDGE], {"edge": edge}))
+    assert result.audio == b"mp3"
+    assert fresh_cache.get(EDGE.cache_key("Hi  there ")) == b"mp3"
+
+
+def test_rank_normalizes_latency_by_text_length():
+    router = TTSRouter()
+    # Edge only served short fillers, Sarvam long replies: Sarvam is faster per character
+    router._record(EDGE, "Okay.", 0.5, True)
+    router._record(SARVAM, "x" * 400, 1.2, True)
+    long_sentence = "y" * 600
+    assert router.rank([EDGE, SARVAM], long_sentence) == [SARVAM, EDGE]
+    assert router.rank([EDGE, SARVAM], "Okay.") == [EDGE, SARVAM]
+
+
+def test_unmeasured_voice_is_expected_to_match_the_measured_ones():
+    router = TTSRouter()
+    router._record(SARVAM, "x" * 100, 3.0, True)
+    # Without samples Edge is assumed as slow as Sarvam, not a flat default that would win on the switch penalty
+    assert router.rank([SARVAM, EDGE], "y" * 300) == [SARVAM, EDGE]
+    assert router.stats()["voices"]["sarvam:priya"]["ms_per_100_chars"] == 3000
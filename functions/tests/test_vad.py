@@ -0,0 +1,49 @@
+import numpy as np
+
+from vad import detect_speech, FRAME_MS
+
+RATE = 16000
+
+
+def tone(seconds: float, dbfs: float) -> np.ndarray:
+    """A 220 Hz sine whose RMS level is dbfs."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    amplitude = np.sqrt(2) * 10 ** (dbfs / 20)
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def noise(seconds: float, dbfs: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(RATE * seconds)) * 10 ** (dbfs / 20)).astype(np.float32)
+
+
+def test_silence_has_no_speech():
+    assert detect_speech(np.zeros(RATE * 2, dtype=np.float32), RATE) is None
+    assert detect_speech(noise(2, -70), RATE) is None
+
+
+def test_speech_is_trimmed_to_its_range_with_padding():
+    samples = np.concatenate([noise(1, -70), tone(1, -20), noise(1, -70)])
+    start, end = detect_speech(samples, RATE)
+    assert 0.7 * RATE <= start <= 1.0 * RATE
+    assert 2.0 * RATE <= end <= 2.3 * RATE
+
+
+def test_continuous_quiet_answer_counts_as_speech():
+    # No silence to estimate a noise floor from: the relative threshold alone would miss it
+    assert detect_speech(tone(2, -35), RATE) == (0, 2 * RATE)
+
+
+def test_quiet_answer_after_silence_counts_as_speech():
+    samples = np.concatenate([noise(1, -70), tone(2, -35)])
+    start, end = detect_speech(samples, RATE)
+    assert start <= 1.0 * RATE and end == 3 * RATE
+
+
+def test_level_below_absolute_floor_is_not_speech():
+    assert detect_speech(tone(2, -50), RATE) is None
+
+
+def test_too_short_a_burst_is_not_speech():
+    samples = np.concatenate([noise(1, -70), tone(FRAME_MS * 3 / 1000, -20), noise(1, -70)])
+    assert detect_speech(samples, RATE) is None
@@ -0,0 +1,332 @@
+"""
+Write-behind persistence of interview transcripts.
+
+Each finished turn becomes two message documents under
+`users/{userId}/interviews/{interviewId}/messages` (see
+docs/FIREBASE_ARCHITECTURE.md). The request only puts the turn on a bounded
+queue; a background thread commits queued turns in batched writes once
+TRANSCRIPT_BATCH_SIZE turns are waiting or TRANSCRIPT_FLUSH_INTERVAL seconds
+after the oldest one was queued, so persistence adds no provider round trip
+to the turn.
+
+- A full queue holds the turn for up to TRANSCRIPT_ENQUEUE_TIMEOUT seconds
+  (backpressure), then its messages are dropped and counted
+- Message IDs are assigned when the turn is queued, so a retried batch
+  overwrites instead of duplicating
+- Queued turns are flushed at interpreter exit, when a gunicorn worker exits
+  (gunicorn.conf.py), on the async server's cleanup, and by the Firebase
+  functions before they return (flush_transcripts): Cloud Functions throttles
+  an instance's CPU once its response is sent and stops it without running
+  atexit
+
+Backends (TRANSCRIPT_STORE environment variable, or passed by the server):
+- "off" (default of the Flask and aiohttp servers): nothing is persisted
+- "memory": in-process documents by path, for tests and local development
+- "firestore": Firestore batched writes (default of the Firebase functions in main.py)
+"""
+
+import os
+import time
+import uuid
+import queue
+import atexit
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+TRANSCRIPT_STORE = os.environ.get("TRANSCRIPT_STORE", "off")
+TRANSCRIPT_BATCH_SIZE = int(os.environ.get("TRANSCRIPT_BATCH_SIZE", "50"))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.environ.get("TRANSCRIPT_FLUSH_INTERVAL", "1"))
+TRANSCRIPT_QUEUE_MAX = int(os.environ.get("TRANSCRIPT_QUEUE_MAX", "1000"))
+TRANSCRIPT_ENQUEUE_TIMEOUT = float(os.environ.get("TRANSCRIPT_ENQUEUE_TIMEOUT", "0.5"))
+TRANSCRIPT_COMMIT_RETRIES = int(os.environ.get("TRANSCRIPT_COMMIT_RETRIES", "3"))
+# Seconds a Firebase function waits for its queued writes before returning
+TRANSCRIPT_FLUSH_TIMEOUT = float(os.environ.get("TRANSCRIPT_FLUSH_TIMEOUT", "5"))
+
+# Firestore caps a batched write at 500 operations; each turn is two
+FIRESTORE_MAX_BATCH_WRITES = 500
+WRITES_PER_TURN = 2
+
+_CLOSE = object()
+
+
+def messages_path(user_id: str, interview_id: str) -> str:
+    return f"users/{user_id}/interviews/{interview_id}/messages"
+
+
+def turn_messages(user_id: str, interview_id: str, sequence_number: int, user_text: str, ai_text: str,
+                  now: Optional[float] = None) -> list:
+    """(document path, document) writes of one exchange: the candidate's answer and the interviewer's follow-up."""
+    timestamp = datetime.fromtimestamp(now if now is not None else time.time(), tz=timezone.utc)
+    collection = messages_path(user_id, interview_id)
+    user_message_id, ai_message_id = uuid.uuid4().hex, uuid.uuid4().hex
+    return [
+        (f"{collection}/{user_message_id}", {
+            "id": user_message_id,
+            "role": "user",
+            "type": "answer",
+            "text": user_text,
+            "audioUrl": None,
+            "timestamp": timestamp,
+            "sequenceNumber": sequence_number,
+        }),
+        (f"{collection}/{ai_message_id}", {
+            "id": ai_message_id,
+            "role": "ai",
+            "type": "follow_up",
+            "text": ai_text,
+            "audioUrl": None,
+            "timestamp": timestamp,
+            "sequenceNumber": sequence_number + 1,
+            "questionMetadata": {"followUpTo": user_message_id},
+        }),
+    ]
+
+
+class InMemoryMessageStore:
+    """Documents kept by path in process memory; stands in for Firestore in tests."""
+
+    def __init__(self):
+        self.documents = {}
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def commit(self, writes: list):
+        with self._lock:
+            for path, document in writes:
+                self.documents[path] = document
+            self.batches += 1
+
+    def messages(self, user_id: str, interview_id: str) -> list:
+        """An interview's message documents in sequence order."""
+        prefix = messages_path(user_id, interview_id) + "/"
+        with self._lock:
+            found = [document for path, document in self.documents.items() if path.startswith(prefix)]
+        return sorted(found, key=lambda document: document["sequenceNumber"])
+
+
+class FirestoreMessageStore:
+    """
+    Firestore batched writes; the client is created by the writer thread on its first batch.
+
+    With merge=True the documents are merged into existing ones (e.g. feedback on an interview).
+    """
+
+    def __init__(self, merge: bool = False):
+        self.merge = merge
+        self._client = None
+
+    def _db(self):
+        if self._client is None:
+            import firebase_admin
+            from firebase_admin import firestore
+
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app()
+            self._client = firestore.client()
+        return self._client
+
+    def commit(self, writes: list):
+        db = self._db()
+        batch = db.batch()
+        for path, document in writes:
+            batch.set(db.document(path), document, merge=self.merge)
+        batch.commit()
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of turn writes drained by one background writer thread.
+
+    put() only enqueues; the writer groups up to batch_size turns per store
+    commit and retries a failed commit with backoff before dropping it.
+    """
+
+    def __init__(self, store, batch_size: int = TRANSCRIPT_BATCH_SIZE,
+                 flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL, max_queued: int = TRANSCRIPT_QUEUE_MAX,
+                 enqueue_timeout: float = TRANSCRIPT_ENQUEUE_TIMEOUT, retries: int = TRANSCRIPT_COMMIT_RETRIES):
+        self.store = store
+        self.batch_size = max(1, min(batch_size, FIRESTORE_MAX_BATCH_WRITES // WRITES_PER_TURN))
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._counters = {"queued": 0, "blocked": 0, "dropped": 0, "written": 0, "batches": 0, "failed": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _ensure_writer(self) -> bool:
+        """Start the writer thread on first use; False once the queue is closed."""
+        with self._lock:
+            if self._closed:
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._thread.start()
+            return True
+
+    def put(self, writes: list) -> bool:
+        """
+        Queue one turn's writes. While the queue is full this waits up to
+        enqueue_timeout seconds, then drops the turn and returns False.
+        After close() the writes are committed inline.
+        """
+        if not self._ensure_writer():
+            self._write([writes])
+            return True
+        try:
+            self._queue.put_nowait(writes)
+        except queue.Full:
+            self._count("blocked")
+            try:
+                self._queue.put(writes, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self._count("dropped", len(writes))
+                print(f"Transcript queue full, dropped {len(writes)} writes")
+                return False
+        self._count("queued")
+        return True
+
+    def _write(self, batch: list):
+        writes = [write for turn_writes in batch for write in turn_writes]
+        for attempt in range(self.retries + 1):
+            try:
+                self.store.commit(writes)
+                self._count("written", len(writes))
+                self._count("batches")
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Transcript batch of {len(writes)} writes failed, dropped: {e}")
+                    self._count("failed", len(writes))
+                    return
+                time.sleep(min(0.2 * 2 ** attempt, 5.0))
+
+    def _next_batch(self, first) -> tuple:
+        """
+        (batch, marker): turns queued within flush_interval of the first, up to
+        batch_size; marker is the close marker or a flush() event that cut the batch short.
+        """
+        batch, deadline = [first], time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _CLOSE or isinstance(item, threading.Event):
+                return batch, item
+            batch.append(item)
+        return batch, None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _CLOSE:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            batch, marker = self._next_batch(item)
+            self._write(batch)
+            if marker is _CLOSE:
+                break
+            if marker is not None:
+                marker.set()
+        # Turns queued behind the close marker
+        rest, flushes = [], []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                flushes.append(item)
+            elif item is not _CLOSE:
+                rest.append(item)
+        for start in range(0, len(rest), self.batch_size):
+            self._write(rest[start:start + self.batch_size])
+        for flushed in flushes:
+            flushed.set()
+
+    def flush(self, timeout: float = TRANSCRIPT_FLUSH_TIMEOUT) -> bool:
+        """Commit every turn queued so far without waiting for its batch to fill; False after timeout seconds."""
+        with self._lock:
+            if self._closed or self._thread is None:
+                return True
+        flushed = threading.Event()
+        try:
+            self._queue.put(flushed, timeout=timeout)
+        except queue.Full:
+            return False
+        return flushed.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush every queued turn and stop the writer (waits up to timeout seconds)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_CLOSE, timeout=timeout)
+        except queue.Full:
+            print("Transcript queue did not drain before shutdown")
+            return
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "pending": self._queue.qsize(), "backend": type(self.store).__name__}
+
+
+_transcripts: Dict[str, WriteBehindQueue] = {}
+_transcripts_lock = threading.Lock()
+
+
+def get_transcript_queue(backend: Optional[str] = None) -> Optional[WriteBehindQueue]:
+    """The process-wide write-behind queue of a backend (TRANSCRIPT_STORE by default), or None when it is "off"."""
+    backend = backend or TRANSCRIPT_STORE
+    if backend == "off":
+        return None
+    with _transcripts_lock:
+        if backend not in _transcripts:
+            store = FirestoreMessageStore() if backend == "firestore" else InMemoryMessageStore()
+            _transcripts[backend] = WriteBehindQueue(store)
+            atexit.register(_transcripts[backend].close)
+        return _transcripts[backend]
+
+
+def flush_transcripts(timeout: float = TRANSCRIPT_FLUSH_TIMEOUT):
+    """Commit the queued turns now (Firebase functions, before their instance is throttled)."""
+    with _transcripts_lock:
+        queues = list(_transcripts.values())
+    for transcripts in queues:
+        if not transcripts.flush(timeout):
+            print(f"Transcript writes not flushed within {timeout}s")
+
+
+def close_transcripts():
+    """Flush the process-wide queues and stop their writers (server shutdown)."""
+    with _transcripts_lock:
+        queues = list(_transcripts.values())
+    for transcripts in queues:
+        transcripts.close()
+
+
+def transcript_stats(backend: Optional[str] = None) -> dict:
+    backend = backend or TRANSCRIPT_STORE
+    with _transcripts_lock:
+        transcripts = _transcripts.get(backend)
+    if transcripts is None:
+        return {"backend": backend}
+    return transcripts.stats()
@@ -0,0 +1,198 @@
+"""
+Content-addressed cache for synthesized TTS audio.
+
+Interviewers repeat a lot of phrases, so synthesized audio is cached by a hash
+of (provider, voice/speaker, language, model, sample rate, normalized text).
+
+Two tiers:
+- In-memory LRU bounded by total bytes (TTS_CACHE_MAX_BYTES, default 64MB)
+- Optional on-disk tier (TTS_CACHE_DIR) shared by all gunicorn workers on the
+  host; entries are written atomically and read back through mmap. It is
+  bounded by TTS_CACHE_DISK_MAX_BYTES (default 512MB): once a worker's count
+  of the directory size passes it, the least recently used files (by mtime,
+  refreshed on every disk hit) are deleted down to 80% of the budget
+"""
+
+import os
+import re
+import mmap
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR")
+TTS_CACHE_DISK_MAX_BYTES = int(os.environ.get("TTS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+# Disk eviction deletes down to this fraction of the budget, so it doesn't run on every write
+DISK_EVICT_TARGET = 0.8
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different spacing shares an entry (case is kept: "US" vs "us")."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(provider: str, voice: str, language: str, model: str, sample_rate: int, text: str) -> str:
+    """Content address for a synthesis request."""
+    parts = [provider, voice, language, model, str(sample_rate), normalize_text(text)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Byte-bounded in-memory LRU with an optional shared disk tier."""
+
+    def __init__(self, max_bytes: int = TTS_CACHE_MAX_BYTES, disk_dir: Optional[str] = TTS_CACHE_DIR,
+                 disk_max_bytes: int = TTS_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_files(self) -> list:
+        """(path, size, mtime) of every entry in the disk tier."""
+        files = []
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the tier is under DISK_EVICT_TARGET of its budget."""
+        with self._disk_lock:
+            # Other workers write to the same directory: recount before deleting
+            files = sorted(self._disk_files(), key=lambda f: f[2])
+            size = sum(f[1] for f in files)
+            target = self.disk_max_bytes * DISK_EVICT_TARGET
+            for path, file_size, _ in files:
+                if size <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+                with self._lock:
+                    self.disk_evictions += 1
+            self._disk_size = size
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    audio = mapped[:]
+            # Recently used entries are evicted last
+            os.utime(path)
+            return audio
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._disk_path(key)
+        if os.path.exists(path) or len(audio) > self.disk_max_bytes:
+            return
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so other workers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"TTS cache disk write failed: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        with self._disk_lock:
+            self._disk_size += len(audio)
+            over = self._disk_size > self.disk_max_bytes
+        if over:
+            self._evict_disk()
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = audio
+            self._size += len(audio)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        if self.disk_dir:
+            audio = self._read_disk(key)
+            if audio is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, audio)
+                return audio
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, audio: bytes):
+        self._put_memory(key, audio)
+        if self.disk_dir:
+            self._write_disk(key, audio)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_tier": bool(self.disk_dir),
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+# Process-wide cache
+tts_cache = TTSCache()
@@ -0,0 +1,289 @@
+"""
+Latency-aware routing between TTS providers.
+
+The client's `tts_provider` is a preference, not a hard requirement. For each
+request the router:
+- lists the providers that can speak the turn's language (and that the client
+  allows through the optional `tts_allowed` form field)
+- ranks them by the expected time to voice this text: a moving average
+  (EWMA) of seconds per 100 characters per provider and voice, times the
+  text's length, with a switching penalty so the preferred voice is kept
+  unless another provider is clearly faster. Normalizing by length keeps a
+  voice that happened to serve short sentences (fillers, openers) from
+  looking faster than one that served long replies; a voice without samples
+  is expected to match the average of the measured ones
+- skips providers whose moving error rate is too high, until a cooldown has
+  passed since their last failure
+- falls back to the next provider when synthesis fails, so one provider's
+  outage doesn't leave the turn without audio
+
+Each option in ranked order is served from the TTS cache if it has the
+audio, else synthesized. A clip cached for a fallback voice is therefore only
+used when that voice is picked, and cache hits don't count towards the
+latency averages.
+"""
+
+import os
+import time
+import threading
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from tts_cache import tts_cache, cache_key
+
+TTS_ROUTER_EWMA_ALPHA = float(os.environ.get("TTS_ROUTER_EWMA_ALPHA", "0.2"))
+# Seconds per 100 characters assumed while no voice has samples yet
+TTS_ROUTER_DEFAULT_SECONDS_PER_100_CHARS = float(os.environ.get("TTS_ROUTER_DEFAULT_SECONDS_PER_100_CHARS", "1.0"))
+# Extra seconds a non-preferred provider must save before it is picked over the preferred voice
+TTS_ROUTER_SWITCH_PENALTY = float(os.environ.get("TTS_ROUTER_SWITCH_PENALTY", "1.0"))
+TTS_ROUTER_MAX_ERROR_RATE = float(os.environ.get("TTS_ROUTER_MAX_ERROR_RATE", "0.5"))
+TTS_ROUTER_COOLDOWN = float(os.environ.get("TTS_ROUTER_COOLDOWN", "30"))
+
+TTS_PROVIDERS = ("edge", "sarvam")
+
+# Edge-TTS neural voice per language (full locale first, then the base language)
+EDGE_VOICES = {
+    "en-US": "en-US-AriaNeural",
+    "en-IN": "en-IN-NeerjaNeural",
+    "en": "en-US-AriaNeural",
+    "hi": "hi-IN-SwaraNeural",
+    "bn": "bn-IN-TanishaaNeural",
+    "gu": "gu-IN-DhwaniNeural",
+    "kn": "kn-IN-SapnaNeural",
+    "ml": "ml-IN-SobhanaNeural",
+    "mr": "mr-IN-AarohiNeural",
+    "ta": "ta-IN-PallaviNeural",
+    "te": "te-IN-ShrutiNeural",
+}
+
+# Languages Sarvam bulbul:v3 speaks
+SARVAM_LANGUAGES = ("en-IN", "hi-IN", "bn-IN", "gu-IN", "kn-IN", "ml-IN", "mr-IN", "od-IN", "pa-IN", "ta-IN", "te-IN")
+SARVAM_SPEAKER = "priya"
+SARVAM_MODEL = "bulbul:v3"
+SARVAM_SAMPLE_RATE = 8000
+
+
+class TTSOption(NamedTuple):
+    """One way to voice a turn. language is the provider's language parameter ("" for Edge, whose voice implies it)."""
+    provider: str
+    voice: str
+    language: str
+    model: str
+    sample_rate: int
+    mime_type: str
+
+    def cache_key(self, text: str) -> str:
+        return cache_key(self.provider, self.voice, self.language, self.model, self.sample_rate, text)
+
+
+class TTSResult(NamedTuple):
+    audio: bytes
+    provider: str
+    voice: str
+    mime_type: str
+
+
+def edge_option(voice: str) -> TTSOption:
+    return TTSOption("edge", voice, "", "", 24000, "audio/mpeg")
+
+
+def sarvam_option(language_code: str, speaker: str = SARVAM_SPEAKER) -> TTSOption:
+    return TTSOption("sarvam", speaker, language_code, SARVAM_MODEL, SARVAM_SAMPLE_RATE, "audio/wav")
+
+
+def parse_allowed(value: Optional[str]) -> Optional[List[str]]:
+    """`tts_allowed` form field ("edge,sarvam") -> provider list, or None for no restriction."""
+    if not value:
+        return None
+    return [p.strip() for p in value.split(",") if p.strip() in TTS_PROVIDERS]
+
+
+def tts_plan(preferred: str, tts_language: str, configured: Dict[str, bool],
+             allowed: Optional[List[str]] = None) -> List[TTSOption]:
+    """
+    Compatible TTS options for a turn, preferred provider first.
+
+    Edge turns speak the Edge voice the client sent (tts_language holds a voice
+    name such as en-US-AriaNeural) or Aria; Sarvam turns speak tts_language.
+    """
+    if preferred == "sarvam":
+        language = tts_language or "hi-IN"
+        edge_voice = None
+    else:
+        preferred = "edge"
+        edge_voice = tts_language if tts_language and tts_language.endswith("Neural") else EDGE_VOICES["en-US"]
+        language = "-".join(edge_voice.split("-")[:2])
+
+    base = language.split("-")[0]
+    options = {
+        "edge": edge_option(edge_voice or EDGE_VOICES.get(language) or EDGE_VOICES.get(base, "")),
+        "sarvam": sarvam_option(language if language in SARVAM_LANGUAGES else ("en-IN" if base == "en" else "")),
+    }
+
+    plan = []
+    for provider in [preferred] + [p for p in TTS_PROVIDERS if p != preferred]:
+        option = options[provider]
+        if not (option.voice and (option.provider == "edge" or option.language)):
+            continue
+        if not configured.get(provider):
+            continue
+        if allowed is not None and provider not in allowed and provider != preferred:
+            continue
+        plan.append(option)
+    return plan
+
+
+def _hundreds_of_chars(text: str) -> float:
+    return max(len(text), 1) / 100
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.seconds_per_100_chars: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.last_failure = 0.0
+
+
+class TTSRouter:
+    """Ranks TTS options by moving latency / error statistics and falls back on failure."""
+
+    def __init__(self, alpha: float = TTS_ROUTER_EWMA_ALPHA):
+        self.alpha = alpha
+        self._stats: Dict[Tuple[str, str], _ProviderStats] = {}
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+        self.switches = 0
+
+    def _get(self, option: TTSOption) -> _ProviderStats:
+        key = (option.provider, option.voice)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _ProviderStats()
+        return stats
+
+    def _record(self, option: TTSOption, text: str, seconds: float, ok: bool):
+        with self._lock:
+            stats = self._get(option)
+            stats.requests += 1
+            stats.error_rate = (1 - self.alpha) * stats.error_rate + (0.0 if ok else self.alpha)
+            if ok:
+                rate = seconds / _hundreds_of_chars(text)
+                stats.seconds_per_100_chars = (rate if stats.seconds_per_100_chars is None
+                                               else (1 - self.alpha) * stats.seconds_per_100_chars + self.alpha * rate)
+            else:
+                stats.failures += 1
+                stats.last_failure = time.monotonic()
+
+    def rank(self, options: List[TTSOption], text: str = "") -> List[TTSOption]:
+        """Healthy options by expected time to voice text (preferred option favoured), then unhealthy ones."""
+        if not options:
+            return []
+        preferred = options[0]
+        now = time.monotonic()
+        healthy, unhealthy = [], []
+        with self._lock:
+            measured = [self._get(o).seconds_per_100_chars for o in options
+                        if self._get(o).seconds_per_100_chars is not None]
+            unmeasured = sum(measured) / len(measured) if measured else TTS_ROUTER_DEFAULT_SECONDS_PER_100_CHARS
+            for position, option in enumerate(options):
+                stats = self._get(option)
+                rate = stats.seconds_per_100_chars if stats.seconds_per_100_chars is not None else unmeasured
+                score = rate * _hundreds_of_chars(text) + (0.0 if option == preferred else TTS_ROUTER_SWITCH_PENALTY)
+                degraded = stats.error_rate > TTS_ROUTER_MAX_ERROR_RATE and now - stats.last_failure < TTS_ROUTER_COOLDOWN
+                (unhealthy if degraded else healthy).append((score, position, option))
+        return [option for _, _, option in sorted(healthy)] + [option for _, _, option in sorted(unhealthy, key=lambda s: s[1])]
+
+    def _attempts(self, options: List[TTSOption], text: str) -> Iterator[TTSOption]:
+        """The options to try in ranked order, counting route switches and fallbacks."""
+        if not options:
+            raise ValueError("No compatible TTS provider configured")
+        ranked = self.rank(options, text)
+        if ranked[0] != options[0]:
+            with self._lock:
+                self.switches += 1
+        for attempt, option in enumerate(ranked):
+            if attempt:
+                with self._lock:
+                    self.fallbacks += 1
+            yield option
+
+    @staticmethod
+    def _cached(option: TTSOption, text: str) -> Optional[TTSResult]:
+        audio = tts_cache.get(option.cache_key(text))
+        return TTSResult(audio, option.provider, option.voice, option.mime_type) if audio is not None else None
+
+    def _outcome(self, option: TTSOption, text: str, seconds: float, audio: Optional[bytes],
+                 error: Optional[Exception], errors: List[str]) -> Optional[TTSResult]:
+        """Record one provider call: its (cached) result, or None with the error noted."""
+        if error is None and not audio:
+            error = Exception("empty audio")
+        self._record(option, text, seconds, error is None)
+        if error is not None:
+            print(f"TTS {option.provider} ({option.voice}) failed: {error}")
+            errors.append(f"{option.provider}: {error}")
+            return None
+        tts_cache.put(option.cache_key(text), audio)
+        return TTSResult(audio, option.provider, option.voice, option.mime_type)
+
+    def synthesize(self, text: str, options: List[TTSOption],
+                   synthesizers: Dict[str, Callable[[TTSOption, str], bytes]]) -> TTSResult:
+        """
+        Voice text with the best available option.
+
+        synthesizers maps a provider name to an uncached call (option, text) -> audio.
+        Raises if every option fails.
+        """
+        errors = []
+        for option in self._attempts(options, text):
+            result = self._cached(option, text)
+            if result is not None:
+                return result
+            start, audio, error = time.perf_counter(), None, None
+            try:
+                audio = synthesizers[option.provider](option, text)
+            except Exception as e:
+                error = e
+            result = self._outcome(option, text, time.perf_counter() - start, audio, error, errors)
+            if result is not None:
+                return result
+        raise Exception(f"All TTS providers failed: {'; '.join(errors)}")
+
+    async def synthesize_async(self, text: str, options: List[TTSOption],
+                               synthesizers: Dict[str, Callable[[TTSOption, str], Awaitable[bytes]]]) -> TTSResult:
+        """synthesize() for coroutine synthesizers (async server)."""
+        errors = []
+        for option in self._attempts(options, text):
+            result = self._cached(option, text)
+            if result is not None:
+                return result
+            start, audio, error = time.perf_counter(), None, None
+            try:
+                audio = await synthesizers[option.provider](option, text)
+            except Exception as e:
+                error = e
+            result = self._outcome(option, text, time.perf_counter() - start, audio, error, errors)
+            if result is not None:
+                return result
+        raise Exception(f"All TTS providers failed: {'; '.join(errors)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "fallbacks": self.fallbacks,
+                "switches": self.switches,
+                "voices": {
+                    f"{provider}:{voice}": {
+                        "ms_per_100_chars": (round(s.seconds_per_100_chars * 1000)
+                                             if s.seconds_per_100_chars is not None else None),
+                        "error_rate": round(s.error_rate, 3),
+                        "requests": s.requests,
+                        "failures": s.failures,
+                    }
+                    for (provider, voice), s in self._stats.items()
+                },
+            }
+
+
+# Process-wide router
+tts_router = TTSRouter()
@@ -0,0 +1,150 @@
+"""
+Long-lived Edge-TTS worker.
+
+Runs one asyncio event loop per process on a background thread and accepts
+synthesis jobs from the synchronous Flask / Cloud Functions handlers, instead
+of building a new event loop with asyncio.run on every request.
+
+- Concurrency is bounded by EDGE_TTS_CONCURRENCY (default 8) in-flight syntheses
+- Edge-TTS streams one utterance per websocket, so the socket itself cannot be
+  reused; the worker shares a single TCP connector instead, which keeps the
+  DNS cache and SSL context warm across jobs
+- Audio chunks are collected into a preallocated buffer rather than grown
+  with bytes concatenation
+"""
+
+import os
+import asyncio
+import threading
+from typing import Optional
+
+import aiohttp
+import edge_tts
+
+DEFAULT_VOICE = "en-US-AriaNeural"
+EDGE_TTS_CONCURRENCY = int(os.environ.get("EDGE_TTS_CONCURRENCY", "8"))
+EDGE_TTS_TIMEOUT = float(os.environ.get("EDGE_TTS_TIMEOUT", "30"))
+
+# Edge-TTS returns 24kHz / 48kbps mono MP3 (~6KB per second of speech) and
+# speech runs at roughly 15 characters per second.
+BYTES_PER_CHAR_ESTIMATE = 400
+
+
+class AudioBuffer:
+    """Byte buffer preallocated from a size hint, growing geometrically if exceeded."""
+
+    def __init__(self, size_hint: int):
+        self._buf = bytearray(max(size_hint, 4096))
+        self._len = 0
+
+    def write(self, data: bytes):
+        end = self._len + len(data)
+        if end > len(self._buf):
+            self._buf.extend(bytes(max(end - len(self._buf), len(self._buf))))
+        self._buf[self._len:end] = data
+        self._len = end
+
+    def getvalue(self) -> bytes:
+        return bytes(memoryview(self._buf)[:self._len])
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class SharedConnector(aiohttp.TCPConnector):
+    """
+    TCP connector that outlives the per-call ClientSession edge_tts creates.
+
+    edge_tts closes the connector it is given when its session exits; this one
+    ignores that and is only closed by the worker itself.
+    """
+
+    async def close(self, *args, **kwargs):
+        return None
+
+    async def shutdown(self):
+        await super().close()
+
+
+async def synthesize_async(text: str, voice: str = DEFAULT_VOICE,
+                           connector: Optional[aiohttp.BaseConnector] = None) -> bytes:
+    """Synthesize text on the running event loop (for asyncio servers and the worker loop)."""
+    communicate = edge_tts.Communicate(text, voice, connector=connector)
+    buffer = AudioBuffer(len(text) * BYTES_PER_CHAR_ESTIMATE)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            buffer.write(chunk["data"])
+    return buffer.getvalue()
+
+
+class EdgeTTSWorker:
+    """Background event loop that runs Edge-TTS synthesis jobs."""
+
+    def __init__(self, concurrency: int = EDGE_TTS_CONCURRENCY):
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._connector: Optional[SharedConnector] = None
+
+    def _ensure_started(self):
+        # Re-create the loop after a fork (gunicorn workers), since threads don't survive it
+        if self._loop is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="edge-tts-worker", daemon=True)
+            thread.start()
+
+            async def setup():
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._connector = SharedConnector(ttl_dns_cache=300)
+
+            asyncio.run_coroutine_threadsafe(setup(), loop).result()
+            self._thread = thread
+            self._pid = os.getpid()
+            self._loop = loop
+
+    async def _synthesize(self, text: str, voice: str) -> bytes:
+        async with self._semaphore:
+            return await synthesize_async(text, voice, self._connector)
+
+    def synthesize(self, text: str, voice: str = DEFAULT_VOICE, timeout: float = EDGE_TTS_TIMEOUT) -> bytes:
+        """Synthesize text on the worker loop, blocking the calling thread until done."""
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._synthesize(text, voice), self._loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Edge-TTS synthesis timed out after {timeout}s")
+
+    def shutdown(self):
+        """Stop the worker loop (used by tests and benchmarks)."""
+        with self._lock:
+            if self._loop is None:
+                return
+            loop = self._loop
+            if self._connector is not None:
+                asyncio.run_coroutine_threadsafe(self._connector.shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
+            self._loop = None
+            self._thread = None
+            self._connector = None
+
+
+# Process-wide worker
+_worker = EdgeTTSWorker()
+
+
+def synthesize(text: str, voice: str = DEFAULT_VOICE) -> bytes:
+    """Synthesize text with Edge-TTS on the shared background worker."""
+    return _worker.synthesize(text, voice)
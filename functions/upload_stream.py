@@ -0,0 +1,226 @@
+"""
+Bounded-memory handling of uploaded recordings.
+
+An upload is copied in UPLOAD_CHUNK_BYTES chunks into an AudioSpool: kept in
+memory up to UPLOAD_SPOOL_MEMORY_BYTES, then moved to an anonymous temporary
+file. MAX_UPLOAD_BYTES is enforced while copying, so an oversized upload is
+rejected (413) without being read in full.
+
+Provider requests then stream the spool as the request body (BodyStream,
+Content-Length known up front), including Sarvam's multipart body, so the
+audio is never joined into one bytes object or copied per provider. Reads are
+positional (os.pread), so hedged STT requests can stream the same spool
+concurrently, even while a streaming-input turn is still appending to it.
+
+The temporary file is closed (and removed) once the last reference to the
+spool is gone, e.g. after a hedged request that lost the race has finished.
+"""
+
+import os
+import uuid
+import tempfile
+import threading
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.environ.get("UPLOAD_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeds the configured maximum size (HTTP 413)."""
+
+
+class AudioSpool:
+    """Append-only audio buffer in memory, spilling to a temporary file."""
+
+    def __init__(self, content_type: str = "audio/webm", max_bytes: int = MAX_UPLOAD_BYTES,
+                 memory_bytes: int = UPLOAD_SPOOL_MEMORY_BYTES):
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._chunks: List[bytes] = []  # (memory mode) immutable, so readers never see a resize
+        self._file = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        with self._lock:
+            if self._size + len(data) > self.max_bytes:
+                raise UploadTooLarge(f"Audio upload exceeds {self.max_bytes} bytes")
+            if self._file is None and self._size + len(data) > self.memory_bytes:
+                self._file = tempfile.TemporaryFile(prefix="upload-")
+                for chunk in self._chunks:
+                    self._file.write(chunk)
+                self._chunks = []
+            if self._file is not None:
+                self._file.seek(0, os.SEEK_END)
+                self._file.write(data)
+                self._file.flush()
+            else:
+                self._chunks.append(bytes(data))
+            self._size += len(data)
+
+    def iter_chunks(self, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = UPLOAD_CHUNK_BYTES) -> Iterator[bytes]:
+        """Bytes [start, end) in chunks; independent of other readers and of later writes."""
+        end = self._size if end is None else min(end, self._size)
+        with self._lock:
+            file, chunks = self._file, list(self._chunks)
+        if file is None:
+            offset = 0
+            for chunk in chunks:
+                chunk_end = offset + len(chunk)
+                if chunk_end > start and offset < end:
+                    yield chunk[max(start - offset, 0):min(end - offset, len(chunk))]
+                offset = chunk_end
+                if offset >= end:
+                    break
+            return
+        position = start
+        while position < end:
+            data = os.pread(file.fileno(), min(chunk_size, end - position), position)
+            if not data:
+                break
+            position += len(data)
+            yield data
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Bytes [start, end) joined; only for small ranges such as headers."""
+        return b"".join(self.iter_chunks(start, end))
+
+    def slice(self, start: int = 0, end: Optional[int] = None) -> "SpoolSlice":
+        return SpoolSlice(self, start, self._size if end is None else end)
+
+
+class SpoolSlice:
+    """A fixed byte range of a spool (e.g. the audio received so far, or a trimmed WAV's data)."""
+
+    def __init__(self, spool: AudioSpool, start: int, end: int):
+        self.spool = spool
+        self.start = start
+        self.end = end
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        return self.spool.iter_chunks(self.start, self.end)
+
+
+# Anything that can be streamed as (part of) a request body
+AudioSource = Union[bytes, AudioSpool, SpoolSlice, "BodyStream"]
+
+
+def source_size(source: AudioSource) -> int:
+    return len(source) if isinstance(source, (bytes, bytearray)) else source.size
+
+
+def iter_source(source: AudioSource) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray)):
+        for offset in range(0, len(source), UPLOAD_CHUNK_BYTES):
+            yield bytes(source[offset:offset + UPLOAD_CHUNK_BYTES])
+    else:
+        yield from source.iter_chunks()
+
+
+def read_source(source: AudioSource) -> bytes:
+    """Whole source as bytes (small sources only)."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    return b"".join(iter_source(source))
+
+
+class BodyStream:
+    """
+    Re-iterable request body made of byte strings and spool ranges.
+
+    len() gives the Content-Length, so requests streams it without chunked
+    encoding; __aiter__ lets aiohttp stream it too.
+    """
+
+    def __init__(self, parts: List[AudioSource]):
+        self.parts = parts
+
+    @property
+    def size(self) -> int:
+        return sum(source_size(part) for part in self.parts)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for part in self.parts:
+            yield from iter_source(part)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self.iter_chunks()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        # Chunk reads are memory copies or page-cache preads; not worth a thread hop each
+        for chunk in self.iter_chunks():
+            yield chunk
+
+
+def request_body(audio: AudioSource) -> Union[bytes, BodyStream]:
+    """Body for a raw-audio provider request (Deepgram)."""
+    if isinstance(audio, (bytes, bytearray, BodyStream)):
+        return audio
+    return BodyStream([audio])
+
+
+def multipart_body(audio: AudioSource, filename: str, content_type: str, fields: dict,
+                   field_name: str = "file") -> Tuple[BodyStream, str]:
+    """multipart/form-data body streaming the audio part (Sarvam). Returns (body, Content-Type header)."""
+    boundary = uuid.uuid4().hex
+    head = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    )
+    parts = [head.encode("utf-8"), audio, f"\r\n--{boundary}--\r\n".encode("utf-8")]
+    return BodyStream(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def spool_upload(stream, content_type: str = "audio/webm", max_bytes: int = MAX_UPLOAD_BYTES,
+                 declared_size: Optional[int] = None) -> AudioSpool:
+    """
+    Copy a file-like upload into a spool in chunks.
+
+    Raises UploadTooLarge as soon as the declared size or the bytes read so far
+    exceed max_bytes.
+    """
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadTooLarge(f"Audio upload exceeds {max_bytes} bytes")
+    spool = AudioSpool(content_type, max_bytes)
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        spool.write(chunk)
+    return spool
+
+
+async def spool_upload_async(reader, content_type: str = "audio/webm", max_bytes: int = MAX_UPLOAD_BYTES) -> AudioSpool:
+    """spool_upload for an aiohttp multipart BodyPartReader."""
+    spool = AudioSpool(content_type, max_bytes)
+    while True:
+        chunk = await reader.read_chunk(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        spool.write(chunk)
+    return spool
@@ -0,0 +1,365 @@
+"""
+Voice-activity detection and silence trimming before STT.
+
+Decodes the uploaded audio locally, runs an energy-based detector over 30ms
+frames and:
+- skips STT (and the whole LLM/TTS pipeline) when no speech is present
+- trims leading and trailing silence before the audio is sent to the provider
+
+Audio is decoded block by block and only one level per frame is kept, so
+memory stays bounded however long the recording is. WAV is parsed directly
+and trimmed without copying (new header + a byte range of the upload).
+WebM/Opus and other compressed formats are decoded through an `ffmpeg` binary
+on PATH; without it the audio is passed through untouched.
+"""
+
+import os
+import shutil
+import struct
+import threading
+import subprocess
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from upload_stream import (AudioSource, AudioSpool, SpoolSlice, BodyStream, iter_source, read_source,
+                           source_size, UPLOAD_CHUNK_BYTES)
+
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "true").lower() == "true"
+VAD_MIN_DBFS = float(os.environ.get("VAD_MIN_DBFS", "-45"))
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "10"))
+# Frames louder than this always count as speech (keeps non-stop speech from raising the noise floor)
+VAD_MAX_THRESHOLD_DBFS = float(os.environ.get("VAD_MAX_THRESHOLD_DBFS", "-30"))
+VAD_MIN_SPEECH_MS = int(os.environ.get("VAD_MIN_SPEECH_MS", "150"))
+VAD_PADDING_MS = int(os.environ.get("VAD_PADDING_MS", "200"))
+FRAME_MS = 30
+DECODE_SAMPLE_RATE = 16000
+FFMPEG_TIMEOUT = float(os.environ.get("VAD_FFMPEG_TIMEOUT", "30"))
+WAV_HEADER_SCAN_BYTES = 64 * 1024
+
+FFMPEG = shutil.which("ffmpeg")
+if VAD_ENABLED and not FFMPEG:
+    # Only the Docker image installs ffmpeg: on Firebase and the Procfile deploy WebM/Opus would pass VAD unchecked
+    print("Warning: ffmpeg not found on PATH; VAD can't decode WebM/Opus uploads and passes them to STT untouched")
+
+
+class VadResult(NamedTuple):
+    audio_data: AudioSource
+    content_type: str
+    has_speech: bool
+    original_seconds: float
+    seconds_saved: float
+
+
+class WavLayout(NamedTuple):
+    channels: int
+    sample_rate: int
+    sample_width: int
+    data_offset: int
+    data_size: int
+
+
+class LevelMeter:
+    """Per-frame dBFS of a mono sample stream fed in arbitrary blocks."""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frame_len = max(int(sample_rate * FRAME_MS / 1000), 1)
+        self.samples = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._levels: List[np.ndarray] = []
+
+    def feed(self, samples: np.ndarray):
+        self.samples += len(samples)
+        buffer = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        n_frames = len(buffer) // self.frame_len
+        if n_frames:
+            frames = buffer[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+            self._levels.append(20 * np.log10(np.maximum(rms, 1e-10)))
+        self._pending = buffer[n_frames * self.frame_len:]
+
+    def dbfs(self) -> np.ndarray:
+        return np.concatenate(self._levels) if self._levels else np.zeros(0)
+
+
+def _read_head(audio: AudioSource, size: int) -> bytes:
+    head = b""
+    for chunk in iter_source(audio):
+        head += chunk
+        if len(head) >= size:
+            break
+    return head[:size]
+
+
+def parse_wav_header(head: bytes, total_size: int) -> Optional[WavLayout]:
+    """Integer-PCM WAV layout from the first bytes of a file. data_size is clamped to what was uploaded."""
+    if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    position = 12
+    fmt = None
+    while position + 8 <= len(head):
+        chunk_id = head[position:position + 4]
+        chunk_size = struct.unpack("<I", head[position + 4:position + 8])[0]
+        if chunk_id == b"fmt " and position + 24 <= len(head):
+            fmt = struct.unpack("<HHIIHH", head[position + 8:position + 24])
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            format_tag, channels, sample_rate, _, _, bits = fmt
+            if format_tag not in (1, 0xFFFE) or bits not in (8, 16, 32) or not channels:
+                raise ValueError(f"Unsupported WAV format: tag {format_tag}, {bits} bits")
+            data_offset = position + 8
+            # Streamed recordings may declare a placeholder (or larger) data size
+            data_size = min(chunk_size, total_size - data_offset)
+            return WavLayout(channels, sample_rate, bits // 8, data_offset, data_size)
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _pcm_to_float(frames: bytes, width: int, channels: int) -> np.ndarray:
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _slice_source(audio: AudioSource, start: int, end: int) -> AudioSource:
+    if isinstance(audio, (bytes, bytearray)):
+        return audio[start:end]
+    if isinstance(audio, AudioSpool):
+        return audio.slice(start, end)
+    if isinstance(audio, SpoolSlice):
+        return SpoolSlice(audio.spool, audio.start + start, audio.start + end)
+    return read_source(audio)[start:end]
+
+
+def _wav_levels(audio: AudioSource, layout: WavLayout) -> LevelMeter:
+    meter = LevelMeter(layout.sample_rate)
+    block_align = layout.channels * layout.sample_width
+    data = _slice_source(audio, layout.data_offset, layout.data_offset + layout.data_size)
+    pending = b""
+    for chunk in iter_source(data):
+        chunk = pending + chunk
+        usable = len(chunk) - len(chunk) % block_align
+        pending = chunk[usable:]
+        if usable:
+            meter.feed(_pcm_to_float(chunk[:usable], layout.sample_width, layout.channels))
+    return meter
+
+
+def wav_header(layout: WavLayout, data_size: int) -> bytes:
+    block_align = layout.channels * layout.sample_width
+    return b"".join([
+        b"RIFF", struct.pack("<I", 36 + data_size), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, layout.channels, layout.sample_rate,
+                             layout.sample_rate * block_align, block_align, layout.sample_width * 8),
+        b"data", struct.pack("<I", data_size),
+    ])
+
+
+def run_ffmpeg(output_args: List[str], audio: AudioSource) -> Iterator[bytes]:
+    """
+    Run ffmpeg on the audio (streamed to stdin from a thread) and yield stdout
+    in blocks. Raises subprocess.CalledProcessError on failure or timeout.
+    """
+    process = subprocess.Popen(
+        [FFMPEG, "-loglevel", "error", "-i", "pipe:0", *output_args, "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+
+    def feed():
+        try:
+            for chunk in iter_source(audio):
+                process.stdin.write(chunk)
+        except OSError:
+            pass  # ffmpeg exited early
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    writer = threading.Thread(target=feed, name="ffmpeg-stdin", daemon=True)
+    writer.start()
+    timer = threading.Timer(FFMPEG_TIMEOUT, process.kill)
+    timer.start()
+    try:
+        while True:
+            block = process.stdout.read(UPLOAD_CHUNK_BYTES)
+            if not block:
+                break
+            yield block
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        writer.join(timeout=1)
+
+
+def _ffmpeg_levels(audio: AudioSource) -> LevelMeter:
+    meter = LevelMeter(DECODE_SAMPLE_RATE)
+    pending = b""
+    for block in run_ffmpeg(["-f", "s16le", "-ac", "1", "-ar", str(DECODE_SAMPLE_RATE)], audio):
+        block = pending + block
+        usable = len(block) - len(block) % 2
+        pending = block[usable:]
+        meter.feed(np.frombuffer(block[:usable], dtype="<i2").astype(np.float32) / 32768)
+    return meter
+
+
+def _is_wav(head: bytes, content_type: str) -> bool:
+    return (head[:4] == b"RIFF" and head[8:12] == b"WAVE") or "wav" in content_type
+
+
+def measure_levels(audio: AudioSource, content_type: str) -> Optional[Tuple[LevelMeter, Optional[WavLayout]]]:
+    """Frame levels of the audio (and its WAV layout, if WAV). None if it can't be decoded here."""
+    try:
+        head = _read_head(audio, WAV_HEADER_SCAN_BYTES)
+        if _is_wav(head, content_type):
+            layout = parse_wav_header(head, source_size(audio))
+            if layout is None:
+                raise ValueError("no fmt/data chunk")
+            return _wav_levels(audio, layout), layout
+        if FFMPEG:
+            return _ffmpeg_levels(audio), None
+    except (ValueError, struct.error, subprocess.SubprocessError) as e:
+        print(f"VAD: could not decode {content_type} audio: {e}")
+    return None
+
+
+def detect_speech_levels(dbfs: np.ndarray, frame_len: int, n_samples: int, sample_rate: int) -> Optional[Tuple[int, int]]:
+    """
+    Energy-based speech detection over per-frame levels.
+
+    A frame is speech when its level is above both VAD_MIN_DBFS and the
+    estimated noise floor + VAD_MARGIN_DB (capped at VAD_MAX_THRESHOLD_DBFS).
+    If too few frames clear that, frames above VAD_MIN_DBFS alone count: a
+    quiet answer without a pause has no quieter frames to measure a floor from.
+    Returns the padded (start, end) sample range, or None when there is less
+    than VAD_MIN_SPEECH_MS of speech.
+    """
+    if len(dbfs) == 0:
+        return None
+
+    noise_floor = np.percentile(dbfs, 10)
+    threshold = max(VAD_MIN_DBFS, min(noise_floor + VAD_MARGIN_DB, VAD_MAX_THRESHOLD_DBFS))
+    voiced = np.flatnonzero(dbfs > threshold)
+    if len(voiced) * FRAME_MS < VAD_MIN_SPEECH_MS:
+        voiced = np.flatnonzero(dbfs > VAD_MIN_DBFS)
+
+    if len(voiced) * FRAME_MS < VAD_MIN_SPEECH_MS:
+        return None
+
+    padding = int(sample_rate * VAD_PADDING_MS / 1000)
+    start = max(int(voiced[0]) * frame_len - padding, 0)
+    end = min((int(voiced[-1]) + 1) * frame_len + padding, n_samples)
+    return start, end
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int]]:
+    """detect_speech_levels for already decoded samples."""
+    meter = LevelMeter(sample_rate)
+    meter.feed(samples)
+    return detect_speech_levels(meter.dbfs(), meter.frame_len, meter.samples, sample_rate)
+
+
+def _trim_ffmpeg(audio: AudioSource, start_seconds: float, duration: float) -> AudioSpool:
+    # Stream copy: cuts at packet boundaries without re-encoding the Opus audio
+    trimmed = AudioSpool("audio/webm")
+    for block in run_ffmpeg(["-ss", f"{start_seconds:.3f}", "-t", f"{duration:.3f}", "-c", "copy", "-f", "webm"], audio):
+        trimmed.write(block)
+    return trimmed
+
+
+class VadStats:
+    """Aggregate counters for the health endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.skipped_turns = 0
+        self.audio_seconds = 0.0
+        self.seconds_saved = 0.0
+
+    def record(self, result: VadResult):
+        with self._lock:
+            self.turns += 1
+            self.skipped_turns += 0 if result.has_speech else 1
+            self.audio_seconds += result.original_seconds
+            self.seconds_saved += result.seconds_saved
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": VAD_ENABLED,
+                "ffmpeg": bool(FFMPEG),
+                "turns": self.turns,
+                "skipped_turns": self.skipped_turns,
+                "audio_seconds": round(self.audio_seconds, 2),
+                "seconds_saved": round(self.seconds_saved, 2),
+            }
+
+
+vad_stats = VadStats()
+
+
+def preprocess_audio(audio_data: AudioSource, content_type: str) -> VadResult:
+    """
+    Detect speech and trim silence. Undecodable audio is passed through as speech.
+
+    audio_data may be bytes or an upload_stream spool; the trimmed audio is a
+    streamable source (WAV: header + byte range of the upload, WebM: a new spool).
+    """
+    passthrough = VadResult(audio_data, content_type, True, 0.0, 0.0)
+    if not VAD_ENABLED:
+        return passthrough
+
+    measured = measure_levels(audio_data, content_type)
+    if measured is None:
+        return passthrough
+
+    meter, layout = measured
+    sample_rate = meter.sample_rate
+    original_seconds = meter.samples / sample_rate
+    speech = detect_speech_levels(meter.dbfs(), meter.frame_len, meter.samples, sample_rate)
+
+    if speech is None:
+        result = VadResult(b"", content_type, False, original_seconds, original_seconds)
+    else:
+        start, end = speech
+        kept_seconds = (end - start) / sample_rate
+        saved = original_seconds - kept_seconds
+        if saved < FRAME_MS / 1000:
+            result = VadResult(audio_data, content_type, True, original_seconds, 0.0)
+        elif layout is not None:
+            block_align = layout.channels * layout.sample_width
+            data_start = layout.data_offset + start * block_align
+            data_size = (end - start) * block_align
+            trimmed = BodyStream([wav_header(layout, data_size), _slice_source(audio_data, data_start, data_start + data_size)])
+            result = VadResult(trimmed, "audio/wav", True, original_seconds, saved)
+        elif "webm" not in content_type:
+            # Other containers (e.g. Safari's audio/mp4) are gated but not trimmed
+            result = VadResult(audio_data, content_type, True, original_seconds, 0.0)
+        else:
+            try:
+                trimmed = _trim_ffmpeg(audio_data, start / sample_rate, kept_seconds)
+                result = VadResult(trimmed, "audio/webm", True, original_seconds, saved)
+            except subprocess.SubprocessError as e:
+                print(f"VAD: trim failed, sending untrimmed audio: {e}")
+                result = VadResult(audio_data, content_type, True, original_seconds, 0.0)
+
+    vad_stats.record(result)
+    print(f"VAD: speech={result.has_speech} audio={original_seconds:.2f}s saved={result.seconds_saved:.2f}s")
+    return result
@@ -12,8 +12,10 @@ import { Mic, MicOff, Video, VideoOff, PhoneOff, MessageSquare, Loader2 } from '
 import { useState, useRef, useEffect } from 'react';
 import { useAudioRecorder } from '@/hooks/useAudioRecorder';
 import {
-    processInterviewTurn,
-    playAudioFromBase64,
+    createInterviewSession,
+    processInterviewTurnStream,
+    StreamingTurnUpload,
+    AudioChunkQueue,
     ChatMessage,
     InterviewType
 } from '@/services/interviewService';
@@ -31,13 +33,28 @@ export function InterviewRoom({ onEnd, interviewType = 'technical' }: InterviewR
     const [duration, setDuration] = useState(0);
     const [isVideoOn, setIsVideoOn] = useState(true);
 
+    const [sessionId, setSessionId] = useState<string | undefined>(undefined);
+
     const timerRef = useRef<NodeJS.Timeout | null>(null);
     const videoRef = useRef<HTMLVideoElement>(null);
 
-    const { isRecording, startRecording, stopRecording, error: recordingError } = useAudioRecorder();
+    // Chunks are uploaded while recording so the backend can start the reply early
+    const turnUploadRef = useRef<StreamingTurnUpload | null>(null);
+
+    const { isRecording, startRecording, stopRecording, error: recordingError } = useAudioRecorder({
+        onChunk: (chunk) => turnUploadRef.current?.append(chunk),
+    });
 
 
 
+    // Server-side session holding the chat history (turns still send the
+    // full history, used if the session is missing or creation failed)
+    useEffect(() => {
+        createInterviewSession(interviewType)
+            .then(setSessionId)
+            .catch((err) => console.warn('[Interview] Session creation failed, using the client history:', err));
+    }, [interviewType]);
+
     // Timer for interview duration
     useEffect(() => {
         timerRef.current = setInterval(() => {
@@ -119,15 +136,25 @@ export function InterviewRoom({ onEnd, interviewType = 'technical' }: InterviewR
                     throw new Error('No audio recorded');
                 }
 
-                // Process the interview turn
-                const response = await processInterviewTurn(
+                // Process the interview turn, playing each sentence as it arrives
+                const audioQueue = new AudioChunkQueue();
+                const handlers = {
+                    onFiller: (audioBase64: string, mimeType?: string) => audioQueue.enqueue(audioBase64, mimeType),
+                    onAudioChunk: (audioBase64: string, _index: number, mimeType?: string) => audioQueue.enqueue(audioBase64, mimeType),
+                };
+                const turnUpload = turnUploadRef.current;
+                turnUploadRef.current = null;
+                // Fall back to uploading the whole recording if the chunked upload didn't go through
+                const response = (turnUpload ? await turnUpload.finish(handlers) : null) ?? await processInterviewTurnStream(
                     audioBlob,
                     chatHistory,
                     interviewType,
                     {
                         provider: ttsProvider,
                         language: ttsLanguage
-                    }
+                    },
+                    handlers,
+                    sessionId
                 );
 
                 // Update chat history
@@ -138,10 +165,8 @@ export function InterviewRoom({ onEnd, interviewType = 'technical' }: InterviewR
 
                 setChatHistory(prev => [...prev, ...newMessages]);
 
-                // Play the AI response audio
-                if (response.audio_base64) {
-                    await playAudioFromBase64(response.audio_base64);
-                }
+                // Wait for the remaining AI response audio to finish playing
+                await audioQueue.drain();
 
             } catch (err) {
                 const errorMessage = err instanceof Error ? err.message : 'Failed to process recording';
@@ -154,6 +179,12 @@ export function InterviewRoom({ onEnd, interviewType = 'technical' }: InterviewR
             // Start recording
             setError(null);
             try {
+                turnUploadRef.current = new StreamingTurnUpload(
+                    chatHistory,
+                    interviewType,
+                    { provider: ttsProvider, language: ttsLanguage },
+                    sessionId
+                );
                 await startRecording();
             } catch (err) {
                 const errorMessage = err instanceof Error ? err.message : 'Failed to start recording';
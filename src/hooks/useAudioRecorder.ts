@@ -16,7 +16,12 @@ export interface UseAudioRecorderReturn {
     resumeRecording: () => void;
 }
 
-export const useAudioRecorder = (): UseAudioRecorderReturn => {
+export interface UseAudioRecorderOptions {
+    /** Called with every recorded slice (every 100ms) while recording, e.g. to upload it right away. */
+    onChunk?: (chunk: Blob) => void;
+}
+
+export const useAudioRecorder = (options: UseAudioRecorderOptions = {}): UseAudioRecorderReturn => {
     const [state, setState] = useState<AudioRecorderState>({
         isRecording: false,
         isPaused: false,
@@ -26,6 +31,8 @@ export const useAudioRecorder = (): UseAudioRecorderReturn => {
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
     const audioChunksRef = useRef<Blob[]>([]);
     const streamRef = useRef<MediaStream | null>(null);
+    const onChunkRef = useRef(options.onChunk);
+    onChunkRef.current = options.onChunk;
 
     const startRecording = useCallback(async () => {
         try {
@@ -56,6 +63,7 @@ export const useAudioRecorder = (): UseAudioRecorderReturn => {
             mediaRecorderRef.current.ondataavailable = (event) => {
                 if (event.data.size > 0) {
                     audioChunksRef.current.push(event.data);
+                    onChunkRef.current?.(event.data);
                 }
             };
 
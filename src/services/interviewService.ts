@@ -15,6 +15,8 @@ export interface InterviewTurnResponse {
     user_transcript: string;
     ai_response_text: string;
     audio_base64: string;
+    audio_url?: string;   // Short-lived URL when the turn was requested in "url" response mode
+    audio_mime?: string;  // e.g. audio/mpeg (Edge-TTS), audio/wav (Sarvam) or the negotiated audio_format
     error?: string;
     tts_error?: string;  // ElevenLabs error if TTS failed
 }
@@ -32,6 +34,64 @@ export interface TTSOptions {
     provider: 'edge' | 'sarvam';
     language: string;
     model?: string;
+    /** Providers the backend may fall back to when `provider` is slow or failing (default: any). */
+    allowedProviders?: Array<'edge' | 'sarvam'>;
+    /** Reply audio codec, e.g. 'opus', 'opus:16', 'mp3:32' or 'pcm' (default: preferredAudioFormat()). */
+    audioFormat?: string;
+}
+
+/**
+ * Reply audio format for this browser and connection: Opus (WebM) where it
+ * can be played, MP3 otherwise, at a lower bitrate on slow or data-saver connections.
+ */
+export function preferredAudioFormat(): string {
+    if (typeof window === 'undefined') return 'mp3';
+    const connection = (navigator as Navigator & { connection?: { saveData?: boolean; effectiveType?: string } }).connection;
+    const constrained = !!connection && (!!connection.saveData || ['slow-2g', '2g', '3g'].includes(connection.effectiveType ?? ''));
+    if (new Audio().canPlayType('audio/webm; codecs="opus"')) {
+        return constrained ? 'opus:16' : 'opus:24';
+    }
+    return constrained ? 'mp3:32' : 'mp3';
+}
+
+/**
+ * Create a server-side interview session.
+ * Turns sent with the returned session id use the chat history kept by the
+ * backend; the history they also send is only a fallback.
+ */
+export async function createInterviewSession(
+    interviewType: InterviewType = 'technical',
+    ttsOptions: TTSOptions = { provider: 'edge', language: 'en-US-AriaNeural' }
+): Promise<string> {
+    const sessionUrl = CLOUD_FUNCTION_URL.replace('process_interview_turn', 'create_session');
+    const response = await fetch(sessionUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            interview_type: interviewType,
+            tts_provider: ttsOptions.provider,
+            tts_language: ttsOptions.language,
+        }),
+    });
+
+    if (!response.ok) {
+        throw new Error(`Create session error: ${response.status} - ${await response.text()}`);
+    }
+
+    const data: { session_id: string } = await response.json();
+    return data.session_id;
+}
+
+/**
+ * Attach the conversation context to a turn request: the session id when the
+ * backend keeps the history, plus the full history, which the backend falls
+ * back to when the session is unknown to the instance or has expired.
+ */
+function appendConversationContext(formData: FormData, chatHistory: ChatMessage[], sessionId?: string) {
+    if (sessionId) {
+        formData.append('session_id', sessionId);
+    }
+    formData.append('history', JSON.stringify(chatHistory));
 }
 
 /**
@@ -42,12 +102,15 @@ export async function processInterviewTurn(
     audioBlob: Blob,
     chatHistory: ChatMessage[],
     interviewType: InterviewType = 'technical',
-    ttsOptions: TTSOptions = { provider: 'edge', language: 'en-US-AriaNeural' }
+    ttsOptions: TTSOptions = { provider: 'edge', language: 'en-US-AriaNeural' },
+    sessionId?: string
 ): Promise<InterviewTurnResponse> {
     const formData = new FormData();
     formData.append('audio', audioBlob, 'recording.webm');
-    formData.append('history', JSON.stringify(chatHistory));
+    appendConversationContext(formData, chatHistory, sessionId);
     formData.append('interview_type', interviewType);
+    // Fetch the audio from a short-lived URL instead of inlining it as base64
+    formData.append('response_mode', 'url');
 
     // Add TTS options
     formData.append('tts_provider', ttsOptions.provider);
@@ -55,6 +118,10 @@ export async function processInterviewTurn(
     if (ttsOptions.model) {
         formData.append('tts_model', ttsOptions.model);
     }
+    if (ttsOptions.allowedProviders) {
+        formData.append('tts_allowed', ttsOptions.allowedProviders.join(','));
+    }
+    formData.append('audio_format', ttsOptions.audioFormat ?? preferredAudioFormat());
 
     console.log('[Interview API] Sending request to:', CLOUD_FUNCTION_URL);
     console.log('[Interview API] Audio blob size:', audioBlob.size, 'bytes');
@@ -79,6 +146,7 @@ export async function processInterviewTurn(
         console.log('[Interview API] - User transcript:', data.user_transcript?.substring(0, 50) || '(empty)');
         console.log('[Interview API] - AI response:', data.ai_response_text?.substring(0, 50) || '(empty)');
         console.log('[Interview API] - Audio base64 length:', data.audio_base64?.length || 0);
+        console.log('[Interview API] - Audio URL:', data.audio_url || '(none)');
 
         if (data.error) {
             console.error('[Interview API] Error in response:', data.error);
@@ -89,7 +157,7 @@ export async function processInterviewTurn(
             console.error('[Interview API] ⚠️ TTS (ElevenLabs) Error:', data.tts_error);
         }
 
-        if (!data.audio_base64) {
+        if (!data.audio_base64 && !data.audio_url) {
             console.warn('[Interview API] ⚠️ No audio data in response - voice playback will be skipped');
         }
 
@@ -107,10 +175,287 @@ export async function processInterviewTurn(
     }
 }
 
+export interface StreamTurnHandlers {
+    onTranscript?: (transcript: string) => void;
+    onTextDelta?: (delta: string) => void;
+    onAudioChunk?: (audioBase64: string, index: number, mimeType?: string) => void;
+    /** A short acknowledgement ("Got it, ...") to play while the reply is generated. */
+    onFiller?: (audioBase64: string, mimeType?: string, text?: string) => void;
+}
+
 /**
- * Play audio from base64-encoded MP3 data.
+ * Process a single turn using the streaming (Server-Sent Events) endpoint.
+ * The transcript, text deltas and per-sentence audio chunks are delivered
+ * through the handlers as soon as the backend produces them.
  */
-export function playAudioFromBase64(base64Audio: string): Promise<void> {
+export async function processInterviewTurnStream(
+    audioBlob: Blob,
+    chatHistory: ChatMessage[],
+    interviewType: InterviewType = 'technical',
+    ttsOptions: TTSOptions = { provider: 'edge', language: 'en-US-AriaNeural' },
+    handlers: StreamTurnHandlers = {},
+    sessionId?: string
+): Promise<InterviewTurnResponse> {
+    const formData = new FormData();
+    formData.append('audio', audioBlob, 'recording.webm');
+    appendConversationContext(formData, chatHistory, sessionId);
+    formData.append('interview_type', interviewType);
+    formData.append('tts_provider', ttsOptions.provider);
+    formData.append('tts_language', ttsOptions.language);
+    if (ttsOptions.model) {
+        formData.append('tts_model', ttsOptions.model);
+    }
+    if (ttsOptions.allowedProviders) {
+        formData.append('tts_allowed', ttsOptions.allowedProviders.join(','));
+    }
+    formData.append('audio_format', ttsOptions.audioFormat ?? preferredAudioFormat());
+    formData.append('filler', '1');
+
+    const streamUrl = CLOUD_FUNCTION_URL.replace('process_interview_turn', 'process_interview_turn_stream');
+    console.log('[Interview API] Streaming request to:', streamUrl);
+
+    const response = await fetch(streamUrl, {
+        method: 'POST',
+        body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+        const errorText = await response.text();
+        throw new Error(`Interview API error: ${response.status} - ${errorText}`);
+    }
+
+    return readTurnStream(response, handlers);
+}
+
+/**
+ * Read the Server-Sent Events of a streaming turn response, dispatching them to the handlers.
+ */
+async function readTurnStream(response: Response, handlers: StreamTurnHandlers): Promise<InterviewTurnResponse> {
+    if (!response.body) {
+        throw new Error('Interview API error: empty stream');
+    }
+
+    const result: InterviewTurnResponse = {
+        user_transcript: '',
+        ai_response_text: '',
+        audio_base64: '',
+    };
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const handleEvent = (event: string, data: Record<string, unknown>) => {
+        switch (event) {
+            case 'transcript':
+                result.user_transcript = String(data.user_transcript ?? '');
+                handlers.onTranscript?.(result.user_transcript);
+                break;
+            case 'text':
+                result.ai_response_text += String(data.delta ?? '');
+                handlers.onTextDelta?.(String(data.delta ?? ''));
+                break;
+            case 'filler':
+                handlers.onFiller?.(String(data.audio_base64 ?? ''), data.audio_mime ? String(data.audio_mime) : undefined, String(data.text ?? ''));
+                break;
+            case 'audio':
+                handlers.onAudioChunk?.(String(data.audio_base64 ?? ''), Number(data.index), data.audio_mime ? String(data.audio_mime) : undefined);
+                break;
+            case 'tts_error':
+                console.error('[Interview API] ⚠️ TTS error for sentence:', data.tts_error);
+                result.tts_error = String(data.tts_error ?? '');
+                break;
+            case 'error':
+                throw new Error(String(data.error ?? 'Streaming turn failed'));
+            case 'done':
+                result.ai_response_text = String(data.ai_response_text ?? result.ai_response_text);
+                break;
+        }
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) handleEvent(event, JSON.parse(data));
+        }
+    }
+
+    return result;
+}
+
+
+/**
+ * Streaming-input turn: uploads the recorder's chunks while the candidate is
+ * still speaking, so the backend can transcribe them and start generating the
+ * reply before the recording ends.
+ *
+ * finish() returns null when the backend could not take the chunked upload
+ * (older backend, failed chunk, expired turn); the caller then sends the whole
+ * recording with processInterviewTurnStream as before.
+ */
+export class StreamingTurnUpload {
+    private turnId: Promise<string | null> | null = null;
+    private uploads: Promise<boolean> = Promise.resolve(true);
+
+    constructor(
+        private chatHistory: ChatMessage[],
+        private interviewType: InterviewType = 'technical',
+        private ttsOptions: TTSOptions = { provider: 'edge', language: 'en-US-AriaNeural' },
+        private sessionId?: string
+    ) {}
+
+    private begin(contentType: string): Promise<string | null> {
+        const beginUrl = CLOUD_FUNCTION_URL.replace('process_interview_turn', 'begin_turn');
+        return fetch(beginUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                ...(this.sessionId ? { session_id: this.sessionId } : {}),
+                history: this.chatHistory,
+                interview_type: this.interviewType,
+                tts_provider: this.ttsOptions.provider,
+                tts_language: this.ttsOptions.language,
+                tts_allowed: this.ttsOptions.allowedProviders?.join(','),
+                audio_format: this.ttsOptions.audioFormat ?? preferredAudioFormat(),
+                content_type: contentType,
+            }),
+        })
+            .then(async (response) => (response.ok ? (await response.json()).turn_id as string : null))
+            .catch((err) => {
+                console.warn('[Interview API] Chunked upload unavailable:', err);
+                return null;
+            });
+    }
+
+    /** Queue a recorded slice for upload (slices are sent in order). */
+    append(chunk: Blob): void {
+        const contentType = chunk.type || 'audio/webm';
+        if (!this.turnId) {
+            this.turnId = this.begin(contentType);
+        }
+        const turnId = this.turnId;
+        const appendUrl = CLOUD_FUNCTION_URL.replace('process_interview_turn', 'append_turn_audio');
+        this.uploads = this.uploads
+            .then(async (ok) => {
+                const id = await turnId;
+                if (!ok || !id) return false;
+                const response = await fetch(`${appendUrl}?turn_id=${encodeURIComponent(id)}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': contentType },
+                    body: chunk,
+                });
+                return response.ok;
+            })
+            .catch(() => false);
+    }
+
+    /** Close the turn and stream the reply, or null if the caller should fall back to a full upload. */
+    async finish(handlers: StreamTurnHandlers = {}): Promise<InterviewTurnResponse | null> {
+        const ok = await this.uploads;
+        const turnId = this.turnId ? await this.turnId : null;
+        if (!ok || !turnId) return null;
+
+        const formData = new FormData();
+        formData.append('turn_id', turnId);
+        formData.append('filler', '1');
+        const finishUrl = CLOUD_FUNCTION_URL.replace('process_interview_turn', 'finish_turn_stream');
+        const response = await fetch(finishUrl, { method: 'POST', body: formData });
+        if (response.status === 404) return null;
+        if (!response.ok) {
+            throw new Error(`Interview API error: ${response.status} - ${await response.text()}`);
+        }
+        return readTurnStream(response, handlers);
+    }
+}
+
+/**
+ * Plays streamed audio chunks back-to-back in the order they arrive.
+ */
+export class AudioChunkQueue {
+    private queue: Promise<void> = Promise.resolve();
+
+    enqueue(base64Audio: string, mimeType?: string): void {
+        this.queue = this.queue
+            .then(() => playAudioFromBase64(base64Audio, mimeType))
+            .catch((err) => console.error('[Audio Playback] Chunk failed:', err));
+    }
+
+    /** Resolves once every queued chunk has finished playing. */
+    drain(): Promise<void> {
+        return this.queue;
+    }
+}
+
+/**
+ * Play the audio of a turn response, whichever way the backend delivered it.
+ */
+export function playTurnAudio(response: InterviewTurnResponse): Promise<void> {
+    if (response.audio_url) {
+        return playAudioFromUrl(response.audio_url);
+    }
+    return playAudioFromBase64(response.audio_base64, response.audio_mime);
+}
+
+/**
+ * Play audio from a URL (e.g. the short-lived get_audio endpoint).
+ */
+export function playAudioFromUrl(url: string): Promise<void> {
+    return new Promise((resolve, reject) => {
+        const audio = new Audio(url);
+        audio.onended = () => resolve();
+        audio.onerror = () => reject(new Error(`Audio playback error: ${audio.error?.message || 'unknown'}`));
+        audio.play().catch(reject);
+    });
+}
+
+/**
+ * Play raw 16-bit big-endian PCM (audio/L16;rate=...;channels=1) with Web Audio.
+ */
+function playPcmFromBase64(base64Audio: string, mimeType: string): Promise<void> {
+    const rate = Number(/rate=(\d+)/i.exec(mimeType)?.[1] ?? 24000);
+    const bytes = Uint8Array.from(atob(base64Audio), (c) => c.charCodeAt(0));
+    const view = new DataView(bytes.buffer);
+    const samples = new Float32Array(Math.floor(bytes.length / 2));
+    for (let i = 0; i < samples.length; i++) {
+        samples[i] = view.getInt16(i * 2, false) / 32768;
+    }
+
+    const context = new AudioContext();
+    const buffer = context.createBuffer(1, samples.length, rate);
+    buffer.copyToChannel(samples, 0);
+    const source = context.createBufferSource();
+    source.buffer = buffer;
+    source.connect(context.destination);
+    return new Promise((resolve) => {
+        source.onended = () => {
+            context.close();
+            resolve();
+        };
+        source.start();
+    });
+}
+
+/**
+ * Play audio from base64-encoded data (MP3 unless another MIME type is given).
+ */
+export function playAudioFromBase64(base64Audio: string, mimeType: string = 'audio/mpeg'): Promise<void> {
+    if (base64Audio && mimeType.toLowerCase().startsWith('audio/l16')) {
+        return playPcmFromBase64(base64Audio, mimeType);
+    }
     return new Promise((resolve, reject) => {
         // Debug logging
         console.log('[Audio Playback] Attempting to play audio...');
@@ -126,7 +471,7 @@ export function playAudioFromBase64(base64Audio: string): Promise<void> {
             console.warn('[Audio Playback] Audio data seems too short:', base64Audio.substring(0, 50));
         }
 
-        const audio = new Audio(`data:audio/mpeg;base64,${base64Audio}`);
+        const audio = new Audio(`data:${mimeType};base64,${base64Audio}`);
 
         audio.oncanplaythrough = () => {
             console.log('[Audio Playback] Audio loaded and ready to play');